@@ -1,11 +1,15 @@
 # app.py - Main Flask application file
 
-from flask import Flask, session
-from services.auth import generate_session_key
+from services import startup  # first, so boot timing starts here
+from flask import Flask, jsonify, request
+from services.sessions import SelectiveSessionInterface
 from config import Config
+from commands import register_commands
+from services.resilience import start_request_deadline, CircuitOpenError, DeadlineExceededError
+from services.rate_limit import RateLimitedError
+from services.admission import AdmissionMiddleware
+from services.profiler import profiler
 import os
-import firebase_admin
-from firebase_admin import credentials
 
 # Import blueprints
 from routes.main import main_bp
@@ -16,6 +20,7 @@ from routes.admin_routes import admin_bp        # New admin routes
 
 app = Flask(__name__)
 app.secret_key = Config.SECRET_KEY  # Change this to a secure key
+app.session_interface = SelectiveSessionInterface()  # static and @session_free views skip the cookie
 
 # Register blueprints
 app.register_blueprint(main_bp)
@@ -24,19 +29,47 @@ app.register_blueprint(payment_api_bp, url_prefix='/api')
 app.register_blueprint(tracking_bp)             # Tracking routes
 app.register_blueprint(admin_bp)                # Admin routes
 
+register_commands(app)
+
+# Priority admission control: browsing is shed before checkout and kitchen traffic
+if Config.ADMISSION_ENABLED:
+    app.wsgi_app = AdmissionMiddleware(app)
+
 @app.before_request
 def before_request():
-    """Initialize session key if not present"""
-    if 'session_key' not in session:
-        session_key, timestamp = generate_session_key()
-        session['session_key'] = session_key
-        session['timestamp'] = timestamp
-        session.modified = True
+    """Start the request budget; the session key is minted lazily by the cart"""
+    start_request_deadline()
+    profiler.start_request(request.endpoint, request.headers)
+
+@app.teardown_request
+def teardown_request(exc):
+    """Write out this request's profile, if it was picked for one"""
+    profiler.finish_request()
+
+@app.errorhandler(CircuitOpenError)
+@app.errorhandler(DeadlineExceededError)
+def dependency_unavailable(e):
+    """Fast-fail responses for routes that don't catch these themselves"""
+    response = jsonify({'success': False, 'error': str(e), 'retry_after': e.retry_after})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@app.errorhandler(RateLimitedError)
+def rate_limited(e):
+    """Over-limit clients are turned away before Firestore or Midtrans is called"""
+    response = jsonify({'success': False, 'error': str(e), 'retry_after': e.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(os.environ["GOOGLE_APPLICATION_CREDENTIALS"])
-    firebase_admin.initialize_app(cred)
+# Credentials and templates; the Firestore channel and catalog are
+# warmed per worker by the post_worker_init hook in gunicorn.conf.py
+startup.preload(app)
 
 if __name__ == '__main__':
+    startup.warm_worker(app)
+    from services.archiver import archiver
+    archiver.start()
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port)
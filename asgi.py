@@ -0,0 +1,299 @@
+# asgi.py - ASGI entry point: async cart and tracking endpoints, Flask for the rest
+#
+# Run with `uvicorn asgi:app --host 0.0.0.0 --port $PORT`. The customer-facing
+# cart, catalog and tracking API below runs as async handlers on Firestore's
+# AsyncClient, so a request waiting on Firestore doesn't hold a thread. Every
+# other path goes to the unchanged Flask app, which shares the session cookie.
+from contextlib import asynccontextmanager
+import anyio
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app
+from models.async_database import AsyncDatabaseManager
+from routes.api import CATALOG_MAX_AGE
+from services import startup
+from services.auth import ensure_session_key
+from services.cart import CartService
+from services.catalog import catalog
+from services.menu_search import menu_search
+from services.rate_limit import RateLimitedError, rate_limiter, client_ip
+from services.resilience import CircuitOpenError, DeadlineExceededError
+from services.sessions import CookieSessionBridge, session_context, current_session as session
+from services.stock import stock
+
+db_manager = AsyncDatabaseManager()
+sessions = CookieSessionBridge(flask_app)
+
+class FlaskJSONResponse(JSONResponse):
+    """JSON encoded by Flask's provider, so both modes return identical bodies"""
+    def render(self, content):
+        return flask_app.json.dumps(content).encode('utf-8')
+
+def uses_session(handler):
+    """Open the Flask session cookie around an async handler and save it if changed"""
+    async def endpoint(request):
+        cookie_session = sessions.open(request.cookies)
+        with session_context(cookie_session):
+            response = await handler(request)
+        sessions.save(cookie_session, response)
+        return response
+    endpoint.__name__ = handler.__name__
+    return endpoint
+
+async def json_body(request):
+    try:
+        return await request.json() or {}
+    except ValueError:
+        return {}
+
+def check_rate_limit(endpoint, request):
+    """Same buckets as @rate_limited on the Flask views"""
+    rate_limiter.check(endpoint, {
+        'ip': client_ip(request.client.host if request.client else None, request.headers.get('x-forwarded-for')),
+        'session': session.get('session_key')
+    })
+
+async def fresh_catalog():
+    """Reload a stale catalog on a worker thread rather than blocking the event loop
+
+    Stock counts refresh in the background, or inline when background tasks
+    are off, so a due stock refresh is also kicked off from the thread.
+    """
+    if catalog.is_stale() or stock.is_stale():
+        await anyio.to_thread.run_sync(catalog.get_menu_items)
+
+def public_cacheable(response):
+    response.headers['Cache-Control'] = f'public, max-age={CATALOG_MAX_AGE}'
+    return response
+
+async def menu(request):
+    try:
+        await fresh_catalog()
+        return public_cacheable(FlaskJSONResponse({'success': True, 'items': catalog.get_menu_items()}))
+    except Exception as e:
+        return FlaskJSONResponse({'success': False, 'error': str(e)})
+
+async def addons(request):
+    """Get available addons"""
+    try:
+        await fresh_catalog()
+        return public_cacheable(FlaskJSONResponse({'success': True, 'addons': catalog.get_available_addons()}))
+    except Exception as e:
+        return FlaskJSONResponse({'success': False, 'error': str(e)})
+
+async def menu_search_api(request):
+    """Search and filter the menu from the in-memory index"""
+    try:
+        await fresh_catalog()
+        params = request.query_params
+        available = params.get('available')
+
+        def number(name, default=None):
+            value = params.get(name)
+            return int(value) if value not in (None, '') else default
+
+        result = menu_search.search(
+            query=params.get('q', ''),
+            category=params.get('category') or None,
+            available=None if available in (None, '') else available.lower() in ['true', '1', 'yes'],
+            min_price=number('min_price'),
+            max_price=number('max_price'),
+            limit=min(number('limit', 50), 200),
+            offset=max(number('offset', 0), 0)
+        )
+        return public_cacheable(FlaskJSONResponse({'success': True, **result}))
+    except Exception as e:
+        return FlaskJSONResponse({'success': False, 'error': str(e)})
+
+@uses_session
+async def cart(request):
+    return FlaskJSONResponse({
+        'success': True,
+        'cart': CartService.get_cart(),
+        'addons': CartService.get_addons(),
+        'total': CartService.get_cart_total(),
+        'version': CartService.get_version()
+    })
+
+@uses_session
+async def add_to_cart(request):
+    ensure_session_key()
+    data = await json_body(request)
+    try:
+        quantity = int(data.get('quantity', 1))
+        await fresh_catalog()
+        item_data = catalog.get_menu_item(data.get('item_id'))
+        if not item_data:
+            return FlaskJSONResponse({'success': False, 'error': 'Item not found'})
+        if not item_data.get('available', True):
+            return FlaskJSONResponse({'success': False, 'error': 'Sold out' if item_data.get('sold_out') else 'Item not available'})
+
+        cart_items = CartService.add_to_cart(item_data, quantity)
+        return FlaskJSONResponse({
+            'success': True,
+            'cart': cart_items,
+            'addons': CartService.get_addons(),
+            'suggested_addons': CartService.get_suggested_addons(item_data),
+            'total': CartService.get_cart_total(),
+            'version': CartService.get_version()
+        })
+    except Exception as e:
+        return FlaskJSONResponse({'success': False, 'error': str(e)})
+
+@uses_session
+async def cart_batch(request):
+    """Apply several cart and addon quantity changes in one request"""
+    ensure_session_key()
+    data = await json_body(request)
+    try:
+        await fresh_catalog()
+        success, error, stale = CartService.apply_operations(data.get('operations'), data.get('version'))
+    except Exception as e:
+        return FlaskJSONResponse({'success': False, 'error': str(e)})
+
+    result = {
+        'success': success,
+        'version': CartService.get_version(),
+        'cart': CartService.get_cart(),
+        'addons': CartService.get_addons(),
+        'total': CartService.get_cart_total()
+    }
+    if not success:
+        result['error'] = error
+        result['stale'] = stale
+    return FlaskJSONResponse(result)
+
+async def check_order_status(request):
+    try:
+        order = await db_manager.get_order_cached(request.path_params['order_id'])
+        if order:
+            return FlaskJSONResponse({'success': True, 'exists': True, 'status': order.get('status')})
+        return FlaskJSONResponse({'success': True, 'exists': False})
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        return FlaskJSONResponse({'success': False, 'error': str(e)})
+
+@uses_session
+async def track_order(request):
+    """Get active orders by phone number"""
+    check_rate_limit('track_order', request)
+    data = await json_body(request)
+    phone_number = str(data.get('phone_number', '')).strip()
+    if not phone_number:
+        return FlaskJSONResponse({'success': False, 'error': 'Phone number is required'})
+
+    orders = await db_manager.get_orders_by_phone(phone_number)
+    if not orders:
+        return FlaskJSONResponse({'success': False, 'error': 'No active orders found for this phone number'})
+
+    session['customer_phone'] = phone_number
+    return FlaskJSONResponse({'success': True, 'orders': orders})
+
+@uses_session
+async def get_session_order(request):
+    """Get current order from session"""
+    order_id = session.get('current_order_id')
+    if not order_id:
+        return FlaskJSONResponse({'success': False, 'error': 'No order in session'})
+
+    # Only saved orders are put in the session, so don't trust a cached miss
+    order = await db_manager.get_order_cached(order_id, cache_missing=False)
+    if not order:
+        session.pop('current_order_id', None)
+        return FlaskJSONResponse({'success': False, 'error': 'Order not found'})
+
+    # Don't show completed orders in session tracking
+    if order.get('order_status') == 'done':
+        session.pop('current_order_id', None)
+        return FlaskJSONResponse({'success': False, 'error': 'Order completed'})
+
+    return FlaskJSONResponse({'success': True, 'order': {
+        'order_id': order['order_id'],
+        'order_status': order.get('order_status', 'preparing'),
+        'status_updated_at': order.get('status_updated_at'),
+        'created_at': order.get('created_at'),
+        'items': order.get('items', []),
+        'total': order.get('total', 0),
+        'customer': order.get('customer', {}),
+        'admin_notes': order.get('admin_notes', '')
+    }})
+
+@uses_session
+async def save_order_to_session(request):
+    """Save order ID to session for persistence"""
+    ensure_session_key()
+    data = await json_body(request)
+    order_id = data.get('order_id')
+    if not order_id:
+        return FlaskJSONResponse({'success': False, 'error': 'Order ID is required'})
+
+    # payment_success stored it after a confirmed save, so the order is known to exist without a read
+    if session.get('current_order_id') == order_id:
+        return FlaskJSONResponse({'success': True, 'message': 'Order saved to session', 'expires_in': 86400})
+
+    order = await db_manager.get_order(order_id)
+    if not order:
+        return FlaskJSONResponse({'success': False, 'error': 'Order not found'})
+
+    session['current_order_id'] = order_id
+    if order.get('customer', {}).get('phone'):
+        session['customer_phone'] = order['customer']['phone']
+    return FlaskJSONResponse({
+        'success': True,
+        'message': 'Order saved to session',
+        'expires_in': 86400
+    })
+
+async def dependency_unavailable(request, e):
+    """Same fast-fail response as the Flask app's handler"""
+    response = FlaskJSONResponse({'success': False, 'error': str(e), 'retry_after': e.retry_after},
+                                 status_code=503)
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+async def too_many_requests(request, e):
+    """Same 429 response as the Flask app's handler"""
+    response = FlaskJSONResponse({'success': False, 'error': str(e), 'retry_after': e.retry_after},
+                                 status_code=429)
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+@asynccontextmanager
+async def lifespan(app):
+    # Same per-worker warm-up as gunicorn's post_worker_init, plus the async channel
+    await anyio.to_thread.run_sync(startup.warm_worker, flask_app)
+    try:
+        await db_manager.ping()
+    except Exception as e:
+        print(f"Async Firestore warm-up failed: {str(e)}")
+    from services.archiver import archiver
+    archiver.start()
+    yield
+    archiver.stop()
+
+app = Starlette(
+    routes=[
+        Route('/api/menu', menu),
+        Route('/api/addons', addons),
+        Route('/api/menu/search', menu_search_api),
+        Route('/api/cart', cart),
+        Route('/api/add-to-cart', add_to_cart, methods=['POST']),
+        Route('/api/cart-batch', cart_batch, methods=['POST']),
+        Route('/api/check-order-status/{order_id}', check_order_status),
+        Route('/api/track-order', track_order, methods=['POST']),
+        Route('/api/get-session-order', get_session_order),
+        Route('/api/save-order-to-session', save_order_to_session, methods=['POST']),
+        # Everything else: the sync Flask app, run on a thread pool
+        Mount('/', app=WSGIMiddleware(flask_app))
+    ],
+    exception_handlers={
+        CircuitOpenError: dependency_unavailable,
+        DeadlineExceededError: dependency_unavailable,
+        RateLimitedError: too_many_requests
+    },
+    lifespan=lifespan
+)
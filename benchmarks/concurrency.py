@@ -0,0 +1,85 @@
+# concurrency.py - Concurrent tracking and cart load against a running server
+#
+# Start the app in each mode on the same machine, then point this at it:
+#   gunicorn app:app --workers 1 --threads 8 -b :8000      (WSGI)
+#   uvicorn asgi:app --workers 1 --port 8001               (ASGI)
+#   python -m benchmarks.concurrency --url http://127.0.0.1:8000 --order-id ORDER-...
+#   python -m benchmarks.concurrency --url http://127.0.0.1:8001 --order-id ORDER-...
+# Each virtual user has its own cookie jar and alternates a tracking poll
+# with a cart change, like a customer watching an order while adding more.
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+async def _user(client, order_id, item_id, stop_at, latencies, errors):
+    version = 0
+    quantity = 1
+    while time.monotonic() < stop_at:
+        for kind in ['tracking', 'cart']:
+            started = time.perf_counter()
+            try:
+                if kind == 'tracking':
+                    response = await client.get(f'/api/check-order-status/{order_id}')
+                else:
+                    quantity = quantity % 5 + 1
+                    response = await client.post('/api/cart-batch', json={
+                        'version': version,
+                        'operations': [{'op': 'set_item', 'id': item_id, 'quantity': quantity}]
+                    })
+                    version = response.json().get('version', version)
+                if response.status_code != 200:
+                    errors[kind] += 1
+                    continue
+            except httpx.HTTPError:
+                errors[kind] += 1
+                continue
+            latencies[kind].append(time.perf_counter() - started)
+
+async def run(url, order_id, concurrency, duration):
+    """Requests/s and latency percentiles for one concurrency level"""
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(base_url=url, timeout=30) as setup:
+        item_id = (await setup.get('/api/menu')).json()['items'][0]['id']
+
+    clients = [httpx.AsyncClient(base_url=url, timeout=30, limits=limits) for _ in range(concurrency)]
+    try:
+        # Put the item in every cart first so set_item has a line to change
+        await asyncio.gather(*[client.post('/api/add-to-cart', json={'item_id': item_id}) for client in clients])
+        latencies = {'tracking': [], 'cart': []}
+        errors = {'tracking': 0, 'cart': 0}
+        stop_at = time.monotonic() + duration
+        await asyncio.gather(*[_user(client, order_id, item_id, stop_at, latencies, errors) for client in clients])
+    finally:
+        await asyncio.gather(*[client.aclose() for client in clients])
+
+    results = {}
+    for kind, samples in latencies.items():
+        samples.sort()
+        results[kind] = {
+            'requests_per_second': round(len(samples) / duration, 1),
+            'p50_ms': round(statistics.median(samples) * 1000, 1) if samples else None,
+            'p95_ms': round(samples[int(len(samples) * 0.95) - 1] * 1000, 1) if samples else None,
+            'errors': errors[kind]
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent tracking and cart load against a running server')
+    parser.add_argument('--url', required=True, help='Base URL of the running app')
+    parser.add_argument('--order-id', required=True, help='An existing order to poll')
+    parser.add_argument('--concurrency', default='10,50,100,200', help='Comma-separated user counts')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per level')
+    args = parser.parse_args()
+
+    print(f"{args.url}")
+    print(f"{'users':>6}  {'kind':<9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for level in [int(n) for n in args.concurrency.split(',')]:
+        results = asyncio.run(run(args.url, args.order_id, level, args.duration))
+        for kind, result in results.items():
+            print(f"{level:>6}  {kind:<9}{result['requests_per_second']:>9}{result['p50_ms'] or '-':>9}"
+                  f"{result['p95_ms'] or '-':>9}{result['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
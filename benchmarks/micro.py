@@ -0,0 +1,340 @@
+# micro.py - Micro-benchmarks for the per-request CPU work, checked against a stored baseline
+#
+# Times the cart, payment payload, Firestore document loops and session
+# cookie code in-process. Firestore and the Midtrans HTTP session are
+# replaced by in-memory fakes, so only our own code is measured and no
+# credentials are needed. Run from the repository root:
+#   python -m benchmarks.micro --save-baseline     (before you edit anything)
+#   python -m benchmarks.micro                     (after the change)
+# --save-baseline records whatever tree is checked out; to compare a branch
+# against an older commit, check that commit out, save, then switch back.
+# The second run exits with status 1 when a case got slower (or its cookie
+# bigger) than the baseline by more than --threshold. Timings only compare
+# on the same machine, so no baseline is checked in: record it where you
+# compare (benchmarks/baseline.json, or --baseline PATH).
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import timeit
+from types import SimpleNamespace
+from flask import Flask
+from flask.sessions import SecureCookieSession
+from services import startup
+from services.sessions import SelectiveSessionInterface, session_context
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Browsers drop cookies over 4KB, which empties the cart
+COOKIE_LIMIT = 4093
+
+CATEGORIES = ['Ayam', 'Ikan', 'Sapi', 'Sayur', 'Minuman']
+
+def menu_fixture(count):
+    return [{
+        'id': f'menu-{i:04d}',
+        'name': f'Nasi Box {CATEGORIES[i % len(CATEGORIES)]} Spesial {i}',
+        'description': 'Paket nasi dengan lauk, sayur dan sambal untuk acara kantor',
+        'price': 25000 + (i % 20) * 1500,
+        'image_url': f'https://example.com/images/menu-{i:04d}.jpg',
+        'category': CATEGORIES[i % len(CATEGORIES)],
+        'available': True
+    } for i in range(count)]
+
+def addon_fixture():
+    return [
+        {'id': 'addon-rice', 'name': 'Rice', 'price': 5000, 'available': True},
+        {'id': 'addon-sambal', 'name': 'Sambal', 'price': 3000, 'available': True,
+         'auto_rules': [{'trigger': 'category', 'category': 'Ayam', 'action': 'suggest'}]},
+        {'id': 'addon-kerupuk', 'name': 'Kerupuk', 'price': 2000, 'available': True},
+    ]
+
+def order_fixture(count, lines):
+    """Order docs shaped like the ones payment_success and save_order write ('id' is the doc id)"""
+    orders = []
+    for i in range(count):
+        order_id = f'ORDER-1700000000-{i:08x}'
+        items = [dict(item, quantity=10, total=item['price'] * 10, type='menu')
+                 for item in menu_fixture(lines)]
+        orders.append({
+            'id': order_id,
+            'order_id': order_id,
+            'items': items,
+            'total': sum(item['total'] for item in items),
+            'customer': {'name': 'Budi Santoso', 'phone': '08123456789', 'email': 'budi@example.com'},
+            'notes': '',
+            'status': 'paid',
+            'order_status': ['preparing', 'ready', 'done'][i % 3],
+            'payment_method': 'midtrans',
+            'transaction_id': f'txn-{i:08x}',
+            'created_at': 1700000000 + i,
+            'status_updated_at': 1700000000 + i,
+            'business_date': '2023-11-14'
+        })
+    return orders
+
+class FakeSnapshot:
+    """A Firestore DocumentSnapshot holding plain data"""
+    def __init__(self, collection, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self.reference = SimpleNamespace(parent=SimpleNamespace(id=collection))
+        self._data = data
+
+    def to_dict(self):
+        # A fresh top-level dict like the real one; protobuf decoding isn't ours to time
+        return dict(self._data) if self._data is not None else None
+
+class FakeQuery:
+    def __init__(self, collection, docs):
+        self.collection = collection
+        self.docs = docs
+
+    def where(self, field, op, value):
+        return FakeQuery(self.collection, [doc for doc in self.docs if doc.get(field) == value])
+
+    def order_by(self, field, direction=None):
+        return FakeQuery(self.collection, sorted(self.docs, key=lambda doc: doc.get(field, 0),
+                                                 reverse=direction == 'DESCENDING'))
+
+    def limit(self, count):
+        return FakeQuery(self.collection, self.docs[:count])
+
+    def document(self, doc_id):
+        return SimpleNamespace(collection=self.collection, id=doc_id)
+
+    def stream(self, timeout=None):
+        return (FakeSnapshot(self.collection, doc['id'], doc) for doc in self.docs)
+
+class FakeFirestore:
+    """Just enough of the Firestore client for the read paths benchmarked here"""
+    def __init__(self, collections):
+        self.collections = collections
+        self._by_id = {name: {doc['id']: doc for doc in docs} for name, docs in collections.items()}
+
+    def collection(self, name):
+        return FakeQuery(name, self.collections.get(name, []))
+
+    def get_all(self, refs, timeout=None):
+        return [FakeSnapshot(ref.collection, ref.id, self._by_id.get(ref.collection, {}).get(ref.id))
+                for ref in refs]
+
+class FakeMidtransResponse:
+    status_code = 201
+    headers = {'Content-Type': 'application/json'}
+    text = '{"token": "benchmark-token", "redirect_url": "https://app.sandbox.midtrans.com/snap/v2/vtweb/benchmark"}'
+
+    def json(self):
+        return json.loads(self.text)
+
+class FakeMidtransSession:
+    def post(self, url, **kwargs):
+        # requests would encode the payload, so keep that cost in
+        json.dumps(kwargs['json'])
+        return FakeMidtransResponse()
+
+def _fake_database(collections):
+    from models.database import DatabaseManager
+    db_manager = DatabaseManager()
+    db_manager._db = FakeFirestore(collections)
+    db_manager._db_generation = startup.fork_generation
+    return db_manager
+
+@contextlib.contextmanager
+def _fake_catalog(menu, addons):
+    """Point the addon rules at a catalog loaded from the fakes (no host snapshot)"""
+    from services.addon_rules import addon_rules
+    from services.catalog import CatalogCache
+    catalog = CatalogCache(ttl=86400, snapshot_dir='')
+    catalog.db_manager = _fake_database({'menu': menu, 'addons': addons})
+    original = addon_rules.catalog
+    addon_rules.catalog = catalog
+    try:
+        catalog.warm()
+        yield catalog
+    finally:
+        addon_rules.catalog = original
+
+def _filled_session(menu, lines):
+    from services.cart import CartService
+    session = SecureCookieSession()
+    with session_context(session):
+        for item in menu[:lines]:
+            CartService.add_to_cart(item, 10)
+    session['session_key'] = 'a' * 64
+    session['timestamp'] = 1700000000
+    return session
+
+# Each case takes the cart size and returns (timed function, extra metrics)
+
+def case_cart_add_to_cart(lines):
+    from services.cart import CartService
+    menu = menu_fixture(lines)
+    session = SecureCookieSession()
+
+    def build_cart():
+        session.clear()
+        with session_context(session):
+            for item in menu:
+                CartService.add_to_cart(item, 10)
+    return build_cart, {}
+
+def case_cart_get_all_cart_items(lines):
+    from services.cart import CartService
+    session = _filled_session(menu_fixture(lines), lines)
+
+    def get_all():
+        with session_context(session):
+            CartService.get_all_cart_items()
+    return get_all, {}
+
+def case_payment_create_payment(lines):
+    from services.cart import CartService
+    from services.payment import PaymentService
+    session = _filled_session(menu_fixture(lines), lines)
+    with session_context(session):
+        cart = CartService.get_all_cart_items()
+    customer = {'name': 'Budi Santoso', 'phone': '+62 812-3456-789', 'email': 'budi@example.com'}
+    service = PaymentService()
+    service.server_key = 'benchmark-server-key'
+    service._http = FakeMidtransSession()
+    service._http_generation = startup.fork_generation
+
+    def create_payment():
+        result = service.create_payment(cart, customer, 'https://catering.example.com')
+        assert result['success'], result
+    return create_payment, {}
+
+def case_database_get_menu_items(lines):
+    db_manager = _fake_database({'menu': menu_fixture(lines)})
+    return db_manager.get_menu_items, {}
+
+def case_database_get_orders(lines):
+    orders = order_fixture(100, 10)
+    db_manager = _fake_database({'orders': orders})
+    order_ids = [order['id'] for order in orders]
+    return lambda: db_manager.get_orders(order_ids), {}
+
+def case_database_get_orders_for_admin(lines):
+    db_manager = _fake_database({'orders': order_fixture(200, 10)})
+    return db_manager.get_orders_for_admin, {}
+
+def _cookie_setup(lines):
+    app = Flask(__name__)
+    app.secret_key = 'benchmark-secret-key'
+    serializer = SelectiveSessionInterface().get_signing_serializer(app)
+    session = _filled_session(menu_fixture(lines), lines)
+    return serializer, session
+
+def case_session_cookie_dumps(lines):
+    serializer, session = _cookie_setup(lines)
+    size = len(serializer.dumps(dict(session)))
+    return lambda: serializer.dumps(dict(session)), {'cookie_bytes': size}
+
+def case_session_cookie_loads(lines):
+    serializer, session = _cookie_setup(lines)
+    cookie = serializer.dumps(dict(session))
+    return lambda: serializer.loads(cookie), {}
+
+CASES = {
+    'cart.add_to_cart': case_cart_add_to_cart,
+    'cart.get_all_cart_items': case_cart_get_all_cart_items,
+    'payment.create_payment': case_payment_create_payment,
+    'database.get_menu_items': case_database_get_menu_items,
+    'database.get_orders': case_database_get_orders,
+    'database.get_orders_for_admin': case_database_get_orders_for_admin,
+    'session.cookie_dumps': case_session_cookie_dumps,
+    'session.cookie_loads': case_session_cookie_loads,
+}
+
+def measure(func, repeat=5):
+    """Best of several runs in microseconds per call; timeit picks the loop count"""
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat, loops)) / loops * 1e6
+
+def run(lines=120, only=None, repeat=5):
+    """Results per case: {'us': ..., plus any size metrics}"""
+    results = {}
+    menu = menu_fixture(lines)
+    # The services print per line; keep that cost but not the terminal's
+    with contextlib.redirect_stdout(io.StringIO()) as output, _fake_catalog(menu, addon_fixture()):
+        for name, setup in CASES.items():
+            if only and only not in name:
+                continue
+            func, metrics = setup(lines)
+            results[name] = dict(us=round(measure(func, repeat), 2), **metrics)
+            output.seek(0)
+            output.truncate()
+    return results
+
+def compare(results, baseline, threshold):
+    """Rows of (case, metric, baseline, current, change) and whether anything regressed"""
+    rows = []
+    regressed = False
+    for name, result in results.items():
+        for metric, current in result.items():
+            before = baseline.get(name, {}).get(metric)
+            if not before:
+                rows.append((name, metric, None, current, None))
+                continue
+            change = current / before - 1
+            regressed = regressed or change > threshold
+            rows.append((name, metric, before, current, change))
+    return rows, regressed
+
+def print_results(rows, threshold):
+    print(f"{'case':<32}{'metric':<14}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, metric, before, current, change in rows:
+        status = ''
+        if change is not None and change > threshold:
+            status = '  REGRESSED'
+        if metric == 'cookie_bytes' and current > COOKIE_LIMIT:
+            status += '  over the 4KB cookie limit'
+        before_text = f'{before:>12.2f}' if before is not None else f"{'-':>12}"
+        change_text = f'{change * 100:>9.1f}%' if change is not None else f"{'new':>10}"
+        print(f"{name:<32}{metric:<14}{before_text}{current:>12.2f}{change_text}{status}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for cart, payment, database and session code')
+    parser.add_argument('--lines', type=int, default=120, help='Cart lines (and menu items) per case')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Record these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs per case (best is kept)')
+    parser.add_argument('--only', help='Run only cases whose name contains this')
+    args = parser.parse_args()
+
+    results = run(args.lines, args.only, args.repeat)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'lines': args.lines,
+                'results': results
+            }, f, indent=2, sort_keys=True)
+        print_results(compare(results, {}, args.threshold)[0], args.threshold)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        if saved.get('lines') != args.lines:
+            print(f"Baseline was recorded with --lines {saved.get('lines')}; not comparing")
+        else:
+            baseline = saved['results']
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+
+    rows, regressed = compare(results, baseline, args.threshold)
+    print_results(rows, args.threshold)
+    return 1 if regressed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# session_overhead.py - Per-request cost of the session on cookie-less requests
+#
+# Run with `python -m benchmarks.session_overhead [requests]`. Compares the
+# session-free fast path with the old behaviour (cookie session opened and a
+# session key minted on every request) on endpoints that don't touch Firestore.
+import sys
+import time
+from flask.sessions import SecureCookieSessionInterface
+from services.auth import generate_session_key
+
+PATHS = ['/api/ping', '/static/js/base.js']
+
+def _mint_session_key():
+    # What app.before_request used to do for every request without a cookie
+    from flask import session
+    if 'session_key' not in session:
+        session_key, timestamp = generate_session_key()
+        session['session_key'] = session_key
+        session['timestamp'] = timestamp
+        session.modified = True
+
+def _time_requests(app, path, requests):
+    # No cookie jar: every request looks like a fresh uptime ping or crawler
+    client = app.test_client(use_cookies=False)
+    response = client.get(path)
+    response.close()
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path)
+        response.close()
+    elapsed = time.perf_counter() - started
+    return {
+        'us_per_request': round(elapsed / requests * 1e6, 1),
+        'set_cookie': 'Set-Cookie' in response.headers,
+        'vary_cookie': 'Cookie' in response.headers.get('Vary', '')
+    }
+
+def run(app, requests=2000):
+    """Time each path with the fast path and with the old always-on session"""
+    results = {}
+    for path in PATHS:
+        fast = _time_requests(app, path, requests)
+
+        original_interface = app.session_interface
+        app.session_interface = SecureCookieSessionInterface()
+        app.before_request_funcs.setdefault(None, []).append(_mint_session_key)
+        try:
+            baseline = _time_requests(app, path, requests)
+        finally:
+            app.before_request_funcs[None].remove(_mint_session_key)
+            app.session_interface = original_interface
+
+        saved = baseline['us_per_request'] - fast['us_per_request']
+        results[path] = {
+            'session_free': fast,
+            'always_session': baseline,
+            'saved_us': round(saved, 1),
+            'saved_pct': round(saved / baseline['us_per_request'] * 100, 1)
+        }
+    return results
+
+def print_results(results):
+    print(f"{'path':<24}{'always session':>16}{'session-free':>14}{'saved':>14}  set-cookie")
+    for path, result in results.items():
+        baseline = result['always_session']
+        fast = result['session_free']
+        print(f"{path:<24}{baseline['us_per_request']:>13.1f} us{fast['us_per_request']:>11.1f} us"
+              f"{result['saved_us']:>8.1f} us ({result['saved_pct']:.0f}%)  "
+              f"{'yes' if baseline['set_cookie'] else 'no'} -> {'yes' if fast['set_cookie'] else 'no'}")
+
+if __name__ == '__main__':
+    from app import app
+    print_results(run(app, int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
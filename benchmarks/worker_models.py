@@ -0,0 +1,81 @@
+# worker_models.py - Compare gunicorn worker models (and uvicorn) on the cart/tracking flow
+#
+# Starts the app once per worker model on a local port, runs the
+# concurrency benchmark against it, stops it with SIGTERM and prints one
+# matrix. Run from the repository root with real credentials:
+#   python -m benchmarks.worker_models --order-id ORDER-... --workers 2
+import argparse
+import asyncio
+import importlib.util
+import os
+import signal
+import subprocess
+import sys
+import time
+import httpx
+from benchmarks.concurrency import run
+
+MODELS = ['sync', 'gthread', 'gevent', 'uvicorn']
+
+def _command(model, port, workers):
+    if model == 'uvicorn':
+        return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--workers', str(workers)]
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+
+def _environment(model, port, workers):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers))
+    if model != 'uvicorn':
+        env['GUNICORN_WORKLOAD'] = model
+    return env
+
+def _wait_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'{url}/api/ping', timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    return False
+
+def run_model(model, order_id, workers, concurrency, duration, port):
+    """Concurrency results for one server model, or None if it didn't start"""
+    url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(_command(model, port, workers), env=_environment(model, port, workers))
+    try:
+        if not _wait_ready(url, 60):
+            return None
+        return {level: asyncio.run(run(url, order_id, level, duration)) for level in concurrency}
+    finally:
+        # SIGTERM is the graceful drain path gunicorn takes on a deploy
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare server worker models on the cart and tracking flow')
+    parser.add_argument('--order-id', required=True, help='An existing order to poll')
+    parser.add_argument('--models', default=','.join(MODELS), help='Comma-separated models to run')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes per model')
+    parser.add_argument('--concurrency', default='10,50,100', help='Comma-separated user counts')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per level')
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+    levels = [int(n) for n in args.concurrency.split(',')]
+
+    print(f"{'model':<9}{'users':>6}  {'kind':<9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for model in args.models.split(','):
+        if model == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print(f"{model:<9}  skipped (gevent not installed)")
+            continue
+        results = run_model(model, args.order_id, args.workers, levels, args.duration, args.port)
+        if results is None:
+            print(f"{model:<9}  failed to start")
+            continue
+        for level, by_kind in results.items():
+            for kind, result in by_kind.items():
+                print(f"{model:<9}{level:>6}  {kind:<9}{result['requests_per_second']:>9}"
+                      f"{result['p50_ms'] or '-':>9}{result['p95_ms'] or '-':>9}{result['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+# commands.py - Maintenance commands, run with `flask --app app <command>`
+import click
+from models.database import DatabaseManager
+
+def register_commands(app):
+    """Register maintenance CLI commands with the app"""
+
+    @app.cli.command('backfill-rollups')
+    @click.option('--chunk-size', default=500, show_default=True, help='Orders read per Firestore page')
+    def backfill_rollups(chunk_size):
+        """Rebuild the daily sales rollups from existing orders"""
+        result = DatabaseManager().backfill_sales_rollups(chunk_size=chunk_size)
+        click.echo(f"Rebuilt {result['days']} days from {result['orders']} orders")
+
+    @app.cli.command('archive-orders')
+    @click.option('--days', type=int, default=None, help='Archive orders done for more than this many days')
+    def archive_orders(days):
+        """Move long-completed orders into the monthly archive collections"""
+        from services.archiver import OrderArchiver
+        moved = OrderArchiver(after_days=days).run_once()
+        click.echo(f"Archived {moved} orders")
+
+    @app.cli.command('rebuild-production-sheet')
+    def rebuild_production_sheet():
+        """Recompute the kitchen production sheet from preparing orders"""
+        order_count = DatabaseManager().rebuild_production_sheet()
+        click.echo(f"Production sheet rebuilt from {order_count} preparing orders")
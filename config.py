@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,4 +19,66 @@ class Config:
     MIDTRANS_STATUS_URL = 'https://api.sandbox.midtrans.com/v2'
     
     # Firebase
-    FIREBASE_CREDENTIALS_PATH = 'serviceAccountKey.json'
\ No newline at end of file
+    FIREBASE_CREDENTIALS_PATH = 'serviceAccountKey.json'
+    
+    # Startup / caching
+    CATALOG_TTL = int(os.environ.get('CATALOG_TTL') or 300)  # seconds before menu/addons are re-read
+    # One catalog snapshot per host, shared by the workers ('' turns it off)
+    CATALOG_SNAPSHOT_DIR = os.environ.get('CATALOG_SNAPSHOT_DIR', '/dev/shm/catering-app' if os.path.isdir('/dev/shm') else '')
+    CATALOG_SNAPSHOT_CHECK_SECONDS = float(os.environ.get('CATALOG_SNAPSHOT_CHECK_SECONDS') or 1)  # how often workers look for a newer one
+    
+    # Reports
+    BUSINESS_UTC_OFFSET_HOURS = int(os.environ.get('BUSINESS_UTC_OFFSET_HOURS') or 7)  # WIB
+    
+    # Order status cache for the polling endpoints (seconds)
+    ORDER_CACHE_TTL_DONE = int(os.environ.get('ORDER_CACHE_TTL_DONE') or 300)
+    ORDER_CACHE_TTL_READY = int(os.environ.get('ORDER_CACHE_TTL_READY') or 15)
+    ORDER_CACHE_TTL_PREPARING = int(os.environ.get('ORDER_CACHE_TTL_PREPARING') or 5)
+    ORDER_CACHE_TTL_MISSING = int(os.environ.get('ORDER_CACHE_TTL_MISSING') or 3)  # negative caching
+    PAYMENT_STATUS_CACHE_TTL = int(os.environ.get('PAYMENT_STATUS_CACHE_TTL') or 10)
+    PAYMENT_STATUS_CACHE_TTL_PAID = int(os.environ.get('PAYMENT_STATUS_CACHE_TTL_PAID') or 300)
+    
+    # Daily stock: counter shards per item (more = less contention on hot dishes) and read cache
+    STOCK_SHARDS = int(os.environ.get('STOCK_SHARDS') or 10)
+    STOCK_CACHE_TTL = int(os.environ.get('STOCK_CACHE_TTL') or 10)
+    
+    # Production sheet stream: each connection closes after this and the browser reconnects
+    PRODUCTION_STREAM_SECONDS = float(os.environ.get('PRODUCTION_STREAM_SECONDS') or 20)  # below gunicorn's 30s timeout
+    
+    # Per-worker warm-up of the Firestore channel and catalog: background, blocking or off
+    WARMUP = os.environ.get('WARMUP', 'background').lower()
+    
+    # Resilience: per-request time budget and circuit breakers
+    REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS') or 25)  # below gunicorn's 30s timeout
+    FIRESTORE_TIMEOUT = float(os.environ.get('FIRESTORE_TIMEOUT') or 10)
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD') or 5)
+    BREAKER_RESET_SECONDS = int(os.environ.get('BREAKER_RESET_SECONDS') or 30)
+    
+    # Idempotency keys: how long responses replay, and when an unfinished claim is abandoned
+    IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL') or 3600)
+    IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS') or 60)
+    
+    # Rate limits per endpoint as scope=requests/seconds token buckets ('' turns one off)
+    RATE_LIMIT_TRACK_ORDER = os.environ.get('RATE_LIMIT_TRACK_ORDER', 'ip=20/60,session=6/60')
+    RATE_LIMIT_CREATE_PAYMENT = os.environ.get('RATE_LIMIT_CREATE_PAYMENT', 'ip=10/60,session=5/300')
+    RATE_LIMIT_DIR = os.environ.get('RATE_LIMIT_DIR', CATALOG_SNAPSHOT_DIR)  # buckets shared by the workers ('' keeps them per process)
+    TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT') or 1)  # Render's load balancer appends X-Forwarded-For
+    
+    # Admission control: per-worker concurrency limit, adapted to observed latency
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') != '0'
+    ADMISSION_INITIAL_LIMIT = int(os.environ.get('ADMISSION_INITIAL_LIMIT') or 8)
+    ADMISSION_MIN_LIMIT = int(os.environ.get('ADMISSION_MIN_LIMIT') or 2)
+    ADMISSION_MAX_LIMIT = int(os.environ.get('ADMISSION_MAX_LIMIT') or 64)
+    ADMISSION_LATENCY_TOLERANCE = float(os.environ.get('ADMISSION_LATENCY_TOLERANCE') or 2.0)  # latency growth tolerated before shrinking
+    WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY') or 0)  # requests a worker runs at once (set by gunicorn.conf.py); caps the limit
+    
+    # Background tasks: off-request work on per-type bounded queues ('0' runs it inline)
+    TASKS_ENABLED = os.environ.get('TASKS_ENABLED', '1') != '0'
+    TASK_DRAIN_SECONDS = float(os.environ.get('TASK_DRAIN_SECONDS') or 20)  # capped at what in-flight requests leave of graceful_timeout
+    
+    # On-demand profiling: settings and collapsed-stack/pstats output shared by the workers
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'catering-app-profiles')
+    
+    # Archival of completed orders
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS') or 30)
+    ARCHIVE_INTERVAL_MINUTES = int(os.environ.get('ARCHIVE_INTERVAL_MINUTES') or 60)  # 0 disables the background archiver
\ No newline at end of file
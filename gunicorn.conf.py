@@ -0,0 +1,144 @@
+# gunicorn.conf.py - Server settings and hooks (picked up automatically from the working directory)
+#
+# The worker model comes from GUNICORN_WORKLOAD:
+#   sync     one request per process; safest, most memory
+#   gthread  a few processes with a thread pool each (default: the app mostly
+#            waits on Firestore and Midtrans, which releases the GIL)
+#   gevent   one process per CPU with green threads (`pip install gevent`)
+# WEB_CONCURRENCY and GUNICORN_THREADS override the computed sizes.
+import math
+import os
+import signal
+import time
+
+WORKLOADS = ['sync', 'gthread', 'gevent']
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def _cgroup_cpu_quota():
+    """CPUs allowed by the container's cgroup quota, or None if unlimited"""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+def _available_cpus():
+    """CPUs this process may run on: the affinity mask, capped by a cgroup quota
+
+    cpu_count() reports the host's CPUs even inside a container limited to two.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS and Windows
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(math.ceil(quota), 1))
+    return cpus
+
+def _worker_settings(workload, cpus):
+    """worker_class, workers, threads and worker_connections for a workload"""
+    if workload == 'sync':
+        return {'worker_class': 'sync', 'workers': cpus * 2 + 1, 'threads': 1, 'worker_connections': 1000}
+    if workload == 'gevent':
+        return {'worker_class': 'gevent', 'workers': cpus, 'threads': 1, 'worker_connections': 1000}
+    return {'worker_class': 'gthread', 'workers': cpus * 2, 'threads': 8, 'worker_connections': 1000}
+
+WORKLOAD = os.environ.get('GUNICORN_WORKLOAD', 'gthread').lower()
+if WORKLOAD not in WORKLOADS:
+    raise ValueError(f"GUNICORN_WORKLOAD must be one of {', '.join(WORKLOADS)}, not {WORKLOAD!r}")
+
+_settings = _worker_settings(WORKLOAD, _available_cpus())
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = _settings['worker_class']
+workers = _env_int('WEB_CONCURRENCY', _settings['workers'])
+threads = _env_int('GUNICORN_THREADS', _settings['threads'])
+worker_connections = _settings['worker_connections']
+
+# Admission control caps its per-worker limit at what a worker can actually run
+os.environ.setdefault('WORKER_CONCURRENCY', str(worker_connections if worker_class == 'gevent' else threads))
+
+# Load the app once in the master so workers share its pages; preload()
+# opens no sockets and post_fork drops anything that did. Not with gevent:
+# the master would import ssl, threading and grpc before the workers
+# monkey-patch them.
+preload_app = worker_class != 'gevent' and os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+# Recycle workers after a jittered number of requests so a slow leak can't
+# grow forever, and they don't all restart at once
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Request deadlines (REQUEST_DEADLINE_SECONDS, 25s) finish inside the worker
+# timeout; on SIGTERM in-flight requests get graceful_timeout to drain
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 25)
+# Left of graceful_timeout for the worker to exit after the task drain
+EXIT_MARGIN_SECONDS = 2
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+
+def when_ready(server):
+    server.log.info(f"Serving {WORKLOAD}: {workers} x {worker_class} workers, "
+                    f"{threads} threads, max_requests {max_requests}+{max_requests_jitter}")
+
+def post_fork(server, worker):
+    """Drop the Firestore client and HTTP pools inherited from the master"""
+    from services.startup import after_fork
+    after_fork()
+
+def post_worker_init(worker):
+    """Warm the Firestore channel and catalog (in the background unless WARMUP=blocking).
+
+    Runs inside the worker after the app is loaded, so it works the same with
+    or without preload_app and never shares a gRPC channel across fork().
+    """
+    if worker_class == 'gevent':
+        # gevent has patched the stdlib by now; gRPC needs its own hook too
+        from grpc.experimental import gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    from services.startup import warm_worker
+    from services.archiver import archiver
+    warm_worker(worker.wsgi)
+    archiver.start()
+    _note_shutdown_start(worker)
+
+def _note_shutdown_start(worker):
+    """Record when SIGTERM arrives; graceful_timeout counts from then, in-flight requests included"""
+    handler = signal.getsignal(signal.SIGTERM)
+    if not callable(handler):
+        return
+
+    def handle_term(signum, frame):
+        worker.shutdown_started = time.monotonic()
+        handler(signum, frame)
+    signal.signal(signal.SIGTERM, handle_term)
+
+def worker_exit(server, worker):
+    """Stop the archiver and finish queued background tasks so a draining worker exits cleanly
+
+    The drain gets what in-flight requests left of graceful_timeout (at most
+    TASK_DRAIN_SECONDS), so the master's SIGKILL never lands mid-task.
+    """
+    from services.archiver import archiver
+    from services.tasks import tasks
+    from config import Config
+    archiver.stop()
+    started = getattr(worker, 'shutdown_started', None) or time.monotonic()
+    remaining = started + graceful_timeout - EXIT_MARGIN_SECONDS - time.monotonic()
+    tasks.drain(timeout=max(min(Config.TASK_DRAIN_SECONDS, remaining), 0))
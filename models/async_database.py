@@ -0,0 +1,138 @@
+# async_database.py - Customer-facing Firestore reads on the asyncio client
+from config import Config
+from models.database import init_firebase
+from models.rollups import archive_collection_for
+from services.startup import lazy_import
+from services.cache import order_cache
+from services.resilience import firestore_breaker, guarded_async, CircuitOpenError
+from services.tasks import tasks
+
+firestore_async = lazy_import('firebase_admin.firestore_async')
+
+class AsyncDatabaseManager:
+    """Mirror of the DatabaseManager reads behind the cart and tracking endpoints
+
+    Built on Firestore's AsyncClient for the ASGI app (asgi.py): an RPC in
+    flight doesn't hold a thread. Method names and return values match
+    DatabaseManager so handlers read the same either way.
+    """
+    def __init__(self):
+        self._db = None
+
+    @property
+    def db(self):
+        """AsyncClient, created on first use inside the running event loop"""
+        if self._db is None:
+            init_firebase()
+            self._db = firestore_async.client()
+        return self._db
+
+    def _timeout(self):
+        return Config.FIRESTORE_TIMEOUT
+
+    @guarded_async(firestore_breaker)
+    async def ping(self):
+        """Cheap read that opens the gRPC channel"""
+        await self.db.collection('menu').document('_ping').get(timeout=self._timeout())
+
+    async def _stream(self, query):
+        results = []
+        async for snapshot in query.stream(timeout=self._timeout()):
+            data = snapshot.to_dict()
+            data['id'] = snapshot.id
+            results.append(data)
+        return results
+
+    @guarded_async(firestore_breaker)
+    async def get_menu_items(self):
+        """Get all menu items"""
+        return await self._stream(self.db.collection('menu'))
+
+    @guarded_async(firestore_breaker)
+    async def get_menu_item(self, item_id):
+        """Get single menu item"""
+        item = await self.db.collection('menu').document(item_id).get(timeout=self._timeout())
+        if item.exists:
+            data = item.to_dict()
+            data['id'] = item.id
+            return data
+        return None
+
+    @guarded_async(firestore_breaker)
+    async def get_addons(self):
+        """Get all addons"""
+        return await self._stream(self.db.collection('addons'))
+
+    @guarded_async(firestore_breaker)
+    async def get_addon(self, addon_id):
+        """Get single addon"""
+        addon = await self.db.collection('addons').document(addon_id).get(timeout=self._timeout())
+        if addon.exists:
+            data = addon.to_dict()
+            data['id'] = addon.id
+            return data
+        return None
+
+    @guarded_async(firestore_breaker)
+    async def get_catalog_documents(self, menu_ids, addon_ids):
+        """Get menu items and addons in one batched read, as ({menu_id: item}, {addon_id: addon})"""
+        refs = [self.db.collection('menu').document(item_id) for item_id in set(menu_ids)]
+        refs += [self.db.collection('addons').document(addon_id) for addon_id in set(addon_ids)]
+        menu_items = {}
+        addons = {}
+        if not refs:
+            return menu_items, addons
+        async for snapshot in self.db.get_all(refs, timeout=self._timeout()):
+            if snapshot.exists:
+                data = snapshot.to_dict()
+                data['id'] = snapshot.id
+                target = menu_items if snapshot.reference.parent.id == 'menu' else addons
+                target[snapshot.id] = data
+        return menu_items, addons
+
+    async def get_order(self, order_id):
+        """Get order by ID, falling back to its archive partition"""
+        try:
+            order = await self._fetch_order(order_id)
+            if order is None:
+                order = await self.get_archived_order(order_id)
+            return order
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            tasks.log("Error retrieving order %s: %s", order_id, str(e))
+            return None
+
+    @guarded_async(firestore_breaker)
+    async def _fetch_order(self, order_id):
+        order = await self.db.collection('orders').document(order_id).get(timeout=self._timeout())
+        return order.to_dict() if order.exists else None
+
+    @guarded_async(firestore_breaker)
+    async def get_archived_order(self, order_id):
+        """Get an order from its archive partition"""
+        collection = archive_collection_for(order_id)
+        if not collection:
+            return None
+        order = await self.db.collection(collection).document(order_id).get(timeout=self._timeout())
+        return order.to_dict() if order.exists else None
+
+    async def get_order_cached(self, order_id, cache_missing=True):
+        """Get order by ID through the same status cache as the sync endpoints"""
+        return await order_cache.get_order_async(order_id, self.get_order, cache_missing)
+
+    async def get_orders_by_phone(self, phone_number):
+        """Get orders by customer phone number (excluding completed orders)"""
+        try:
+            query = self.db.collection('orders').where('customer.phone', '==', phone_number).limit(50)
+            orders = await firestore_breaker.call_async(self._stream, query)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            tasks.log("Error getting orders by phone %s: %s", phone_number, str(e))
+            return []
+
+        # Only active orders, newest first (filtered in Python to avoid a composite index)
+        order_list = [order for order in orders if order.get('order_status', 'preparing') != 'done']
+        order_list.sort(key=lambda x: x.get('created_at', 0), reverse=True)
+        return order_list
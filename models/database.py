@@ -1,18 +1,75 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-from datetime import datetime
+from datetime import datetime, timedelta
 from config import Config
+import random
+from models.rollups import (ROLLUP_COLLECTION, PRODUCTION_COLLECTION, PRODUCTION_DOC,
+                            STOCK_COLLECTION, business_date, order_business_date, order_contribution,
+                            done_contribution, production_contribution, stock_contribution,
+                            stock_shard_id, as_increments, merge_contribution, summarize_production,
+                            ARCHIVE_PREFIX, archive_collection_for, archive_month)
+from services import startup
+from services.startup import lazy_import
+from services.singleflight import SingleFlight
+from services.cache import order_cache, payment_status_cache
+from services.resilience import firestore_breaker, guarded, call_timeout, DeadlineExceededError
+from services.tasks import tasks
+
+# firebase_admin pulls in google-cloud-firestore and grpc, so import on first use
+firebase_admin = lazy_import('firebase_admin')
+credentials = lazy_import('firebase_admin.credentials')
+firestore = lazy_import('firebase_admin.firestore')
+google_exceptions = lazy_import('google.api_core.exceptions')
+
+IDEMPOTENCY_COLLECTION = 'idempotency_keys'
+
+# Tracking statuses an order may move to from each status; done is final
+ORDER_STATUS_TRANSITIONS = {
+    'preparing': ['preparing', 'ready', 'done'],
+    'ready': ['preparing', 'ready', 'done'],
+    'done': ['done']
+}
+
+def can_transition(current_status, new_status):
+    """Check a tracking status change against ORDER_STATUS_TRANSITIONS"""
+    return new_status in ORDER_STATUS_TRANSITIONS.get(current_status or 'preparing', [])
+
+# Shared by every DatabaseManager in the process so concurrent identical
+# document reads (e.g. the same order_id polled from several endpoints)
+# go out as one RPC
+document_reads = SingleFlight()
+
+def init_firebase():
+    """Initialize the default firebase app once per process"""
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(Config.FIREBASE_CREDENTIALS_PATH)
+        firebase_admin.initialize_app(cred)
 
 class DatabaseManager:
     def __init__(self):
-        if not firebase_admin._apps:
-            cred = credentials.Certificate(Config.FIREBASE_CREDENTIALS_PATH)
-            firebase_admin.initialize_app(cred)
-        self.db = firestore.client()
+        self._db = None
+        self._db_generation = None
+    
+    @property
+    def db(self):
+        """Firestore client, created on first use and again in each forked worker"""
+        if self._db is None or self._db_generation != startup.fork_generation:
+            init_firebase()
+            self._db = firestore.client()
+            self._db_generation = startup.fork_generation
+        return self._db
+    
+    def _timeout(self):
+        """Per-RPC timeout, shrunk to what is left of the request budget"""
+        return call_timeout(Config.FIRESTORE_TIMEOUT, 'firestore')
     
+    @guarded(firestore_breaker)
+    def ping(self):
+        """Cheap read that forces the gRPC channel handshake"""
+        list(self.db.collection('menu').limit(1).stream(timeout=self._timeout()))
+    
+    @guarded(firestore_breaker)
     def get_menu_items(self):
         """Get all menu items"""
-        menu_items = self.db.collection('menu').stream()
+        menu_items = self.db.collection('menu').stream(timeout=self._timeout())
         items = []
         for item in menu_items:
             data = item.to_dict()
@@ -22,8 +79,12 @@ class DatabaseManager:
     
     def get_menu_item(self, item_id):
         """Get single menu item"""
+        return document_reads.do(('menu', item_id), lambda: self._fetch_menu_item(item_id))
+    
+    @guarded(firestore_breaker)
+    def _fetch_menu_item(self, item_id):
         item_ref = self.db.collection('menu').document(item_id)
-        item = item_ref.get()
+        item = item_ref.get(timeout=self._timeout())
         if item.exists:
             data = item.to_dict()
             data['id'] = item.id
@@ -31,9 +92,10 @@ class DatabaseManager:
         return None
     
     # NEW ADDON METHODS
+    @guarded(firestore_breaker)
     def get_addons(self):
         """Get all addons"""
-        addons = self.db.collection('addons').stream()
+        addons = self.db.collection('addons').stream(timeout=self._timeout())
         addon_list = []
         for addon in addons:
             data = addon.to_dict()
@@ -41,9 +103,10 @@ class DatabaseManager:
             addon_list.append(data)
         return addon_list
     
+    @guarded(firestore_breaker)
     def get_available_addons(self):
         """Get only available addons"""
-        addons = self.db.collection('addons').where('available', '==', True).stream()
+        addons = self.db.collection('addons').where('available', '==', True).stream(timeout=self._timeout())
         addon_list = []
         for addon in addons:
             data = addon.to_dict()
@@ -53,66 +116,313 @@ class DatabaseManager:
     
     def get_addon(self, addon_id):
         """Get single addon"""
+        return document_reads.do(('addon', addon_id), lambda: self._fetch_addon(addon_id))
+    
+    @guarded(firestore_breaker)
+    def _fetch_addon(self, addon_id):
         addon_ref = self.db.collection('addons').document(addon_id)
-        addon = addon_ref.get()
+        addon = addon_ref.get(timeout=self._timeout())
         if addon.exists:
             data = addon.to_dict()
             data['id'] = addon.id
             return data
         return None
     
+    @guarded(firestore_breaker)
     def add_addon(self, addon_data):
         """Add new addon"""
         addon_data['created_at'] = firestore.SERVER_TIMESTAMP
-        self.db.collection('addons').add(addon_data)
+        self.db.collection('addons').add(addon_data, timeout=self._timeout())
     
+    @guarded(firestore_breaker)
     def update_addon(self, addon_id, data):
         """Update addon"""
-        self.db.collection('addons').document(addon_id).update(data)
+        self.db.collection('addons').document(addon_id).update(data, timeout=self._timeout())
     
+    @guarded(firestore_breaker)
     def delete_addon(self, addon_id):
         """Delete addon"""
-        self.db.collection('addons').document(addon_id).delete()
-    
-    def get_rice_addon(self):
-        """Get rice addon specifically"""
-        rice_query = self.db.collection('addons').where('name', '==', 'Rice').limit(1).stream()
-        for rice in rice_query:
-            data = rice.to_dict()
-            data['id'] = rice.id
-            return data
-        return None
+        self.db.collection('addons').document(addon_id).delete(timeout=self._timeout())
     
     # EXISTING METHODS (unchanged)
+    @guarded(firestore_breaker)
     def save_order(self, order_data):
-        """Save order to database with tracking status"""
+        """Save order to database with tracking status
+        
+        The order doc is created only if absent, so saving the same order
+        again (a retry after a lost response) writes nothing and returns False.
+        """
         # Use Firestore server timestamp for consistency
         order_data['created_at'] = firestore.SERVER_TIMESTAMP
         order_data['status'] = order_data.get('status', 'paid')
         order_data['order_status'] = order_data.get('order_status', 'preparing')  # Set default tracking status
         order_data['status_updated_at'] = firestore.SERVER_TIMESTAMP
+        order_data['business_date'] = order_data.get('business_date') or business_date()
         
         # Debug print
-        print(f"Saving order: {order_data['order_id']} with status: {order_data['order_status']}")
+        tasks.log("Saving order: %s with status: %s", order_data['order_id'], order_data['order_status'])
+        
+        # Order and its daily sales rollup are written atomically
+        batch = self.db.batch()
+        batch.create(self.db.collection('orders').document(order_data['order_id']), order_data)
+        self._add_to_sales_rollup(batch, order_data['business_date'], order_contribution(order_data))
+        if order_data['order_status'] == 'preparing':
+            self._add_to_production_sheet(batch, production_contribution(order_data))
+        self._add_to_stock_counters(batch, order_data['business_date'], stock_contribution(order_data))
+        try:
+            batch.commit(timeout=self._timeout())
+        except google_exceptions.AlreadyExists:
+            # Already saved: the whole batch is rejected, so nothing is counted twice
+            tasks.log("Order %s already saved, skipping duplicate", order_data['order_id'])
+            return False
+        order_cache.invalidate(order_data['order_id'])
+        payment_status_cache.invalidate(order_data['order_id'])
+        return True
+    
+    def _add_to_sales_rollup(self, batch, day, contribution):
+        """Queue an increment of the rollup doc for a day"""
+        rollup = as_increments(contribution, firestore.Increment)
+        rollup['date'] = day
+        rollup['updated_at'] = firestore.SERVER_TIMESTAMP
+        rollup_ref = self.db.collection(ROLLUP_COLLECTION).document(day)
+        batch.set(rollup_ref, rollup, merge=True)
+    
+    def _add_to_production_sheet(self, batch, contribution):
+        """Queue an increment of the kitchen production sheet"""
+        sheet = as_increments(contribution, firestore.Increment)
+        sheet['updated_at'] = firestore.SERVER_TIMESTAMP
+        batch.set(self._production_ref(), sheet, merge=True)
+    
+    def _add_to_stock_counters(self, batch, day, sold):
+        """Queue increments of the day's sold counters, each on a random shard
         
-        self.db.collection('orders').document(order_data['order_id']).set(order_data)
+        Simultaneous checkouts of the same dish land on different shard docs
+        instead of queueing on one hot document.
+        """
+        for item_id, quantity in sold.items():
+            shard = random.randrange(Config.STOCK_SHARDS)
+            shard_ref = self.db.collection(STOCK_COLLECTION).document(stock_shard_id(day, item_id, shard))
+            batch.set(shard_ref, {
+                'date': day,
+                'item_id': item_id,
+                'sold': firestore.Increment(quantity)
+            }, merge=True)
+    
+    def _stock_refs(self, day, item_ids):
+        return [self.db.collection(STOCK_COLLECTION).document(stock_shard_id(day, item_id, shard))
+                for item_id in set(item_ids) for shard in range(Config.STOCK_SHARDS)]
+    
+    @guarded(firestore_breaker)
+    def get_stock_sold_for(self, day, item_ids):
+        """Portions sold on a day for just these items, in one batched read of their shards"""
+        refs = self._stock_refs(day, item_ids)
+        sold = {item_id: 0 for item_id in item_ids}
+        if not refs:
+            return sold
+        for snapshot in self.db.get_all(refs, timeout=self._timeout()):
+            if snapshot.exists:
+                data = snapshot.to_dict()
+                sold[data['item_id']] = sold.get(data['item_id'], 0) + int(data.get('sold', 0) or 0)
+        return sold
+    
+    def _production_ref(self):
+        return self.db.collection(PRODUCTION_COLLECTION).document(PRODUCTION_DOC)
+    
+    def _queue_status_aggregates(self, batch, orders, order_status):
+        """Queue rollup and production sheet changes for a status transition
+        
+        Returns True when anything besides the order docs needs writing.
+        """
+        done_by_day = {}
+        production = {}
+        for order in orders:
+            previous_status = order.get('order_status', 'preparing')
+            if order_status == 'done' and previous_status != 'done':
+                merge_contribution(done_by_day.setdefault(order_business_date(order), {}), done_contribution(order))
+            if previous_status == 'preparing' and order_status != 'preparing':
+                merge_contribution(production, production_contribution(order, -1))
+            elif previous_status != 'preparing' and order_status == 'preparing':
+                merge_contribution(production, production_contribution(order, 1))
+        
+        for day, totals in done_by_day.items():
+            self._add_to_sales_rollup(batch, day, totals)
+        if production:
+            self._add_to_production_sheet(batch, production)
+        return bool(done_by_day or production)
+    
+    @guarded(firestore_breaker)
+    def claim_idempotency_key(self, record_id, record):
+        """Create an idempotency record if absent; returns None if created, else the existing one"""
+        record_ref = self.db.collection(IDEMPOTENCY_COLLECTION).document(record_id)
+        try:
+            record_ref.create(record, timeout=self._timeout())
+            return None
+        except google_exceptions.AlreadyExists:
+            existing = record_ref.get(timeout=self._timeout())
+            if existing.exists:
+                return existing.to_dict()
+            # Released in between: report it as in progress so the client retries
+            return dict(record)
+    
+    @guarded(firestore_breaker)
+    def save_idempotency_key(self, record_id, record):
+        """Store the finished response of an idempotent request"""
+        self.db.collection(IDEMPOTENCY_COLLECTION).document(record_id).set(record, timeout=self._timeout())
+    
+    @guarded(firestore_breaker)
+    def delete_idempotency_key(self, record_id):
+        """Drop an idempotency record so the key can be used again"""
+        self.db.collection(IDEMPOTENCY_COLLECTION).document(record_id).delete(timeout=self._timeout())
     
     def get_order(self, order_id):
         """Get order by ID"""
+        return document_reads.do(('order', order_id), lambda: self._fetch_order(order_id))
+    
+    @guarded(firestore_breaker)
+    def _fetch_order(self, order_id):
         try:
             order_ref = self.db.collection('orders').document(order_id)
-            order = order_ref.get()
+            order = order_ref.get(timeout=self._timeout())
             if order.exists:
                 data = order.to_dict()
-                print(f"Retrieved order: {order_id}, status: {data.get('order_status', 'unknown')}")  # Debug print
+                tasks.log("Retrieved order: %s, status: %s", order_id, data.get('order_status', 'unknown'))  # Debug print
                 return data
-            else:
-                print(f"Order not found: {order_id}")  # Debug print
-                return None
+            
+            # Completed orders may have been moved out of the hot collection
+            archived = self.get_archived_order(order_id)
+            if archived:
+                tasks.log("Retrieved archived order: %s", order_id)  # Debug print
+                return archived
+            
+            tasks.log("Order not found: %s", order_id)  # Debug print
+            return None
+        except DeadlineExceededError:
+            raise
         except Exception as e:
-            print(f"Error retrieving order {order_id}: {str(e)}")
+            firestore_breaker.note_failure(e)
+            tasks.log("Error retrieving order %s: %s", order_id, str(e))
+            return None
+    
+    def get_order_cached(self, order_id, cache_missing=True):
+        """Get order by ID through the short-TTL status cache (polling endpoints)
+        
+        Pass cache_missing=False for orders known to exist, so a miss cached
+        before they were saved (e.g. by verify-payment) isn't served.
+        """
+        return order_cache.get_order(order_id, self.get_order, cache_missing)
+    
+    @guarded(firestore_breaker)
+    def get_archived_order(self, order_id):
+        """Get an order from its archive partition"""
+        collection = archive_collection_for(order_id)
+        if not collection:
             return None
+        order = self.db.collection(collection).document(order_id).get(timeout=self._timeout())
+        return order.to_dict() if order.exists else None
+    
+    @guarded(firestore_breaker)
+    def archive_done_orders(self, cutoff, batch_size=250):
+        """Move orders marked done before cutoff into monthly archive collections
+        
+        Each order is copied and deleted in the same batch (2 writes per order,
+        so 250 orders per 500-write batch). Pages by status_updated_at so only
+        a single-field index is needed; orders that aren't done are skipped.
+        """
+        query = (self.db.collection('orders')
+                 .where('status_updated_at', '<', cutoff)
+                 .order_by('status_updated_at'))
+        
+        archived = 0
+        last_doc = None
+        while True:
+            page = query.limit(batch_size)
+            if last_doc is not None:
+                page = page.start_after(last_doc)
+            docs = list(page.stream(timeout=self._timeout()))
+            
+            batch = self.db.batch()
+            pending = 0
+            for doc in docs:
+                data = doc.to_dict()
+                if data.get('order_status') != 'done':
+                    continue
+                data['archived_at'] = firestore.SERVER_TIMESTAMP
+                batch.set(self.db.collection(archive_collection_for(doc.id, data)).document(doc.id), data)
+                batch.delete(doc.reference)
+                pending += 1
+            if pending:
+                batch.commit(timeout=self._timeout())
+                archived += pending
+            
+            if len(docs) < batch_size:
+                break
+            last_doc = docs[-1]
+        
+        print(f"Archived {archived} done orders older than {cutoff.isoformat()}")
+        return archived
+    
+    @guarded(firestore_breaker)
+    def _archive_collections(self, start=None, end=None):
+        """Archive collections whose month overlaps [start, end)"""
+        # Partitions follow the payment time in the order id, which can be a
+        # little before created_at, so look one day further back
+        first_month = business_date(start - timedelta(days=1))[:7] if start is not None else None
+        last_month = business_date(end)[:7] if end is not None else None
+        names = []
+        for collection in self.db.collections(timeout=self._timeout()):
+            if not collection.id.startswith(ARCHIVE_PREFIX):
+                continue
+            month = archive_month(collection.id)
+            if (first_month and month < first_month) or (last_month and month > last_month):
+                continue
+            names.append(collection.id)
+        return sorted(names)
+    
+    @guarded(firestore_breaker)
+    def get_orders(self, order_ids):
+        """Get many orders in one batched read, keyed by order ID"""
+        refs = [self.db.collection('orders').document(order_id) for order_id in order_ids]
+        orders = {}
+        for snapshot in self.db.get_all(refs, timeout=self._timeout()):
+            if snapshot.exists:
+                data = snapshot.to_dict()
+                data['id'] = snapshot.id
+                orders[snapshot.id] = data
+        return orders
+
+    def get_catalog_documents(self, menu_ids, addon_ids):
+        """Get menu items and addons in one batched read, as ({menu_id: item}, {addon_id: addon})"""
+        menu_items, addons, _ = self.get_checkout_documents(menu_ids, addon_ids, None, [])
+        return menu_items, addons
     
+    @guarded(firestore_breaker)
+    def get_checkout_documents(self, menu_ids, addon_ids, day, stock_ids):
+        """Menu items, addons and the day's sold counts of stock_ids in one batched read
+        
+        Returns ({menu_id: item}, {addon_id: addon}, {stock_id: sold}).
+        """
+        refs = [self.db.collection('menu').document(item_id) for item_id in set(menu_ids)]
+        refs += [self.db.collection('addons').document(addon_id) for addon_id in set(addon_ids)]
+        refs += self._stock_refs(day, stock_ids)
+        menu_items = {}
+        addons = {}
+        sold = {item_id: 0 for item_id in stock_ids}
+        if not refs:
+            return menu_items, addons, sold
+        for snapshot in self.db.get_all(refs, timeout=self._timeout()):
+            if not snapshot.exists:
+                continue
+            data = snapshot.to_dict()
+            collection = snapshot.reference.parent.id
+            if collection == STOCK_COLLECTION:
+                sold[data['item_id']] = sold.get(data['item_id'], 0) + int(data.get('sold', 0) or 0)
+                continue
+            data['id'] = snapshot.id
+            target = menu_items if collection == 'menu' else addons
+            target[snapshot.id] = data
+        return menu_items, addons, sold
+
+    @guarded(firestore_breaker)
     def get_orders_by_phone(self, phone_number):
         """Get orders by customer phone number (excluding completed orders)"""
         try:
@@ -120,7 +430,7 @@ class DatabaseManager:
             orders_ref = self.db.collection('orders')
             query = orders_ref.where('customer.phone', '==', phone_number)
             
-            orders = query.limit(50).stream()
+            orders = query.limit(50).stream(timeout=self._timeout())
             order_list = []
             
             for order in orders:
@@ -135,16 +445,20 @@ class DatabaseManager:
             # Sort by created_at in Python (newest first)
             order_list.sort(key=lambda x: x.get('created_at', 0), reverse=True)
             
-            print(f"Found {len(order_list)} active orders for phone: {phone_number}")  # Debug print
+            tasks.log("Found %s active orders for phone: %s", len(order_list), phone_number)  # Debug print
             return order_list
             
+        except DeadlineExceededError:
+            raise
         except Exception as e:
-            print(f"Error getting orders by phone {phone_number}: {str(e)}")
+            firestore_breaker.note_failure(e)
+            tasks.log("Error getting orders by phone %s: %s", phone_number, str(e))
             return []
     
+    @guarded(firestore_breaker)
     def get_recent_orders(self, limit=50):
         """Get recent orders for admin"""
-        orders = self.db.collection('orders').order_by('created_at', direction=firestore.Query.DESCENDING).limit(limit).stream()
+        orders = self.db.collection('orders').order_by('created_at', direction=firestore.Query.DESCENDING).limit(limit).stream(timeout=self._timeout())
         order_list = []
         for order in orders:
             data = order.to_dict()
@@ -152,19 +466,53 @@ class DatabaseManager:
             order_list.append(data)
         return order_list
     
+    @guarded(firestore_breaker)
     def add_menu_item(self, menu_item):
         """Add new menu item"""
         menu_item['created_at'] = firestore.SERVER_TIMESTAMP
-        self.db.collection('menu').add(menu_item)
+        self.db.collection('menu').add(menu_item, timeout=self._timeout())
     
+    @guarded(firestore_breaker)
     def update_menu_item(self, item_id, data):
         """Update menu item"""
-        self.db.collection('menu').document(item_id).update(data)
+        self.db.collection('menu').document(item_id).update(data, timeout=self._timeout())
     
+    @guarded(firestore_breaker)
     def delete_menu_item(self, item_id):
         """Delete menu item"""
-        self.db.collection('menu').document(item_id).delete()
+        self.db.collection('menu').document(item_id).delete(timeout=self._timeout())
+    
+    @guarded(firestore_breaker)
+    def apply_catalog_changes(self, collection, creates, updates, batch_size=500):
+        """Write new and changed menu/addon docs in WriteBatch chunks"""
+        collection_ref = self.db.collection(collection)
+        batch = self.db.batch()
+        pending = 0
+        commits = 0
+        
+        operations = [(collection_ref.document(), item, True) for item in creates]
+        operations += [(collection_ref.document(update['id']), update['changes'], False) for update in updates]
+        
+        for doc_ref, data, is_new in operations:
+            if is_new:
+                batch.set(doc_ref, dict(data, created_at=firestore.SERVER_TIMESTAMP))
+            else:
+                batch.update(doc_ref, data)
+            pending += 1
+            if pending == batch_size:
+                batch.commit(timeout=self._timeout())
+                commits += 1
+                batch = self.db.batch()
+                pending = 0
+        
+        if pending:
+            batch.commit(timeout=self._timeout())
+            commits += 1
+        
+        tasks.log("Catalog import on %s: %s created, %s updated in %s batch(es)", collection, len(creates), len(updates), commits)
+        return commits
     
+    @guarded(firestore_breaker)
     def update_order_status(self, order_id, status, transaction_status=None):
         """Update order payment status"""
         update_data = {
@@ -174,27 +522,192 @@ class DatabaseManager:
         if transaction_status:
             update_data['transaction_status'] = transaction_status
         
-        print(f"Updating order {order_id} payment status to: {status}")  # Debug print
-        self.db.collection('orders').document(order_id).update(update_data)
+        tasks.log("Updating order %s payment status to: %s", order_id, status)  # Debug print
+        self.db.collection('orders').document(order_id).update(update_data, timeout=self._timeout())
+        order_cache.invalidate(order_id)
     
+    @guarded(firestore_breaker)
     def update_order_tracking_status(self, order_id, order_status, notes=None):
-        """Update order tracking status (preparing/ready)"""
+        """Update order tracking status (preparing/ready/done)
+        
+        Returns None on success, or why the order couldn't be moved. The
+        sales rollup and the kitchen production sheet follow the transition.
+        """
+        tasks.log("Updating order %s tracking status to: %s", order_id, order_status)  # Debug print
+        _, rejected = self._transition_orders([order_id], order_status, notes)
+        return rejected.get(order_id)
+    
+    @guarded(firestore_breaker)
+    def bulk_update_order_tracking_status(self, order_ids, order_status, notes=None):
+        """Move many orders to one tracking status in a single transaction
+        
+        Returns (updated, rejected): order ID to previous status for the
+        orders that moved, and order ID to an error for the rest. Done
+        transitions are folded into one rollup write per day and the
+        production sheet gets a single combined increment.
+        """
+        tasks.log("Bulk updating %s orders tracking status to: %s", len(order_ids), order_status)  # Debug print
+        return self._transition_orders(order_ids, order_status, notes)
+    
+    def _transition_orders(self, order_ids, order_status, notes):
+        """Re-read the orders and write the new status in one transaction
+        
+        The transition check and the rollup/production increments use the
+        order as it is inside the transaction, so a repeated or concurrent
+        request for the same change finds it already made and counts nothing.
+        """
         update_data = {
             'order_status': order_status,
             'status_updated_at': firestore.SERVER_TIMESTAMP
         }
         if notes:
             update_data['admin_notes'] = notes
+        refs = [self.db.collection('orders').document(order_id) for order_id in order_ids]
+        
+        @firestore.transactional
+        def apply(transaction):
+            # Rebuilt on every attempt, since Firestore retries on contention
+            updated, rejected, moving = {}, {}, []
+            snapshots = {snapshot.id: snapshot
+                         for snapshot in self.db.get_all(refs, transaction=transaction, timeout=self._timeout())}
+            for ref in refs:
+                snapshot = snapshots.get(ref.id)
+                if snapshot is None or not snapshot.exists:
+                    rejected[ref.id] = 'Order not found'
+                    continue
+                order = snapshot.to_dict()
+                previous = order.get('order_status', 'preparing')
+                if not can_transition(previous, order_status):
+                    rejected[ref.id] = f"Cannot change a {previous} order to {order_status}"
+                    continue
+                transaction.update(ref, update_data)
+                updated[ref.id] = previous
+                moving.append(order)
+            self._queue_status_aggregates(transaction, moving, order_status)
+            return updated, rejected
+        
+        updated, rejected = apply(self.db.transaction())
+        for order_id in updated:
+            order_cache.invalidate(order_id)
+        return updated, rejected
+    
+    @guarded(firestore_breaker)
+    def get_production_sheet(self):
+        """Get outstanding quantities across all preparing orders"""
+        snapshot = self._production_ref().get(timeout=self._timeout())
+        return summarize_production(snapshot.to_dict() if snapshot.exists else {})
+    
+    def watch_production_sheet(self, callback):
+        """Call callback(sheet) on every change to the production sheet doc"""
+        def on_snapshot(snapshots, changes, read_time):
+            for snapshot in snapshots:
+                callback(summarize_production(snapshot.to_dict() or {}))
+        return self._production_ref().on_snapshot(on_snapshot)
+    
+    @guarded(firestore_breaker)
+    def rebuild_production_sheet(self):
+        """Recompute the production sheet from the preparing orders"""
+        sheet = {}
+        orders = self.db.collection('orders').where('order_status', '==', 'preparing').stream(timeout=self._timeout())
+        for order in orders:
+            merge_contribution(sheet, production_contribution(order.to_dict()))
+        sheet.setdefault('order_count', 0)
+        sheet.setdefault('items', {})
+        sheet['updated_at'] = firestore.SERVER_TIMESTAMP
+        self._production_ref().set(sheet, timeout=self._timeout())
+        tasks.log("Rebuilt production sheet from %s preparing orders", sheet['order_count'])
+        return sheet['order_count']
+    
+    def iter_orders(self, start=None, end=None, page_size=500, include_archive=True):
+        """Yield orders oldest first, one cursor page at a time
+        
+        start/end are datetimes bounding created_at (end is exclusive).
+        Matching archive partitions are read before the hot collection.
+        """
+        collections = self._archive_collections(start, end) if include_archive else []
+        for collection in collections + ['orders']:
+            yield from self._iter_collection(collection, start, end, page_size)
+    
+    def _iter_collection(self, collection, start, end, page_size):
+        query = self.db.collection(collection).order_by('created_at')
+        if start is not None:
+            query = query.where('created_at', '>=', start)
+        if end is not None:
+            query = query.where('created_at', '<', end)
+        
+        last_doc = None
+        while True:
+            page = query.limit(page_size)
+            if last_doc is not None:
+                page = page.start_after(last_doc)
+            
+            docs = list(page.stream(timeout=self._timeout()))
+            for doc in docs:
+                data = doc.to_dict()
+                data['id'] = doc.id
+                yield data
+            
+            if len(docs) < page_size:
+                break
+            last_doc = docs[-1]
+    
+    @guarded(firestore_breaker)
+    def get_sales_rollups(self, start_date, end_date):
+        """Get daily rollup docs between two YYYY-MM-DD dates (inclusive)"""
+        query = (self.db.collection(ROLLUP_COLLECTION)
+                 .where('date', '>=', start_date)
+                 .where('date', '<=', end_date)
+                 .order_by('date'))
+        days = []
+        for doc in query.stream(timeout=self._timeout()):
+            data = doc.to_dict()
+            data['date'] = data.get('date', doc.id)
+            days.append(data)
+        return days
+    
+    @guarded(firestore_breaker)
+    def backfill_sales_rollups(self, chunk_size=500):
+        """Rebuild every daily rollup from the orders collection
+        
+        Orders are streamed in cursor pages so memory only holds the per-day
+        totals; the rollup docs are then overwritten in batches.
+        """
+        days = {}
+        order_count = 0
+        for order in self.iter_orders(page_size=chunk_size):
+            day = order_business_date(order)
+            totals = days.setdefault(day, {})
+            merge_contribution(totals, order_contribution(order))
+            if order.get('order_status') == 'done':
+                merge_contribution(totals, done_contribution(order))
+            order_count += 1
+            if order_count % chunk_size == 0:
+                print(f"Backfill: read {order_count} orders")
+        
+        batch = self.db.batch()
+        pending = 0
+        for day, totals in days.items():
+            totals['date'] = day
+            totals['updated_at'] = firestore.SERVER_TIMESTAMP
+            batch.set(self.db.collection(ROLLUP_COLLECTION).document(day), totals)
+            pending += 1
+            if pending == 500:  # Firestore batch limit
+                batch.commit(timeout=self._timeout())
+                batch = self.db.batch()
+                pending = 0
+        if pending:
+            batch.commit(timeout=self._timeout())
         
-        print(f"Updating order {order_id} tracking status to: {order_status}")  # Debug print
-        self.db.collection('orders').document(order_id).update(update_data)
+        print(f"Backfill: rebuilt {len(days)} daily rollups from {order_count} orders")
+        return {'orders': order_count, 'days': len(days)}
     
+    @guarded(firestore_breaker)
     def get_orders_for_admin(self, status_filter=None):
         """Get orders for admin with optional status filter"""
         try:
             query = self.db.collection('orders').order_by('created_at', direction=firestore.Query.DESCENDING)
             
-            orders = query.limit(200).stream()
+            orders = query.limit(200).stream(timeout=self._timeout())
             order_list = []
             
             for order in orders:
@@ -217,10 +730,14 @@ class DatabaseManager:
             
             return order_list
             
+        except DeadlineExceededError:
+            raise
         except Exception as e:
-            print(f"Error getting orders for admin: {str(e)}")
+            firestore_breaker.note_failure(e)
+            tasks.log("Error getting orders for admin: %s", str(e))
             return []
     
+    @guarded(firestore_breaker)
     def get_active_orders_for_admin(self):
         """Get active orders for admin dashboard (preparing and ready only)"""
         try:
@@ -228,7 +745,7 @@ class DatabaseManager:
             orders_ref = self.db.collection('orders')
             query = orders_ref.order_by('created_at', direction=firestore.Query.DESCENDING)
             
-            orders = query.limit(200).stream()  # Get more to account for filtering
+            orders = query.limit(200).stream(timeout=self._timeout())  # Get more to account for filtering
             order_list = []
             
             for order in orders:
@@ -246,6 +763,9 @@ class DatabaseManager:
             
             return order_list
             
+        except DeadlineExceededError:
+            raise
         except Exception as e:
-            print(f"Error getting active orders for admin: {str(e)}")
+            firestore_breaker.note_failure(e)
+            tasks.log("Error getting active orders for admin: %s", str(e))
             return []
\ No newline at end of file
@@ -0,0 +1,185 @@
+# rollups.py - Pre-aggregated daily sales figures kept next to the orders
+from datetime import datetime, timedelta, timezone
+from config import Config
+
+ROLLUP_COLLECTION = 'sales_daily'
+PRODUCTION_COLLECTION = 'kitchen'
+PRODUCTION_DOC = 'production'
+# Portions sold per item per business day, split over shards (see stock_shard_id)
+STOCK_COLLECTION = 'stock_daily'
+
+def business_date(moment=None):
+    """Calendar day (YYYY-MM-DD) in the kitchen's timezone"""
+    if moment is None:
+        moment = datetime.now(timezone.utc)
+    elif moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    local = moment.astimezone(timezone.utc) + timedelta(hours=Config.BUSINESS_UTC_OFFSET_HOURS)
+    return local.date().isoformat()
+
+def business_day_start(day):
+    """UTC datetime at which a YYYY-MM-DD business day begins"""
+    local_midnight = datetime.fromisoformat(day).replace(tzinfo=timezone.utc)
+    return local_midnight - timedelta(hours=Config.BUSINESS_UTC_OFFSET_HOURS)
+
+ARCHIVE_PREFIX = 'orders_archive_'
+
+def archive_collection_for(order_id, order=None):
+    """Archive collection (orders_archive_YYYY_MM) an order belongs to
+
+    The month comes from the timestamp embedded in ORDER-<unix>-<hex> ids so a
+    lookup by id alone can find the right partition; other ids fall back to
+    the order's business date.
+    """
+    parts = str(order_id).split('-')
+    if len(parts) >= 3 and parts[0] == 'ORDER' and parts[1].isdigit():
+        day = business_date(datetime.fromtimestamp(int(parts[1]), timezone.utc))
+    elif order is not None:
+        day = order_business_date(order)
+    else:
+        return None
+    return ARCHIVE_PREFIX + day[:7].replace('-', '_')
+
+def archive_month(collection_name):
+    """YYYY-MM for an archive collection name"""
+    return collection_name[len(ARCHIVE_PREFIX):].replace('_', '-')
+
+def order_business_date(order):
+    """Day an order counts towards, falling back to its created_at"""
+    if order.get('business_date'):
+        return order['business_date']
+    created_at = order.get('created_at')
+    if isinstance(created_at, datetime):
+        return business_date(created_at)
+    return business_date()
+
+def _item_key(item):
+    return f"{item.get('type', 'menu')}_{item.get('id')}"
+
+def order_contribution(order):
+    """Totals a single paid order adds to its day"""
+    items = {}
+    for item in order.get('items', []) or []:
+        quantity = int(item.get('quantity', 0) or 0)
+        gross = int(item.get('total', 0) or 0)
+        entry = items.setdefault(_item_key(item), {
+            'id': item.get('id'),
+            'name': item.get('name', ''),
+            'type': item.get('type', 'menu'),
+            'quantity': 0,
+            'gross': 0
+        })
+        entry['quantity'] += quantity
+        entry['gross'] += gross
+
+    return {
+        'order_count': 1,
+        'gross': int(order.get('total', 0) or 0),
+        'items': items
+    }
+
+def done_contribution(order):
+    """Totals an order adds to its day when it is marked done"""
+    return {
+        'done_count': 1,
+        'done_gross': int(order.get('total', 0) or 0)
+    }
+
+def production_contribution(order, sign=1):
+    """Quantities an order adds to (sign=1) or removes from (sign=-1) the production sheet"""
+    items = {}
+    for item in order.get('items', []) or []:
+        entry = items.setdefault(_item_key(item), {
+            'id': item.get('id'),
+            'name': item.get('name', ''),
+            'type': item.get('type', 'menu'),
+            'quantity': 0
+        })
+        entry['quantity'] += sign * int(item.get('quantity', 0) or 0)
+
+    return {
+        'order_count': sign,
+        'items': items
+    }
+
+def stock_contribution(order):
+    """Portions an order takes out of the day's stock, by item id
+
+    Only lines checkout marked stock_limited count; unlimited items have no counters.
+    """
+    sold = {}
+    for item in order.get('items', []) or []:
+        if item.get('type', 'menu') != 'menu' or not item.get('id') or not item.get('stock_limited'):
+            continue
+        sold[item['id']] = sold.get(item['id'], 0) + int(item.get('quantity', 0) or 0)
+    return sold
+
+def stock_shard_id(day, item_id, shard):
+    """Doc id of one counter shard; ids are fixed so a day's shards can be batch-read"""
+    return f'{day}_{item_id}_{shard}'
+
+def summarize_production(sheet):
+    """Outstanding items on the production sheet, largest quantity first"""
+    items = [item for item in (sheet.get('items') or {}).values() if item.get('quantity', 0) > 0]
+    items.sort(key=lambda i: (i.get('type') != 'menu', -i.get('quantity', 0), i.get('name', '')))
+    updated_at = sheet.get('updated_at')
+    return {
+        'order_count': max(sheet.get('order_count', 0), 0),
+        'items': items,
+        'updated_at': updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at
+    }
+
+def as_increments(contribution, increment):
+    """Wrap every numeric leaf so it can be merged into an existing rollup doc"""
+    result = {}
+    for key, value in contribution.items():
+        if isinstance(value, dict):
+            result[key] = as_increments(value, increment)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            result[key] = increment(value)
+        else:
+            result[key] = value
+    return result
+
+def merge_contribution(total, contribution):
+    """Add a contribution into an in-memory rollup (used by the backfill)"""
+    for key, value in contribution.items():
+        if isinstance(value, dict):
+            merge_contribution(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+        else:
+            total.setdefault(key, value)
+    return total
+
+def summarize_rollups(days, start_date, end_date):
+    """Combine daily rollup docs into one report for a date range"""
+    summary = {
+        'start': start_date,
+        'end': end_date,
+        'order_count': 0,
+        'gross': 0,
+        'done_count': 0,
+        'done_gross': 0,
+        'days': [],
+        'items': []
+    }
+    items = {}
+
+    for day in sorted(days, key=lambda d: d.get('date', '')):
+        summary['order_count'] += day.get('order_count', 0)
+        summary['gross'] += day.get('gross', 0)
+        summary['done_count'] += day.get('done_count', 0)
+        summary['done_gross'] += day.get('done_gross', 0)
+        summary['days'].append({
+            'date': day.get('date'),
+            'order_count': day.get('order_count', 0),
+            'gross': day.get('gross', 0),
+            'done_count': day.get('done_count', 0)
+        })
+        for key, item in (day.get('items') or {}).items():
+            merge_contribution(items.setdefault(key, {}), item)
+
+    # Best sellers first
+    summary['items'] = sorted(items.values(), key=lambda i: (i.get('quantity', 0), i.get('gross', 0)), reverse=True)
+    return summary
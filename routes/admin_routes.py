@@ -1,6 +1,17 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context, send_file, abort
+from datetime import date, timedelta
 from models.database import DatabaseManager
+from models.rollups import business_date, business_day_start, summarize_rollups
+from services.export import stream_csv, stream_jsonl
+from services.production import production_feed
+from services.resilience import clear_request_deadline
+from services.addon_rules import validate_auto_rules
+from services.catalog_import import build_menu_item, build_addon, parse_upload, diff_catalog, parse_daily_stock, BUILDERS
 from services.auth import verify_admin_credentials, require_admin
+from services.catalog import catalog
+from services.stock import stock
+from services.profiler import profiler, MODES, TRIGGER_HEADER
+from services.tasks import tasks
 
 admin_bp = Blueprint('admin', __name__)
 db_manager = DatabaseManager()
@@ -43,7 +54,7 @@ def dashboard():
                              preparing_orders=preparing_orders,
                              ready_orders=ready_orders)
     except Exception as e:
-        print(f"Admin dashboard error: {str(e)}")  # Debug print
+        tasks.log("Admin dashboard error: %s", str(e))  # Debug print
         return render_template('admin_dashboard.html', 
                              error=str(e),
                              preparing_orders=[],
@@ -66,6 +77,9 @@ def menu():
     """Admin menu management page"""
     try:
         items = db_manager.get_menu_items()
+        remaining = stock.remaining_for(items)
+        for item in items:
+            item['stock_remaining'] = remaining[item['id']]
         return render_template('admin_menu.html', items=items)
     except Exception as e:
         return render_template('admin_menu.html', items=[], error=str(e))
@@ -80,6 +94,79 @@ def addons():
     except Exception as e:
         return render_template('admin_addons.html', addons=[], error=str(e))
 
+@admin_bp.route('/admin/reports')
+@require_admin
+def reports():
+    """Admin sales reports page"""
+    return render_template('admin_reports.html')
+
+@admin_bp.route('/admin/api/reports/sales')
+@require_admin
+def sales_report():
+    """Revenue and best sellers for a date range, read from the daily rollups"""
+    try:
+        end_date = request.args.get('end') or business_date()
+        start_date = request.args.get('start') or (date.fromisoformat(end_date) - timedelta(days=6)).isoformat()
+        
+        # Validate YYYY-MM-DD
+        try:
+            if date.fromisoformat(start_date) > date.fromisoformat(end_date):
+                return jsonify({'success': False, 'error': 'Start date must be before end date'})
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Dates must be YYYY-MM-DD'})
+        
+        days = db_manager.get_sales_rollups(start_date, end_date)
+        return jsonify({'success': True, 'report': summarize_rollups(days, start_date, end_date)})
+    
+    except Exception as e:
+        tasks.log("Sales report error: %s", str(e))
+        return jsonify({'success': False, 'error': str(e)})
+
+@admin_bp.route('/admin/api/export/orders')
+@require_admin
+def export_orders():
+    """Stream orders for a date range as CSV or JSONL"""
+    try:
+        start_date = request.args.get('start')
+        end_date = request.args.get('end') or business_date()
+        export_format = request.args.get('format', 'csv')
+        flatten = request.args.get('flatten') in ['1', 'true', 'yes']
+        
+        if not start_date:
+            return jsonify({'success': False, 'error': 'start date is required'})
+        if export_format not in ['csv', 'jsonl']:
+            return jsonify({'success': False, 'error': 'format must be csv or jsonl'})
+        try:
+            if date.fromisoformat(start_date) > date.fromisoformat(end_date):
+                return jsonify({'success': False, 'error': 'Start date must be before end date'})
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Dates must be YYYY-MM-DD'})
+        
+        # End date is inclusive, so stop at the start of the following day
+        start = business_day_start(start_date)
+        end = business_day_start((date.fromisoformat(end_date) + timedelta(days=1)).isoformat())
+        orders = db_manager.iter_orders(start, end)
+        
+        # The export streams long after the handler returns; each page
+        # still has its own Firestore timeout
+        clear_request_deadline()
+        
+        if export_format == 'csv':
+            body, mimetype = stream_csv(orders, flatten), 'text/csv'
+        else:
+            body, mimetype = stream_jsonl(orders, flatten), 'application/x-ndjson'
+        
+        filename = f"orders_{start_date}_{end_date}{'_items' if flatten else ''}.{export_format}"
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    
+    except Exception as e:
+        tasks.log("Export orders error: %s", str(e))
+        return jsonify({'success': False, 'error': str(e)})
+
 @admin_bp.route('/admin/api/update-order-status', methods=['POST'])
 @require_admin
 def update_order_status():
@@ -97,13 +184,10 @@ def update_order_status():
         if new_status not in ['preparing', 'ready', 'done']:
             return jsonify({'success': False, 'error': 'Invalid status'})
         
-        # Verify order exists
-        order = db_manager.get_order(order_id)
-        if not order:
-            return jsonify({'success': False, 'error': 'Order not found'})
-        
-        # Update status
-        db_manager.update_order_tracking_status(order_id, new_status, notes if notes else None)
+        # Checked against the stored order inside the update
+        error = db_manager.update_order_tracking_status(order_id, new_status, notes if notes else None)
+        if error:
+            return jsonify({'success': False, 'error': error})
         
         return jsonify({
             'success': True, 
@@ -111,9 +195,71 @@ def update_order_status():
         })
     
     except Exception as e:
-        print(f"Update order status error: {str(e)}")  # Debug print
+        tasks.log("Update order status error: %s", str(e))  # Debug print
+        return jsonify({'success': False, 'error': str(e)})
+
+@admin_bp.route('/admin/api/bulk-update-order-status', methods=['POST'])
+@require_admin
+def bulk_update_order_status():
+    """Move many orders to one status in a single transaction"""
+    try:
+        data = request.get_json()
+        order_ids = data.get('order_ids') or []
+        new_status = data.get('status')
+        notes = data.get('notes', '')
+        
+        if not order_ids or not new_status:
+            return jsonify({'success': False, 'error': 'Order IDs and status are required'})
+        
+        if new_status not in ['preparing', 'ready', 'done']:
+            return jsonify({'success': False, 'error': 'Invalid status'})
+        
+        # Keep the transaction under the 500-write limit (orders + rollup days)
+        order_ids = list(dict.fromkeys(order_ids))
+        if len(order_ids) > 200:
+            return jsonify({'success': False, 'error': 'At most 200 orders per request'})
+        
+        updated, rejected = db_manager.bulk_update_order_tracking_status(order_ids, new_status, notes if notes else None)
+        
+        results = []
+        for order_id in order_ids:
+            if order_id in updated:
+                results.append({'order_id': order_id, 'success': True, 'previous_status': updated[order_id]})
+            else:
+                results.append({'order_id': order_id, 'success': False, 'error': rejected.get(order_id, 'Order not found')})
+        
+        return jsonify({
+            'success': True,
+            'status': new_status,
+            'updated': len(updated),
+            'failed': len(order_ids) - len(updated),
+            'results': results
+        })
+    
+    except Exception as e:
+        tasks.log("Bulk update order status error: %s", str(e))  # Debug print
         return jsonify({'success': False, 'error': str(e)})
 
+@admin_bp.route('/admin/api/production-sheet')
+@require_admin
+def production_sheet():
+    """Outstanding quantities per item across all preparing orders"""
+    try:
+        return jsonify({'success': True, 'sheet': db_manager.get_production_sheet()})
+    except Exception as e:
+        tasks.log("Production sheet error: %s", str(e))
+        return jsonify({'success': False, 'error': str(e)})
+
+@admin_bp.route('/admin/api/production-sheet/stream')
+@require_admin
+def production_sheet_stream():
+    """Push production sheet changes to the dashboard as server-sent events"""
+    return Response(
+        stream_with_context(production_feed.stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @admin_bp.route('/admin/api/get-order-details/<order_id>')
 @require_admin
 def get_order_details(order_id):
@@ -146,7 +292,7 @@ def get_admin_orders():
         return jsonify({'success': True, 'orders': orders})
         
     except Exception as e:
-        print(f"Get admin orders error: {str(e)}")
+        tasks.log("Get admin orders error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 # Menu Management Routes
@@ -157,27 +303,18 @@ def add_menu_item():
     try:
         data = request.get_json()
         
-        # Validate required fields
-        required_fields = ['name', 'description', 'price', 'image_url', 'category']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'success': False, 'error': f'{field} is required'})
-        
-        # Create menu item
-        menu_item = {
-            'name': data['name'],
-            'description': data['description'],
-            'price': int(data['price']),
-            'image_url': data['image_url'],
-            'category': data['category'],
-            'available': data.get('available', True)
-        }
+        # Validate required fields and create menu item
+        try:
+            menu_item = build_menu_item(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
         
         db_manager.add_menu_item(menu_item)
+        catalog.invalidate()
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"Add menu item error: {str(e)}")
+        tasks.log("Add menu item error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 @admin_bp.route('/admin/api/update-menu-item/<item_id>', methods=['PUT'])
@@ -194,7 +331,7 @@ def update_menu_item(item_id):
         
         # Update only provided fields
         update_data = {}
-        allowed_fields = ['name', 'description', 'price', 'image_url', 'category', 'available']
+        allowed_fields = ['name', 'description', 'price', 'image_url', 'category', 'available', 'daily_stock']
         
         for field in allowed_fields:
             if field in data:
@@ -202,16 +339,19 @@ def update_menu_item(item_id):
                     update_data[field] = int(data[field])
                 elif field == 'available':
                     update_data[field] = bool(data[field])
+                elif field == 'daily_stock':
+                    update_data[field] = parse_daily_stock(data[field])
                 else:
                     update_data[field] = data[field]
         
         if update_data:
             db_manager.update_menu_item(item_id, update_data)
+            catalog.invalidate()
         
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"Update menu item error: {str(e)}")
+        tasks.log("Update menu item error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 @admin_bp.route('/admin/api/delete-menu-item/<item_id>', methods=['DELETE'])
@@ -225,10 +365,11 @@ def delete_menu_item(item_id):
             return jsonify({'success': False, 'error': 'Item not found'})
         
         db_manager.delete_menu_item(item_id)
+        catalog.invalidate()
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"Delete menu item error: {str(e)}")
+        tasks.log("Delete menu item error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 @admin_bp.route('/admin/api/toggle-item-availability/<item_id>', methods=['POST'])
@@ -244,6 +385,7 @@ def toggle_item_availability(item_id):
         # Toggle availability
         new_availability = not item.get('available', True)
         db_manager.update_menu_item(item_id, {'available': new_availability})
+        catalog.invalidate()
         
         return jsonify({
             'success': True, 
@@ -252,7 +394,62 @@ def toggle_item_availability(item_id):
         })
         
     except Exception as e:
-        print(f"Toggle availability error: {str(e)}")
+        tasks.log("Toggle availability error: %s", str(e))
+        return jsonify({'success': False, 'error': str(e)})
+
+@admin_bp.route('/admin/api/import-catalog', methods=['POST'])
+@require_admin
+def import_catalog():
+    """Bulk import menu items and addons from an uploaded CSV/JSON file or a JSON body"""
+    try:
+        upload = request.files.get('file')
+        if upload:
+            dry_run = request.form.get('dry_run') in ['1', 'true', 'yes']
+            try:
+                rows = parse_upload(upload.filename or '', upload.read(), request.form.get('kind'))
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)})
+        else:
+            data = request.get_json() or {}
+            dry_run = bool(data.get('dry_run'))
+            rows = {kind: data.get(kind) or [] for kind in BUILDERS}
+        
+        current = {'menu': db_manager.get_menu_items, 'addons': db_manager.get_addons}
+        plans = {}
+        errors = {}
+        for kind, kind_rows in rows.items():
+            if not kind_rows:
+                continue
+            plans[kind] = diff_catalog(kind_rows, current[kind](), BUILDERS[kind])
+            if plans[kind]['errors']:
+                errors[kind] = plans[kind]['errors']
+        
+        if not plans:
+            return jsonify({'success': False, 'error': 'Nothing to import'})
+        
+        # All-or-nothing: don't write anything if any row is invalid
+        if errors:
+            return jsonify({'success': False, 'error': 'Validation failed', 'errors': errors})
+        
+        summary = {}
+        for kind, plan in plans.items():
+            summary[kind] = {
+                'created': len(plan['creates']),
+                'updated': len(plan['updates']),
+                'unchanged': plan['unchanged'],
+                'changes': plan['updates']
+            }
+            if not dry_run and (plan['creates'] or plan['updates']):
+                db_manager.apply_catalog_changes(kind, plan['creates'], plan['updates'])
+        
+        # One invalidation for the whole import
+        if not dry_run:
+            catalog.invalidate()
+        
+        return jsonify({'success': True, 'dry_run': dry_run, 'summary': summary})
+        
+    except Exception as e:
+        tasks.log("Import catalog error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 # Addon Management Routes
@@ -263,24 +460,18 @@ def add_addon():
     try:
         data = request.get_json()
         
-        # Validate required fields
-        required_fields = ['name', 'price']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'success': False, 'error': f'{field} is required'})
-        
-        # Create addon
-        addon = {
-            'name': data['name'],
-            'price': int(data['price']),
-            'available': data.get('available', True)
-        }
+        # Validate required fields and create addon
+        try:
+            addon = build_addon(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
         
         db_manager.add_addon(addon)
+        catalog.invalidate()
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"Add addon error: {str(e)}")
+        tasks.log("Add addon error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 @admin_bp.route('/admin/api/update-addon/<addon_id>', methods=['PUT'])
@@ -297,7 +488,7 @@ def update_addon(addon_id):
         
         # Update only provided fields
         update_data = {}
-        allowed_fields = ['name', 'price', 'available']
+        allowed_fields = ['name', 'price', 'available', 'auto_rules']
         
         for field in allowed_fields:
             if field in data:
@@ -305,16 +496,22 @@ def update_addon(addon_id):
                     update_data[field] = int(data[field])
                 elif field == 'available':
                     update_data[field] = bool(data[field])
+                elif field == 'auto_rules':
+                    try:
+                        update_data[field] = validate_auto_rules(data[field])
+                    except ValueError as e:
+                        return jsonify({'success': False, 'error': str(e)})
                 else:
                     update_data[field] = data[field]
         
         if update_data:
             db_manager.update_addon(addon_id, update_data)
+            catalog.invalidate()
         
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"Update addon error: {str(e)}")
+        tasks.log("Update addon error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 @admin_bp.route('/admin/api/delete-addon/<addon_id>', methods=['DELETE'])
@@ -328,10 +525,11 @@ def delete_addon(addon_id):
             return jsonify({'success': False, 'error': 'Addon not found'})
         
         db_manager.delete_addon(addon_id)
+        catalog.invalidate()
         return jsonify({'success': True})
         
     except Exception as e:
-        print(f"Delete addon error: {str(e)}")
+        tasks.log("Delete addon error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 @admin_bp.route('/admin/api/toggle-addon-availability/<addon_id>', methods=['POST'])
@@ -347,6 +545,7 @@ def toggle_addon_availability(addon_id):
         # Toggle availability
         new_availability = not addon.get('available', True)
         db_manager.update_addon(addon_id, {'available': new_availability})
+        catalog.invalidate()
         
         return jsonify({
             'success': True, 
@@ -355,5 +554,50 @@ def toggle_addon_availability(addon_id):
         })
         
     except Exception as e:
-        print(f"Toggle addon availability error: {str(e)}")
+        tasks.log("Toggle addon availability error: %s", str(e))
+        return jsonify({'success': False, 'error': str(e)})
+
+@admin_bp.route('/admin/profiling')
+@require_admin
+def profiling():
+    """Admin page for request profiling settings and captured profiles"""
+    return render_template('admin_profiling.html', modes=MODES, trigger_header=TRIGGER_HEADER)
+
+@admin_bp.route('/admin/api/profiling', methods=['GET', 'POST'])
+@require_admin
+def profiling_settings():
+    """Read or change the profiler settings shared by all workers"""
+    try:
+        if request.method == 'POST':
+            settings = profiler.update_settings(request.get_json() or {})
+        else:
+            settings = profiler.current_settings()
+        return jsonify({'success': True, 'settings': settings, 'profiles': profiler.list_profiles()})
+    
+    except (ValueError, TypeError) as e:
+        return jsonify({'success': False, 'error': str(e)})
+    except Exception as e:
+        tasks.log("Profiling settings error: %s", str(e))
+        return jsonify({'success': False, 'error': str(e)})
+
+@admin_bp.route('/admin/api/profiles/<name>')
+@require_admin
+def download_profile(name):
+    """Download a collapsed-stack (flamegraph.pl/speedscope) or pstats file"""
+    path = profiler.profile_path(name)
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='text/plain' if name.endswith('.collapsed') else 'application/octet-stream',
+                     as_attachment=True, download_name=name, max_age=0)
+
+@admin_bp.route('/admin/api/profiles/clear', methods=['POST'])
+@require_admin
+def clear_profiles():
+    """Delete all captured profiles"""
+    try:
+        profiler.clear()
+        return jsonify({'success': True})
+    
+    except Exception as e:
+        tasks.log("Clear profiles error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
\ No newline at end of file
@@ -1,13 +1,31 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, jsonify, request
 from models.database import DatabaseManager
 from services.cart import CartService
+from services.catalog import catalog
+from services.menu_search import menu_search
+from services import startup
+from models.database import document_reads
+from services.resilience import breaker_states
+from services.rate_limit import rate_limiter
+from services.admission import admission
+from services.tasks import tasks
+from services.auth import ensure_session_key
+from services.sessions import session_free
 import time
 from datetime import datetime
 
 api_bp = Blueprint('api', __name__)
 db_manager = DatabaseManager()
 
+# Catalog responses carry no cookie, so browsers and proxies may share them briefly
+CATALOG_MAX_AGE = 60
+
+def public_cacheable(response):
+    response.headers['Cache-Control'] = f'public, max-age={CATALOG_MAX_AGE}'
+    return response
+
 @api_bp.route('/ping')
+@session_free
 def ping():
     """Simple ping endpoint for health checks and keeping app alive"""
     return jsonify({
@@ -17,6 +35,7 @@ def ping():
     }), 200
 
 @api_bp.route('/health')
+@session_free
 def health():
     """More detailed health check endpoint"""
     try:
@@ -31,41 +50,70 @@ def health():
         'database': db_status,
         'services': {
             'cart': 'ok',
-            'session': 'ok' if 'session_key' in session else 'no_session'
-        }
+            'session': 'skipped'
+        },
+        'startup': startup.report.as_dict(),
+        'coalesced_reads': document_reads.stats(),
+        'breakers': breaker_states(),
+        'rate_limited': dict(rate_limiter.rejected),
+        'admission': admission.stats(),
+        'tasks': tasks.stats()
     }), 200
 
 @api_bp.route('/menu')
+@session_free
 def menu():
     try:
-        items = db_manager.get_menu_items()
-        return jsonify({'success': True, 'items': items})
+        items = catalog.get_menu_items()
+        return public_cacheable(jsonify({'success': True, 'items': items}))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@api_bp.route('/menu/search')
+@session_free
+def menu_search_api():
+    """Search and filter the menu from the in-memory index"""
+    try:
+        available = request.args.get('available')
+        result = menu_search.search(
+            query=request.args.get('q', ''),
+            category=request.args.get('category') or None,
+            available=None if available in (None, '') else available.lower() in ['true', '1', 'yes'],
+            min_price=request.args.get('min_price', type=int),
+            max_price=request.args.get('max_price', type=int),
+            limit=min(request.args.get('limit', 50, type=int), 200),
+            offset=max(request.args.get('offset', 0, type=int), 0)
+        )
+        return public_cacheable(jsonify({'success': True, **result}))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @api_bp.route('/addons')
+@session_free
 def addons():
     """Get available addons"""
     try:
-        addons = db_manager.get_available_addons()
-        return jsonify({'success': True, 'addons': addons})
+        addons = catalog.get_available_addons()
+        return public_cacheable(jsonify({'success': True, 'addons': addons}))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 @api_bp.route('/add-to-cart', methods=['POST'])
 def add_to_cart():
-    # Remove session verification - just check if session exists
-    if 'session_key' not in session:
-        return jsonify({'success': False, 'error': 'Session not initialized'})
+    # The session key is minted on the first cart change
+    ensure_session_key()
     
     data = request.get_json()
     item_id = data.get('item_id')
     quantity = int(data.get('quantity', 1))
     
     try:
-        item_data = db_manager.get_menu_item(item_id)
+        # Cached prices are fine here; checkout reprices against Firestore
+        item_data = catalog.get_menu_item(item_id)
         if not item_data:
             return jsonify({'success': False, 'error': 'Item not found'})
+        if not item_data.get('available', True):
+            return jsonify({'success': False, 'error': 'Sold out' if item_data.get('sold_out') else 'Item not available'})
         
         cart = CartService.add_to_cart(item_data, quantity)
         addons = CartService.get_addons()
@@ -74,7 +122,9 @@ def add_to_cart():
             'success': True, 
             'cart': cart,
             'addons': addons,
-            'total': CartService.get_cart_total()
+            'suggested_addons': CartService.get_suggested_addons(item_data),
+            'total': CartService.get_cart_total(),
+            'version': CartService.get_version()
         })
     
     except Exception as e:
@@ -83,15 +133,14 @@ def add_to_cart():
 @api_bp.route('/add-addon-to-cart', methods=['POST'])
 def add_addon_to_cart():
     """Add addon to cart"""
-    if 'session_key' not in session:
-        return jsonify({'success': False, 'error': 'Session not initialized'})
+    ensure_session_key()
     
     data = request.get_json()
     addon_id = data.get('addon_id')
     quantity = int(data.get('quantity', 1))
     
     try:
-        addon_data = db_manager.get_addon(addon_id)
+        addon_data = catalog.get_addon(addon_id)
         if not addon_data:
             return jsonify({'success': False, 'error': 'Addon not found'})
         
@@ -103,7 +152,8 @@ def add_addon_to_cart():
         return jsonify({
             'success': True, 
             'addons': addons,
-            'total': CartService.get_cart_total()
+            'total': CartService.get_cart_total(),
+            'version': CartService.get_version()
         })
     
     except Exception as e:
@@ -115,14 +165,37 @@ def cart():
         'success': True, 
         'cart': CartService.get_cart(),
         'addons': CartService.get_addons(),
-        'total': CartService.get_cart_total()
+        'total': CartService.get_cart_total(),
+        'version': CartService.get_version()
     })
 
+@api_bp.route('/cart-batch', methods=['POST'])
+def cart_batch():
+    """Apply several cart and addon quantity changes in one request"""
+    ensure_session_key()
+    
+    data = request.get_json() or {}
+    try:
+        success, error, stale = CartService.apply_operations(data.get('operations'), data.get('version'))
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+    
+    result = {
+        'success': success,
+        'version': CartService.get_version(),
+        'cart': CartService.get_cart(),
+        'addons': CartService.get_addons(),
+        'total': CartService.get_cart_total()
+    }
+    if not success:
+        result['error'] = error
+        result['stale'] = stale
+    return jsonify(result)
+
 @api_bp.route('/update-cart', methods=['POST'])
 def update_cart():
-    # Remove session verification - just check if session exists
-    if 'session_key' not in session:
-        return jsonify({'success': False, 'error': 'Session not initialized'})
+    # The session key is minted on the first cart change
+    ensure_session_key()
     
     data = request.get_json()
     item_id = data.get('item_id')
@@ -138,8 +211,7 @@ def update_cart():
 @api_bp.route('/update-addon-cart', methods=['POST'])
 def update_addon_cart():
     """Update addon quantity in cart"""
-    if 'session_key' not in session:
-        return jsonify({'success': False, 'error': 'Session not initialized'})
+    ensure_session_key()
     
     data = request.get_json()
     addon_id = data.get('addon_id')
@@ -155,7 +227,7 @@ def update_addon_cart():
 @api_bp.route('/check-order-status/<order_id>')
 def check_order_status(order_id):
     try:
-        order = db_manager.get_order(order_id)
+        order = db_manager.get_order_cached(order_id)
         if order:
             return jsonify({
                 'success': True, 
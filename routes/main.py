@@ -2,7 +2,9 @@
 from flask import Blueprint, render_template, session, request, redirect, url_for
 from models.database import DatabaseManager
 from services.cart import CartService
+from services.catalog import catalog
 import time
+from services.tasks import tasks
 
 main_bp = Blueprint('main', __name__)
 db_manager = DatabaseManager()
@@ -24,13 +26,13 @@ def index():
         try:
             orders = db_manager.get_orders_by_phone(phone_number)
         except Exception as e:
-            print(f"Error fetching orders: {e}")
+            tasks.log("Error fetching orders: %s", e)
     return render_template('index.html', orders=orders)
 
 @main_bp.route('/menu')
 def menu():
     try:
-        items = db_manager.get_menu_items()
+        items = catalog.get_menu_items()
         return render_template('menu.html', items=items)
     except Exception as e:
         return render_template('menu.html', items=[], error=str(e))
@@ -58,7 +60,7 @@ def order_success(order_id):
             if attempt < 2:  # Don't sleep on last attempt
                 time.sleep(1)
         except Exception as e:
-            print(f"Database error attempt {attempt + 1}: {str(e)}")
+            tasks.log("Database error attempt %s: %s", attempt + 1, str(e))
             if attempt < 2:
                 time.sleep(1)
     
@@ -75,7 +77,7 @@ def order_success(order_id):
                 'status': 'paid',
                 'payment_method': 'midtrans'
             }
-            print(f"Using session fallback for order {order_id}")
+            tasks.log("Using session fallback for order %s", order_id)
     
     # If still no order, create minimal structure to prevent template errors
     if not order:
@@ -86,13 +88,13 @@ def order_success(order_id):
             'customer': {'name': 'Unknown', 'phone': 'Unknown'},
             'status': 'processing'
         }
-        print(f"Using minimal fallback for order {order_id}")
+        tasks.log("Using minimal fallback for order %s", order_id)
     
     # CRITICAL: Ensure order data types are correct
     if order:
         # Convert items to list if it's not already
         if not isinstance(order.get('items', []), list):
-            print(f"WARNING: Converting items from {type(order.get('items'))} to list")
+            tasks.log("WARNING: Converting items from %s to list", type(order.get('items')))
             order['items'] = []
         
         # Ensure customer is a dict
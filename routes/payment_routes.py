@@ -3,13 +3,31 @@ from flask import Blueprint, request, jsonify, session, url_for
 from models.database import DatabaseManager
 from services.cart import CartService
 from services.payment import PaymentService
+from services.pricing import PricingService
+from services.stock import stock
+from services.auth import ensure_session_key
+from services.resilience import CircuitOpenError, DeadlineExceededError
+from services.rate_limit import rate_limited
+from services.idempotency import idempotent
+from services.tasks import tasks, ORDER_SAVE, BOOKKEEPING
 import time
 
 payment_api_bp = Blueprint('payment_api', __name__)
 db_manager = DatabaseManager()
 payment_service = PaymentService()
+pricing_service = PricingService(db_manager)
+
+def save_paid_order(order_data):
+    """Save a paid order (a no-op if it is already saved) and count its stock on this worker"""
+    if db_manager.save_order(order_data):
+        stock.record_sale(order_data)
 
 @payment_api_bp.route('/create-payment', methods=['POST'])  # REMOVED /api prefix
+# The amount comes from the session cart, and a replay must hand back the
+# pending order that payment_success saves from
+@idempotent('create_payment', session_version=CartService.get_version,
+            session_keys=('pending_order', 'customer_phone'))
+@rate_limited('create_payment')
 def create_payment():
     """Create payment transaction"""
     if 'session_key' not in session:
@@ -18,9 +36,28 @@ def create_payment():
     try:
         data = request.get_json()
         
+        if not CartService.get_cart() and not CartService.get_addons():
+            return jsonify({'success': False, 'error': 'Cart is empty'})
+        
+        # Reprice every line against the catalog in one batched read; the
+        # session only holds the prices from when items were added
+        pricing = pricing_service.reprice(CartService.get_cart(), CartService.get_addons())
+        if not pricing['success']:
+            return jsonify(pricing)
+        
+        CartService.replace_cart(pricing['cart'], pricing['addons'])
+        if pricing['price_changes']:
+            # Let the customer see the new total before paying it
+            return jsonify({
+                'success': False,
+                'error': 'Some prices have changed since you added them to your cart',
+                'price_changes': pricing['price_changes'],
+                'total': pricing['total']
+            })
+        
         # Get cart data (including addons)
         all_cart_items = CartService.get_all_cart_items()
-        total = CartService.get_cart_total()
+        total = pricing['total']
         
         if not all_cart_items or total <= 0:
             return jsonify({'success': False, 'error': 'Cart is empty'})
@@ -64,11 +101,14 @@ def create_payment():
             'order_id': payment_result['order_id']
         })
         
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        return jsonify({'success': False, 'error': str(e), 'retry_after': e.retry_after})
     except Exception as e:
-        print(f"Create payment error: {str(e)}")
+        tasks.log("Create payment error: %s", str(e))
         return jsonify({'success': False, 'error': 'Payment creation failed'})
 
 @payment_api_bp.route('/payment-success', methods=['POST'])  # REMOVED /api prefix
+@idempotent('payment_success')
 def payment_success():
     """Handle successful payment callback"""
     try:
@@ -97,44 +137,50 @@ def payment_success():
             'transaction_id': transaction_id
         }
         
-        # Save to database with retry logic
-        max_retries = 3
-        save_success = False
-        
-        for attempt in range(max_retries):
+        # One attempt here instead of sleeping between retries on the request
+        try:
+            # False when an earlier request (or the background retry) already saved it
+            created = db_manager.save_order(order_data)
+        except Exception as save_error:
+            tasks.log("Save failed for order %s: %s", order_id, str(save_error))
+            # Keep trying in the background, but only a confirmed save answers
+            # success: the queue is in memory and dies with the worker, while the
+            # client keeps retrying with the order still in its session
             try:
-                db_manager.save_order(order_data)
-                save_success = True
-                print(f"Order {order_id} saved successfully on attempt {attempt + 1}")
-                break
-            except Exception as save_error:
-                print(f"Save attempt {attempt + 1} failed for order {order_id}: {str(save_error)}")
-                if attempt < max_retries - 1:
-                    time.sleep(1)  # Wait 1 second before retry
-        
-        if save_success:
-            # Clear cart after successful save
-            CartService.clear_cart()
-            
-            # Clean up session
-            session.pop('pending_order', None)
-            session.modified = True
-            
-            return jsonify({
-                'success': True,
-                'message': 'Order saved successfully',
-                'save_for_tracking': True  # Indicate to frontend to save for tracking
-            })
-        else:
-            # Saving failed - suggest retry
+                tasks.submit(ORDER_SAVE, save_paid_order, order_data)
+            except Exception as queue_error:
+                tasks.log("Could not queue save for order %s: %s", order_id, str(queue_error))
             return jsonify({
                 'success': False,
                 'retry': True,
                 'error': 'Failed to save order, retrying...'
             })
+        
+        tasks.log("Order %s saved successfully", order_id)
+        # This worker's menu shows the new stock before its next counter refresh
+        if created:
+            tasks.offload(BOOKKEEPING, stock.record_sale, order_data)
+        
+        # Clear cart after successful save
+        CartService.clear_cart()
+        
+        # The order exists now, so remember it for tracking without another read
+        session['current_order_id'] = order_id
+        if pending_order['customer'].get('phone'):
+            session['customer_phone'] = pending_order['customer']['phone']
+        
+        # Clean up session
+        session.pop('pending_order', None)
+        session.modified = True
+        
+        return jsonify({
+            'success': True,
+            'message': 'Order saved successfully',
+            'save_for_tracking': True  # Indicate to frontend to save for tracking
+        })
     
     except Exception as e:
-        print(f"Payment success handling error: {str(e)}")
+        tasks.log("Payment success handling error: %s", str(e))
         return jsonify({
             'success': False,
             'retry': True,
@@ -146,7 +192,7 @@ def verify_payment(order_id):
     """Verify payment status with Midtrans"""
     try:
         # First check if order exists in database
-        order = db_manager.get_order(order_id)
+        order = db_manager.get_order_cached(order_id)
         if order:
             return jsonify({
                 'success': True,
@@ -164,20 +210,16 @@ def verify_payment(order_id):
         })
         
     except Exception as e:
-        print(f"Payment verification error: {str(e)}")
+        tasks.log("Payment verification error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 @payment_api_bp.route('/session-init', methods=['POST'])  # REMOVED /api prefix
 def init_session():
     """Initialize session for cart functionality"""
     try:
-        if 'session_key' not in session:
-            session['session_key'] = f"session_{int(time.time())}"
-            session.modified = True
-        
         return jsonify({
             'success': True,
-            'session_key': session['session_key']
+            'session_key': ensure_session_key()
         })
         
     except Exception as e:
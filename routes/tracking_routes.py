@@ -1,6 +1,9 @@
 # tracking_routes.py - Remove session verification
 from flask import Blueprint, render_template, request, jsonify, session
 from models.database import DatabaseManager
+from services.auth import ensure_session_key
+from services.rate_limit import rate_limited
+from services.tasks import tasks
 # Remove this import: from services.auth import verify_session_key
 
 tracking_bp = Blueprint('tracking', __name__)
@@ -12,13 +15,14 @@ def track_order():
     return render_template('track_order.html')
 
 @tracking_bp.route('/api/track-order', methods=['POST'])
+@rate_limited('track_order')
 def api_track_order():
     """API endpoint to get order status by phone number"""
     try:
         data = request.get_json()
         phone_number = data.get('phone_number', '').strip()
         
-        print(f"Tracking request for phone: {phone_number}")
+        tasks.log("Tracking request for phone: %s", phone_number)
         
         if not phone_number:
             return jsonify({'success': False, 'error': 'Phone number is required'})
@@ -26,7 +30,7 @@ def api_track_order():
         # Get orders by phone number (only non-completed orders)
         orders = db_manager.get_orders_by_phone(phone_number)
         
-        print(f"Database returned {len(orders)} orders")
+        tasks.log("Database returned %s orders", len(orders))
         
         if not orders:
             return jsonify({'success': False, 'error': 'No active orders found for this phone number'})
@@ -38,15 +42,13 @@ def api_track_order():
         return jsonify({'success': True, 'orders': orders})
     
     except Exception as e:
-        print(f"Track order API error: {str(e)}")
+        tasks.log("Track order API error: %s", str(e))
         return jsonify({'success': False, 'error': str(e)})
 
 @tracking_bp.route('/api/save-order-to-session', methods=['POST'])
 def save_order_to_session():
     """Save order ID to session for persistence"""
-    # Remove session verification - just check if session exists
-    if 'session_key' not in session:
-        return jsonify({'success': False, 'error': 'Session not initialized'})
+    ensure_session_key()
     
     try:
         data = request.get_json()
@@ -55,6 +57,14 @@ def save_order_to_session():
         if not order_id:
             return jsonify({'success': False, 'error': 'Order ID is required'})
         
+        # payment_success stored it after a confirmed save, so the order is known to exist without a read
+        if session.get('current_order_id') == order_id:
+            return jsonify({
+                'success': True,
+                'message': 'Order saved to session',
+                'expires_in': 86400  # 24 hours in seconds
+            })
+        
         # Verify order exists
         order = db_manager.get_order(order_id)
         if not order:
@@ -87,7 +97,8 @@ def get_session_order():
         if not order_id:
             return jsonify({'success': False, 'error': 'No order in session'})
         
-        order = db_manager.get_order(order_id)
+        # Only saved orders are put in the session, so don't trust a cached miss
+        order = db_manager.get_order_cached(order_id, cache_missing=False)
         
         if not order:
             # Clear invalid order from session
@@ -0,0 +1,136 @@
+# addon_rules.py - Default/suggested addons driven by rules stored on the addon docs
+#
+# An addon can carry an `auto_rules` list, for example on Rice:
+#   [{"trigger": "first_main", "action": "add", "quantity": 1}]
+# or on Sambal:
+#   [{"trigger": "category", "category": "Ayam", "action": "suggest"}]
+import threading
+from services.catalog import catalog
+from services.tasks import tasks
+
+TRIGGERS = ['first_main', 'category', 'item', 'any']
+ACTIONS = ['add', 'suggest']
+
+def validate_auto_rules(rules):
+    """Normalise an auto_rules list, raising ValueError on bad rules"""
+    if rules is None or rules == '':
+        return []
+    if not isinstance(rules, list):
+        raise ValueError('auto_rules must be a list')
+
+    normalised = []
+    for rule in rules:
+        if not isinstance(rule, dict):
+            raise ValueError('Each auto rule must be an object')
+        trigger = rule.get('trigger')
+        action = rule.get('action', 'add')
+        if trigger not in TRIGGERS:
+            raise ValueError(f"Unknown rule trigger: {trigger}")
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown rule action: {action}")
+
+        clean = {'trigger': trigger, 'action': action}
+        if trigger == 'category':
+            if not rule.get('category'):
+                raise ValueError('category rules need a category')
+            clean['category'] = str(rule['category'])
+        if trigger == 'item':
+            if not rule.get('item_id'):
+                raise ValueError('item rules need an item_id')
+            clean['item_id'] = str(rule['item_id'])
+        if action == 'add':
+            clean['quantity'] = max(int(rule.get('quantity', 1)), 1)
+        normalised.append(clean)
+    return normalised
+
+class CompiledRules:
+    """Rules indexed by trigger so evaluation is a few dict lookups"""
+    def __init__(self):
+        self.first_main = {'add': [], 'suggest': []}
+        self.any = {'add': [], 'suggest': []}
+        self.by_category = {}
+        self.by_item = {}
+
+    def _bucket(self, rule):
+        if rule['trigger'] == 'first_main':
+            return self.first_main
+        if rule['trigger'] == 'any':
+            return self.any
+        if rule['trigger'] == 'category':
+            return self.by_category.setdefault(rule['category'].strip().lower(), {'add': [], 'suggest': []})
+        return self.by_item.setdefault(rule['item_id'], {'add': [], 'suggest': []})
+
+    def add(self, addon, rule):
+        summary = {'id': addon['id'], 'name': addon['name'], 'price': addon['price']}
+        if rule['action'] == 'add':
+            self._bucket(rule)['add'].append((summary, rule.get('quantity', 1)))
+        else:
+            self._bucket(rule)['suggest'].append(summary)
+
+def compile_rules(addons):
+    """Build the lookup structure from the addon catalog"""
+    compiled = CompiledRules()
+    available = [addon for addon in addons if addon.get('available', True)]
+    has_rules = False
+
+    for addon in available:
+        for rule in addon.get('auto_rules') or []:
+            try:
+                compiled.add(addon, validate_auto_rules([rule])[0])
+                has_rules = True
+            except (ValueError, TypeError) as e:
+                tasks.log("Skipping bad auto rule on addon %s: %s", addon.get('id'), str(e))
+
+    # Until rules are configured keep the original behaviour: first main item adds Rice x1
+    if not has_rules:
+        for addon in available:
+            if addon.get('name') == 'Rice':
+                compiled.add(addon, {'trigger': 'first_main', 'action': 'add', 'quantity': 1})
+                break
+
+    return compiled
+
+class AddonRuleEngine:
+    """Evaluates addon rules against the in-memory catalog; no I/O per cart change"""
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._version = None
+
+    def _rules(self):
+        addons = self.catalog.get_addons()
+        if self._version != self.catalog.version:
+            with self._lock:
+                if self._version != self.catalog.version:
+                    self._compiled = compile_rules(addons)
+                    self._version = self.catalog.version
+        return self._compiled
+
+    def evaluate(self, item_data, is_first_main_item):
+        """Addons to add [(addon, quantity)] and to suggest [addon] for an added menu item"""
+        rules = self._rules()
+        buckets = [rules.any]
+        if is_first_main_item:
+            buckets.append(rules.first_main)
+        category = str(item_data.get('category', '')).strip().lower()
+        if category in rules.by_category:
+            buckets.append(rules.by_category[category])
+        if item_data.get('id') in rules.by_item:
+            buckets.append(rules.by_item[item_data['id']])
+
+        adds = []
+        suggestions = []
+        seen = set()
+        for bucket in buckets:
+            for addon, quantity in bucket['add']:
+                if addon['id'] not in seen:
+                    seen.add(addon['id'])
+                    adds.append((addon, quantity))
+            for addon in bucket['suggest']:
+                if addon['id'] not in seen:
+                    seen.add(addon['id'])
+                    suggestions.append(addon)
+        return adds, suggestions
+
+addon_rules = AddonRuleEngine(catalog)
@@ -0,0 +1,319 @@
+# admission.py - Priority admission control and load shedding in front of the Flask app
+import json
+import math
+import threading
+import time
+from collections import deque
+from werkzeug.exceptions import HTTPException
+from config import Config
+
+CRITICAL = 'critical'
+NORMAL = 'normal'
+LOW = 'low'
+
+class PriorityClass:
+    """How much of the concurrency limit a class may use and how long it may queue"""
+    def __init__(self, name, rank, share, max_queue, max_wait):
+        self.name = name
+        self.rank = rank
+        self.share = share
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+# Lower classes stop being admitted while there is still headroom, so
+# checkouts and kitchen updates find a free slot when browsing is shed
+PRIORITY_CLASSES = {
+    CRITICAL: PriorityClass(CRITICAL, 0, 1.0, 64, 5.0),
+    NORMAL: PriorityClass(NORMAL, 1, 0.85, 32, 1.0),
+    LOW: PriorityClass(LOW, 2, 0.6, 8, 0.1),
+}
+
+# Blueprint defaults, then per-endpoint overrides
+BLUEPRINT_PRIORITIES = {
+    'payment_api': CRITICAL,
+    'admin': NORMAL,
+    'tracking': NORMAL,
+    'api': NORMAL,
+    'main': LOW,
+}
+ENDPOINT_PRIORITIES = {
+    'admin.update_order_status': CRITICAL,
+    'admin.bulk_update_order_status': CRITICAL,
+    'admin.sales_report': LOW,
+    'admin.export_orders': LOW,
+    'api.menu': LOW,
+    'api.menu_search_api': LOW,
+    'api.addons': LOW,
+    'api.cart': LOW,
+    'main.checkout': NORMAL,
+    'main.order_success': NORMAL,
+}
+# Never queued or shed: health checks, static files and the long-lived SSE stream
+EXEMPT_ENDPOINTS = {'static', 'api.ping', 'api.health', 'admin.production_sheet_stream'}
+
+def priority_for(endpoint):
+    """Priority class name for an endpoint, or None if it is exempt"""
+    if endpoint in EXEMPT_ENDPOINTS or endpoint.endswith('.static'):
+        return None
+    if endpoint in ENDPOINT_PRIORITIES:
+        return ENDPOINT_PRIORITIES[endpoint]
+    blueprint = endpoint.rpartition('.')[0]
+    return BLUEPRINT_PRIORITIES.get(blueprint, NORMAL)
+
+class RequestShedError(Exception):
+    """Raised when a request is turned away instead of admitted"""
+    def __init__(self, priority, retry_after=1):
+        self.priority = priority
+        self.retry_after = retry_after
+        super().__init__('Server is busy, please try again in a moment')
+
+class _Waiter:
+    __slots__ = ('event', 'admitted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+
+class AdaptiveLimit:
+    """Concurrency limit that follows observed latency (gradient style)
+
+    Latency over each window is compared with a slow-moving baseline. While
+    they match the limit grows by about sqrt(limit) if it is actually being
+    used; when latency climbs past the tolerance the limit shrinks in
+    proportion, before queues build up downstream.
+    """
+    def __init__(self, initial, minimum, maximum, tolerance, window=1.0, smoothing=0.2):
+        self.value = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.window = window
+        self.smoothing = smoothing
+        self.baseline = None
+        self._samples = []
+        self._peak_in_flight = 0
+        self._window_started = time.monotonic()
+
+    def record(self, latency, in_flight):
+        """Add one sample; returns True when the limit was recomputed"""
+        self._samples.append(latency)
+        self._peak_in_flight = max(self._peak_in_flight, in_flight)
+        now = time.monotonic()
+        if now - self._window_started < self.window:
+            return False
+
+        recent = max(sum(self._samples) / len(self._samples), 1e-6)
+        if self.baseline is None:
+            self.baseline = recent
+        else:
+            self.baseline = self.baseline * 0.95 + recent * 0.05
+            if self.baseline > recent * 2:
+                # Let the baseline recover quickly after a slow spell ends
+                self.baseline = recent * 2
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.baseline / recent))
+        headroom = math.sqrt(self.value) if self._peak_in_flight >= self.value / 2 else 0
+        target = self.value * gradient + (headroom if gradient == 1.0 else 0)
+        value = self.value * (1 - self.smoothing) + target * self.smoothing
+        self.value = max(self.minimum, min(self.maximum, value))
+
+        self._samples = []
+        self._peak_in_flight = 0
+        self._window_started = now
+        return True
+
+class AdmissionController:
+    """Bounded concurrency with per-priority wait queues
+
+    A request runs at once if the in-flight count is under its class's share
+    of the limit and nothing of equal or higher priority is waiting; it queues
+    if its class's queue has room, and is shed otherwise or when its wait
+    runs out. Freed slots go to the highest-priority, oldest waiter.
+    """
+    def __init__(self, limit, classes=None):
+        self.limit = limit
+        self.classes = classes or PRIORITY_CLASSES
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self._queues = {name: deque() for name in self.classes}
+        self._by_rank = sorted(self.classes.values(), key=lambda c: c.rank)
+        self.admitted = {name: 0 for name in self.classes}
+        self.shed = {name: 0 for name in self.classes}
+
+    def _capacity(self, priority_class):
+        return max(1, int(self.limit.value * priority_class.share))
+
+    def _queued_ahead(self, priority_class):
+        return any(self._queues[c.name] for c in self._by_rank if c.rank <= priority_class.rank)
+
+    def acquire(self, priority):
+        """Admit a request of a priority, waiting if allowed; raises RequestShedError"""
+        priority_class = self.classes[priority]
+        with self._lock:
+            if self.in_flight < self._capacity(priority_class) and not self._queued_ahead(priority_class):
+                self.in_flight += 1
+                self.admitted[priority] += 1
+                return
+            queue = self._queues[priority]
+            if len(queue) >= priority_class.max_queue or priority_class.max_wait <= 0:
+                self.shed[priority] += 1
+                raise RequestShedError(priority)
+            waiter = _Waiter()
+            queue.append(waiter)
+
+        waiter.event.wait(priority_class.max_wait)
+        with self._lock:
+            if waiter.admitted:
+                self.admitted[priority] += 1
+                return
+            queue.remove(waiter)
+            self.shed[priority] += 1
+        raise RequestShedError(priority)
+
+    def release(self, latency=None):
+        """Free a slot, feed the latency (if any) to the limit and admit whoever is next"""
+        with self._lock:
+            self.in_flight -= 1
+            if latency is not None:
+                self.limit.record(latency, self.in_flight + 1)
+            for priority_class in self._by_rank:
+                queue = self._queues[priority_class.name]
+                while queue and self.in_flight < self._capacity(priority_class):
+                    waiter = queue.popleft()
+                    waiter.admitted = True
+                    self.in_flight += 1
+                    waiter.event.set()
+                if queue:
+                    # Lower classes have a smaller share, so they can't fit either
+                    break
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': round(self.limit.value, 1),
+                'in_flight': self.in_flight,
+                'queued': {name: len(queue) for name, queue in self._queues.items()},
+                'admitted': dict(self.admitted),
+                'shed': dict(self.shed)
+            }
+
+    @classmethod
+    def from_config(cls):
+        # Slots beyond the worker's threads only move the queue into gunicorn,
+        # where nothing is shed
+        maximum = Config.ADMISSION_MAX_LIMIT
+        if Config.WORKER_CONCURRENCY:
+            maximum = min(maximum, Config.WORKER_CONCURRENCY)
+        return cls(AdaptiveLimit(
+            min(Config.ADMISSION_INITIAL_LIMIT, maximum),
+            min(Config.ADMISSION_MIN_LIMIT, maximum),
+            maximum,
+            Config.ADMISSION_LATENCY_TOLERANCE
+        ))
+
+admission = AdmissionController.from_config()
+
+# Proxy header with the time the request arrived ('t=<epoch>' in s, ms or us)
+REQUEST_START_HEADER = 'HTTP_X_REQUEST_START'
+
+def queue_time(environ, now=None):
+    """Seconds the request waited before reaching us, from X-Request-Start (0 if unknown)"""
+    value = environ.get(REQUEST_START_HEADER, '')
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return 0.0
+    # Scale ms or us timestamps to seconds
+    while started > 1e11:
+        started /= 1000
+    waited = (now if now is not None else time.time()) - started
+    # Ignore clock skew between the proxy and this host
+    return waited if 0 < waited < 60 else 0.0
+
+def _is_streaming(headers):
+    """Streamed bodies (SSE, exports) have no Content-Length; their duration isn't latency"""
+    names = {name.lower(): value for name, value in headers}
+    return 'content-length' not in names or names.get('content-type', '').startswith('text/event-stream')
+
+class _ReleasingIterable:
+    """Response body that frees the admission slot once the server has sent it"""
+    def __init__(self, iterable, on_close):
+        self._iterable = iterable
+        self._on_close = on_close
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            self._on_close()
+
+class AdmissionMiddleware:
+    """WSGI middleware that admits, queues or sheds each request by priority
+
+    Wraps app.wsgi_app, so it runs before the session is opened or any
+    before_request hook: a shed request costs one URL match and a short
+    503, with no cookie decoding or Firestore work.
+    """
+    def __init__(self, app, controller=None):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.controller = controller or admission
+
+    def _priority(self, environ):
+        try:
+            rule, _ = self.app.url_map.bind_to_environ(environ).match(return_rule=True)
+        except HTTPException:
+            return NORMAL
+        return priority_for(rule.endpoint)
+
+    def __call__(self, environ, start_response):
+        priority = self._priority(environ)
+        if priority is None:
+            return self.wsgi_app(environ, start_response)
+        try:
+            self.controller.acquire(priority)
+        except RequestShedError as e:
+            return self._shed_response(environ, start_response, e)
+
+        started = time.monotonic()
+        # Time spent queued in the proxy or gunicorn is part of what clients see
+        queued = queue_time(environ)
+        released = False
+        streaming = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.controller.release(None if streaming else time.monotonic() - started + queued)
+
+        def watching_start_response(status, headers, exc_info=None):
+            nonlocal streaming
+            streaming = _is_streaming(headers)
+            return start_response(status, headers, exc_info) if exc_info else start_response(status, headers)
+
+        try:
+            return _ReleasingIterable(self.wsgi_app(environ, watching_start_response), release)
+        except BaseException:
+            release()
+            raise
+
+    def _shed_response(self, environ, start_response, error):
+        headers = [('Retry-After', str(error.retry_after)), ('Cache-Control', 'no-store')]
+        path = environ.get('PATH_INFO', '')
+        if '/api/' in path:
+            body = json.dumps({'success': False, 'error': str(error), 'retry_after': error.retry_after})
+            headers.append(('Content-Type', 'application/json'))
+        else:
+            body = f'{error} (retry in {error.retry_after}s)'
+            headers.append(('Content-Type', 'text/plain; charset=utf-8'))
+        body = body.encode('utf-8')
+        headers.append(('Content-Length', str(len(body))))
+        start_response('503 Service Unavailable', headers)
+        return [body]
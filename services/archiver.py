@@ -0,0 +1,51 @@
+# archiver.py - Moves long-completed orders out of the hot orders collection
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from config import Config
+from models.database import DatabaseManager
+
+class OrderArchiver:
+    """Periodically archives orders that have been done for ARCHIVE_AFTER_DAYS"""
+    def __init__(self, after_days=None, interval_minutes=None):
+        self.after_days = after_days if after_days is not None else Config.ARCHIVE_AFTER_DAYS
+        self.interval_minutes = interval_minutes if interval_minutes is not None else Config.ARCHIVE_INTERVAL_MINUTES
+        self.db_manager = DatabaseManager()
+        self._thread = None
+        self._stop = threading.Event()
+        self.last_run = None
+        self.last_archived = 0
+
+    def run_once(self):
+        """Archive everything past the cutoff; returns the number of orders moved"""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.after_days)
+        self.last_archived = self.db_manager.archive_done_orders(cutoff)
+        self.last_run = time.time()
+        return self.last_archived
+
+    def start(self):
+        """Start the background thread (once per process, after fork)"""
+        if self.interval_minutes <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='order-archiver', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        interval = self.interval_minutes * 60
+        # Spread workers out so they don't all archive at the same moment;
+        # moves are idempotent, so an overlap only costs a few extra reads
+        if self._stop.wait(random.uniform(0, interval)):
+            return
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Order archiver error: {str(e)}")
+            if self._stop.wait(interval):
+                return
+
+archiver = OrderArchiver()
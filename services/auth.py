@@ -11,6 +11,17 @@ def generate_session_key():
     session_key = hashlib.sha256(raw_key.encode()).hexdigest()
     return session_key, timestamp
 
+def ensure_session_key():
+    """Mint the session key on first use, e.g. the first cart change"""
+    from services.sessions import current_session as session
+    
+    if 'session_key' not in session:
+        session_key, timestamp = generate_session_key()
+        session['session_key'] = session_key
+        session['timestamp'] = timestamp
+        session.modified = True
+    return session['session_key']
+
 def verify_session_key(session_key, timestamp):
     """Verify session key hasn't been tampered with"""
     try:
@@ -0,0 +1,105 @@
+# cache.py - Small in-process caches for hot, short-lived lookups
+import threading
+import time
+from config import Config
+
+MISSING = object()
+
+class TTLCache:
+    """Thread-safe dict with a per-entry time to live"""
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached value, or MISSING when absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries and key not in self._entries:
+                self._evict()
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        # Still full: drop the entries closest to expiry
+        if len(self._entries) >= self.max_entries:
+            by_expiry = sorted(self._entries, key=lambda k: self._entries[k][0])
+            for key in by_expiry[:max(len(by_expiry) // 10, 1)]:
+                del self._entries[key]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+class OrderStatusCache:
+    """Orders for the polling endpoints, cached by tracking status
+
+    Done orders hardly change, preparing ones change often, and orders that
+    don't exist yet are cached briefly so a polling browser doesn't reach
+    Firestore on every tick. Cached orders are shared; treat them as read-only.
+    """
+    def __init__(self):
+        self.cache = TTLCache()
+
+    def ttl_for(self, order):
+        if order is None:
+            return Config.ORDER_CACHE_TTL_MISSING
+        status = order.get('order_status', 'preparing')
+        if status == 'done':
+            return Config.ORDER_CACHE_TTL_DONE
+        if status == 'ready':
+            return Config.ORDER_CACHE_TTL_READY
+        return Config.ORDER_CACHE_TTL_PREPARING
+
+    def get_order(self, order_id, loader, cache_missing=True):
+        """Cached order; with cache_missing=False a miss is neither served from nor kept in the cache"""
+        order = self.cache.get(order_id)
+        if order is MISSING or (order is None and not cache_missing):
+            order = loader(order_id)
+            if order is not None or cache_missing:
+                self.cache.set(order_id, order, self.ttl_for(order))
+        return order
+
+    async def get_order_async(self, order_id, loader, cache_missing=True):
+        """get_order for the asyncio data layer; loader is a coroutine function"""
+        order = self.cache.get(order_id)
+        if order is MISSING or (order is None and not cache_missing):
+            order = await loader(order_id)
+            if order is not None or cache_missing:
+                self.cache.set(order_id, order, self.ttl_for(order))
+        return order
+
+    def invalidate(self, order_id):
+        self.cache.invalidate(order_id)
+
+order_cache = OrderStatusCache()
+
+# Midtrans transaction status by order ID
+payment_status_cache = TTLCache()
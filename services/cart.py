@@ -1,5 +1,10 @@
-from flask import session
-from models.database import DatabaseManager
+from services.sessions import current_session as session
+from services.addon_rules import addon_rules
+from services.catalog import catalog
+from services.tasks import tasks
+
+# Most operations one batch may carry
+MAX_BATCH_OPERATIONS = 100
 
 class CartService:
     @staticmethod
@@ -12,9 +17,18 @@ class CartService:
         """Get current addons from session"""
         return session.get('addons', [])
     
+    @staticmethod
+    def get_version():
+        """Cart version, bumped on every change so clients can detect stale edits"""
+        return session.get('cart_version', 0)
+    
+    @staticmethod
+    def _bump_version():
+        session['cart_version'] = session.get('cart_version', 0) + 1
+    
     @staticmethod
     def add_to_cart(item_data, quantity=1):
-        """Add item to cart and auto-add rice if it's the first main course item"""
+        """Add item to cart and apply the default addon rules (e.g. Rice on the first main item)"""
         if 'cart' not in session:
             session['cart'] = []
         if 'addons' not in session:
@@ -44,41 +58,50 @@ class CartService:
         else:
             session['cart'].append(cart_item)
         
-        # Auto-add rice with quantity 1 if this is the first item added
-        if is_first_main_item:
-            CartService._auto_add_rice()
+        # Default addons from the rule engine (in-memory, no database call)
+        CartService._apply_addon_rules(item_data, is_first_main_item)
         
+        CartService._bump_version()
         session.modified = True
         return session['cart']
     
     @staticmethod
-    def _auto_add_rice():
-        """Auto-add rice addon when first main course item is added"""
+    def _apply_addon_rules(item_data, is_first_main_item):
+        """Auto-add addons whose rules match the item just added"""
         try:
-            db_manager = DatabaseManager()
-            rice_addon = db_manager.get_rice_addon()
+            adds, _ = addon_rules.evaluate(item_data, is_first_main_item)
             
-            if rice_addon and rice_addon.get('available', True):
-                # Check if rice is already in addons
-                rice_exists = False
+            for rule_addon, quantity in adds:
+                # Check if addon is already in cart
+                addon_exists = False
                 for addon in session['addons']:
-                    if addon['id'] == rice_addon['id']:
-                        rice_exists = True
+                    if addon['id'] == rule_addon['id']:
+                        addon_exists = True
                         break
                 
-                if not rice_exists:
-                    rice_cart_item = {
-                        'id': rice_addon['id'],
-                        'name': rice_addon['name'],
-                        'price': rice_addon['price'],
-                        'quantity': 1,
-                        'total': rice_addon['price']
-                    }
-                    session['addons'].append(rice_cart_item)
-                    print(f"Auto-added rice addon: {rice_addon['name']}")
+                if not addon_exists:
+                    session['addons'].append({
+                        'id': rule_addon['id'],
+                        'name': rule_addon['name'],
+                        'price': rule_addon['price'],
+                        'quantity': quantity,
+                        'total': rule_addon['price'] * quantity
+                    })
+                    tasks.log("Auto-added addon: %s x%s", rule_addon['name'], quantity)
         
         except Exception as e:
-            print(f"Error auto-adding rice: {str(e)}")
+            tasks.log("Error applying addon rules: %s", str(e))
+    
+    @staticmethod
+    def get_suggested_addons(item_data):
+        """Addons the rules suggest for an item, minus those already in the cart"""
+        try:
+            _, suggestions = addon_rules.evaluate(item_data, False)
+        except Exception as e:
+            tasks.log("Error evaluating addon suggestions: %s", str(e))
+            return []
+        in_cart = {addon['id'] for addon in session.get('addons', [])}
+        return [addon for addon in suggestions if addon['id'] not in in_cart]
     
     @staticmethod
     def update_cart_item(item_id, quantity):
@@ -94,6 +117,7 @@ class CartService:
                 break
         
         session['cart'] = cart
+        CartService._bump_version()
         session.modified = True
         return cart
     
@@ -124,6 +148,7 @@ class CartService:
         else:
             session['addons'].append(addon_item)
         
+        CartService._bump_version()
         session.modified = True
         return session['addons']
     
@@ -141,15 +166,86 @@ class CartService:
                 break
         
         session['addons'] = addons
+        CartService._bump_version()
         session.modified = True
         return addons
     
+    @staticmethod
+    def replace_cart(cart, addons):
+        """Replace cart lines and addons, e.g. with repriced ones at checkout"""
+        session['cart'] = cart
+        session['addons'] = addons
+        CartService._bump_version()
+        session.modified = True
+    
     @staticmethod
     def clear_cart():
         """Clear the cart and addons"""
         session['cart'] = []
         session['addons'] = []
+        CartService._bump_version()
+        session.modified = True
+    
+    @staticmethod
+    def apply_operations(operations, expected_version):
+        """Apply an ordered list of quantity changes all-or-nothing
+        
+        Each operation is {'op': 'set_item' | 'set_addon', 'id': ..., 'quantity': n};
+        quantity 0 removes the line and set_addon adds an addon not yet in the
+        cart. Returns (success, error, stale). Nothing is written unless every
+        operation is valid and expected_version matches the session cart.
+        """
+        if expected_version != CartService.get_version():
+            return False, 'Cart has changed, please try again', True
+        if not isinstance(operations, list) or not operations:
+            return False, 'No operations given', False
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return False, f'At most {MAX_BATCH_OPERATIONS} operations per batch', False
+        
+        # Work on copies so a bad operation leaves the session untouched
+        cart = [dict(item) for item in session.get('cart', [])]
+        addons = [dict(addon) for addon in session.get('addons', [])]
+        
+        for operation in operations:
+            try:
+                op = operation['op']
+                line_id = str(operation['id'])
+                quantity = int(operation['quantity'])
+            except (KeyError, TypeError, ValueError):
+                return False, 'Invalid cart operation', False
+            if quantity < 0:
+                return False, 'Quantity cannot be negative', False
+            
+            if op == 'set_item':
+                lines = cart
+            elif op == 'set_addon':
+                lines = addons
+            else:
+                return False, f'Unknown cart operation: {op}', False
+            
+            line = next((line for line in lines if line['id'] == line_id), None)
+            if line is None:
+                if quantity == 0:
+                    continue
+                if op == 'set_item':
+                    return False, 'Item not in cart', False
+                addon_data = catalog.get_addon(line_id)
+                if not addon_data or not addon_data.get('available', True):
+                    return False, 'Addon not available', False
+                line = {'id': addon_data['id'], 'name': addon_data['name'], 'price': addon_data['price']}
+                lines.append(line)
+            
+            if quantity == 0:
+                lines.remove(line)
+            else:
+                line['quantity'] = quantity
+                line['total'] = line['price'] * quantity
+        
+        session['cart'] = cart
+        session['addons'] = addons
+        CartService._bump_version()
         session.modified = True
+        return True, None, False
     
     @staticmethod
     def get_cart_total():
@@ -0,0 +1,171 @@
+import threading
+import time
+from config import Config
+from models.database import DatabaseManager
+from services.catalog_snapshot import CatalogSnapshot
+from services.stock import stock
+from services.tasks import tasks
+
+class CatalogCache:
+    """Per-process view of the menu and addon collections
+
+    With a host snapshot (Config.CATALOG_SNAPSHOT_DIR) the workers adopt the
+    version published there and only one of them reads Firestore per TTL.
+    Without one, each process loads the catalog itself. Items that have sold
+    their daily stock are served as unavailable until the next business day.
+    """
+    def __init__(self, ttl=None, snapshot_dir=None):
+        self.ttl = ttl if ttl is not None else Config.CATALOG_TTL
+        self.db_manager = DatabaseManager()
+        self.snapshot = CatalogSnapshot.from_config(
+            snapshot_dir if snapshot_dir is not None else Config.CATALOG_SNAPSHOT_DIR)
+        self._lock = threading.Lock()
+        self._menu = None
+        self._menu_view = None
+        self._sold_out = frozenset()
+        self._addons = None
+        self._menu_by_id = {}
+        self._addons_by_id = {}
+        self._loaded_at = 0
+        self._snapshot_id = None
+        self._snapshot_version = 0
+        self._next_check = 0
+        self.version = 0
+
+    def is_stale(self):
+        """True when the next read has to check for or load a newer catalog"""
+        if self._menu is None:
+            return True
+        if self.snapshot is not None:
+            return time.monotonic() >= self._next_check
+        return self._expired()
+
+    def _expired(self):
+        return self._menu is None or time.time() - self._loaded_at > self.ttl
+
+    def refresh(self):
+        """Reload menu and addons from Firestore (and publish them to the host)"""
+        with self._lock:
+            if self.snapshot is None:
+                self._load()
+                return
+            with self.snapshot.refresh_lock(blocking=True):
+                self._load()
+                self._publish()
+
+    def warm(self):
+        """Make sure a catalog is loaded, from the host snapshot if there is one"""
+        self._ensure_fresh()
+
+    def _load(self):
+        menu = self.db_manager.get_menu_items()
+        addons = self.db_manager.get_addons()
+        self._set(menu, addons, time.time())
+        tasks.log("Catalog loaded: %s menu items, %s addons (v%s)", len(menu), len(addons), self.version)
+
+    def _set(self, menu, addons, loaded_at):
+        self._menu = menu
+        self._addons = addons
+        self._addons_by_id = {addon['id']: addon for addon in addons}
+        self._loaded_at = loaded_at
+        self._apply_stock(force=True)
+    
+    def _apply_stock(self, force=False):
+        """Rebuild the served menu when the set of sold-out items changes"""
+        try:
+            sold_out = stock.sold_out_ids(self._menu)
+        except Exception as e:
+            tasks.log("Stock check failed: %s", str(e))
+            sold_out = self._sold_out
+        if not force and sold_out == self._sold_out:
+            return
+        menu = [dict(item, available=False, sold_out=True) if item['id'] in sold_out else item
+                for item in self._menu]
+        self._menu_by_id = {item['id']: item for item in menu}
+        self._menu_view = menu
+        self._sold_out = sold_out
+        self.version += 1
+
+    def _publish(self):
+        try:
+            self._snapshot_version += 1
+            self.snapshot.publish(self._snapshot_version, {'menu': self._menu, 'addons': self._addons})
+            self._snapshot_id = self.snapshot.current_id()
+        except (OSError, TypeError) as e:
+            # Don't leave every worker reloading on each check; fall back to per-process
+            tasks.log("Catalog snapshot publish failed, sharing disabled: %s", str(e))
+            self.snapshot = None
+
+    def _adopt_published(self):
+        """Switch to the host snapshot if it changed since we last looked"""
+        snapshot_id = self.snapshot.current_id()
+        if snapshot_id is None or snapshot_id == self._snapshot_id:
+            return
+        published = self.snapshot.read()
+        if published is None:
+            return
+        snapshot_version, loaded_at, data = published
+        self._set(data['menu'], data['addons'], loaded_at)
+        self._snapshot_id = snapshot_id
+        self._snapshot_version = snapshot_version
+
+    def _sync_snapshot(self):
+        self._next_check = time.monotonic() + Config.CATALOG_SNAPSHOT_CHECK_SECONDS
+        self._adopt_published()
+        if not self._expired() and self.snapshot.current_id() is not None:
+            return
+
+        # Expired or invalidated: one worker on the host rebuilds it while the
+        # others keep serving what they have (unless they have nothing yet)
+        with self.snapshot.refresh_lock(blocking=self._menu is None) as locked:
+            if not locked:
+                return
+            self._adopt_published()
+            if self._expired() or self.snapshot.current_id() is None:
+                self._load()
+                self._publish()
+
+    def _ensure_fresh(self):
+        if self.is_stale():
+            with self._lock:
+                # Another thread may have reloaded while we waited
+                if self.is_stale():
+                    if self.snapshot is None:
+                        self._load()
+                    else:
+                        self._sync_snapshot()
+        self._apply_stock()
+
+    def invalidate(self):
+        """Force the next read to reload from Firestore, on every worker of the host"""
+        self._loaded_at = 0
+        self._next_check = 0
+        if self.snapshot is not None:
+            self.snapshot.discard()
+
+    def get_menu_items(self):
+        """Get all menu items"""
+        self._ensure_fresh()
+        return list(self._menu_view)
+
+    def get_menu_item(self, item_id):
+        """Get single menu item, or None"""
+        self._ensure_fresh()
+        return self._menu_by_id.get(item_id)
+
+    def get_addon(self, addon_id):
+        """Get single addon, or None"""
+        self._ensure_fresh()
+        return self._addons_by_id.get(addon_id)
+
+    def get_addons(self):
+        """Get all addons"""
+        self._ensure_fresh()
+        return list(self._addons)
+
+    def get_available_addons(self):
+        """Get only available addons"""
+        self._ensure_fresh()
+        return [addon for addon in self._addons if addon.get('available') is True]
+
+catalog = CatalogCache()
@@ -0,0 +1,138 @@
+# catalog_import.py - Validation, parsing and diffing for menu/addon imports
+import csv
+import io
+import json
+from services.addon_rules import validate_auto_rules
+
+MENU_REQUIRED_FIELDS = ['name', 'description', 'price', 'image_url', 'category']
+ADDON_REQUIRED_FIELDS = ['name', 'price']
+
+def parse_bool(value, default=True):
+    """Accept real booleans as well as CSV-style yes/no strings"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ['1', 'true', 'yes', 'y', 'on']
+
+def build_menu_item(data):
+    """Validate and normalise a menu item, raising ValueError on bad input"""
+    for field in MENU_REQUIRED_FIELDS:
+        if not data.get(field):
+            raise ValueError(f'{field} is required')
+
+    item = {
+        'name': str(data['name']).strip(),
+        'description': data['description'],
+        'price': int(data['price']),
+        'image_url': data['image_url'],
+        'category': data['category'],
+        'available': parse_bool(data.get('available'))
+    }
+    # Optional portions per day; empty means unlimited
+    if data.get('daily_stock') not in (None, ''):
+        item['daily_stock'] = parse_daily_stock(data['daily_stock'])
+    return item
+
+def parse_daily_stock(value):
+    """Daily portion limit from a form or upload value; None/'' means unlimited"""
+    if value is None or value == '':
+        return None
+    value = int(value)
+    if value < 0:
+        raise ValueError('daily_stock cannot be negative')
+    return value
+
+def build_addon(data):
+    """Validate and normalise an addon, raising ValueError on bad input"""
+    for field in ADDON_REQUIRED_FIELDS:
+        if not data.get(field):
+            raise ValueError(f'{field} is required')
+
+    addon = {
+        'name': str(data['name']).strip(),
+        'price': int(data['price']),
+        'available': parse_bool(data.get('available'))
+    }
+    # Optional default/suggest rules; a JSON string is accepted for CSV uploads
+    rules = data.get('auto_rules')
+    if isinstance(rules, str) and rules.strip():
+        rules = json.loads(rules)
+    if rules:
+        addon['auto_rules'] = validate_auto_rules(rules)
+    return addon
+
+BUILDERS = {
+    'menu': build_menu_item,
+    'addons': build_addon
+}
+
+def parse_upload(filename, content, kind=None):
+    """Turn an uploaded CSV or JSON file into {'menu': [...], 'addons': [...]}"""
+    text = content.decode('utf-8-sig') if isinstance(content, bytes) else content
+
+    if filename.lower().endswith('.csv'):
+        if kind not in BUILDERS:
+            raise ValueError('Choose menu or addons for CSV uploads')
+        return {kind: list(csv.DictReader(io.StringIO(text)))}
+
+    data = json.loads(text)
+    if isinstance(data, list):
+        if kind not in BUILDERS:
+            raise ValueError('Choose menu or addons for a JSON list')
+        return {kind: data}
+    if isinstance(data, dict):
+        return {key: data.get(key) or [] for key in BUILDERS}
+    raise ValueError('JSON must be a list or an object with menu/addons keys')
+
+def diff_catalog(rows, existing, builder):
+    """Compare import rows with the current catalog
+
+    Rows match existing docs by id when given, otherwise by name
+    (case-insensitive). Returns creates, per-doc field changes, the number of
+    unchanged rows and any validation errors (1-based row numbers).
+    """
+    by_id = {doc['id']: doc for doc in existing}
+    by_name = {str(doc.get('name', '')).strip().lower(): doc for doc in existing}
+
+    plan = {'creates': [], 'updates': [], 'unchanged': 0, 'errors': []}
+    seen = set()
+
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            item = builder(row)
+        except (ValueError, TypeError) as e:
+            plan['errors'].append({'row': row_number, 'error': str(e)})
+            continue
+
+        doc_id = str(row.get('id') or '').strip()
+        if doc_id:
+            current = by_id.get(doc_id)
+            if current is None:
+                plan['errors'].append({'row': row_number, 'error': f'Unknown id {doc_id}'})
+                continue
+        else:
+            current = by_name.get(item['name'].lower())
+
+        key = current['id'] if current else item['name'].lower()
+        if key in seen:
+            plan['errors'].append({'row': row_number, 'error': f"Duplicate entry for {item['name']}"})
+            continue
+        seen.add(key)
+
+        if current is None:
+            plan['creates'].append(item)
+            continue
+
+        # Only fields present in the row count, so a missing 'available' column
+        # doesn't switch items back on
+        changes = {
+            field: value for field, value in item.items()
+            if row.get(field) not in (None, '') and current.get(field) != value
+        }
+        if changes:
+            plan['updates'].append({'id': current['id'], 'name': item['name'], 'changes': changes})
+        else:
+            plan['unchanged'] += 1
+
+    return plan
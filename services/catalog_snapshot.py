@@ -0,0 +1,105 @@
+# catalog_snapshot.py - Versioned catalog snapshot shared by the workers on a host
+import json
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: every process keeps its own catalog
+    fcntl = None
+
+MAGIC = b'CATSNAP1'
+# magic, version, loaded_at (epoch seconds), payload length
+HEADER = struct.Struct('<8sQdQ')
+
+def _encode(value):
+    # Firestore timestamps survive the round trip as datetimes
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f'Cannot snapshot {type(value).__name__}')
+
+def _decode(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+class CatalogSnapshot:
+    """One serialised catalog per host in a memory-backed file
+
+    A refresher writes a new file beside the current one and renames it into
+    place, so a worker maps either the old version or the new one, never a mix.
+    An exclusive lock file makes sure only one worker at a time reads
+    Firestore to build it.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'catalog.snapshot')
+        self.lock_path = os.path.join(directory, 'catalog.lock')
+
+    @classmethod
+    def from_config(cls, directory):
+        """A snapshot in directory, or None where sharing isn't possible"""
+        if not directory or fcntl is None:
+            return None
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            print(f"Catalog snapshot disabled ({directory}): {str(e)}")
+            return None
+        return cls(directory)
+
+    def current_id(self):
+        """Changes whenever a new snapshot is published; None if there is none"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def read(self):
+        """(version, loaded_at, {'menu': [...], 'addons': [...]}), or None if missing"""
+        try:
+            with open(self.path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    magic, version, loaded_at, length = HEADER.unpack_from(mapped, 0)
+                    if magic != MAGIC:
+                        return None
+                    payload = mapped[HEADER.size:HEADER.size + length]
+        except (FileNotFoundError, ValueError, struct.error):
+            return None
+        return version, loaded_at, json.loads(payload, object_hook=_decode)
+
+    def publish(self, version, catalog):
+        """Atomically replace the snapshot with a new version"""
+        payload = json.dumps(catalog, default=_encode, separators=(',', ':')).encode('utf-8')
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, version, time.time(), len(payload)))
+            f.write(payload)
+        os.replace(temp_path, self.path)
+
+    def discard(self):
+        """Remove the snapshot so the next reader on any worker rebuilds it"""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def refresh_lock(self, blocking):
+        """Hold the host-wide refresh lock; yields False if busy and not blocking"""
+        with open(self.lock_path, 'a') as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
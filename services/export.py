@@ -0,0 +1,95 @@
+# export.py - Row generators for streaming order exports
+import csv
+import io
+import json
+from datetime import datetime
+
+ORDER_COLUMNS = [
+    'order_id', 'created_at', 'business_date', 'customer_name', 'customer_phone',
+    'customer_email', 'total', 'status', 'order_status', 'payment_method',
+    'transaction_id', 'notes', 'items'
+]
+
+ITEM_COLUMNS = [
+    'order_id', 'created_at', 'business_date', 'customer_name', 'customer_phone',
+    'order_total', 'order_status', 'item_id', 'item_name', 'item_type',
+    'quantity', 'price', 'item_total'
+]
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _timestamp(value):
+    return value.isoformat() if isinstance(value, datetime) else (value or '')
+
+def order_row(order):
+    """One export row per order, items summarised in a single column"""
+    customer = order.get('customer') or {}
+    items = order.get('items') or []
+    return {
+        'order_id': order.get('order_id', order.get('id')),
+        'created_at': _timestamp(order.get('created_at')),
+        'business_date': order.get('business_date', ''),
+        'customer_name': customer.get('name', ''),
+        'customer_phone': customer.get('phone', ''),
+        'customer_email': customer.get('email', ''),
+        'total': order.get('total', 0),
+        'status': order.get('status', ''),
+        'order_status': order.get('order_status', ''),
+        'payment_method': order.get('payment_method', ''),
+        'transaction_id': order.get('transaction_id', ''),
+        'notes': order.get('notes', ''),
+        'items': '; '.join(f"{item.get('name', 'Item')} x{item.get('quantity', 1)}" for item in items)
+    }
+
+def item_rows(order):
+    """One export row per line item"""
+    customer = order.get('customer') or {}
+    for item in order.get('items') or []:
+        yield {
+            'order_id': order.get('order_id', order.get('id')),
+            'created_at': _timestamp(order.get('created_at')),
+            'business_date': order.get('business_date', ''),
+            'customer_name': customer.get('name', ''),
+            'customer_phone': customer.get('phone', ''),
+            'order_total': order.get('total', 0),
+            'order_status': order.get('order_status', ''),
+            'item_id': item.get('id', ''),
+            'item_name': item.get('name', ''),
+            'item_type': item.get('type', 'menu'),
+            'quantity': item.get('quantity', 1),
+            'price': item.get('price', 0),
+            'item_total': item.get('total', 0)
+        }
+
+def _rows(orders, flatten):
+    for order in orders:
+        if flatten:
+            yield from item_rows(order)
+        else:
+            yield order_row(order)
+
+def stream_csv(orders, flatten=False):
+    """Yield CSV text chunk by chunk, never holding more than one row"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=ITEM_COLUMNS if flatten else ORDER_COLUMNS)
+    writer.writeheader()
+    for row in _rows(orders, flatten):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Header only when there were no orders
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def stream_jsonl(orders, flatten=False):
+    """Yield one JSON document per line"""
+    if flatten:
+        for row in _rows(orders, True):
+            yield json.dumps(row, default=_json_default) + '\n'
+    else:
+        for order in orders:
+            yield json.dumps(order, default=_json_default) + '\n'
@@ -0,0 +1,169 @@
+# idempotency.py - Replay stored responses for repeated requests with the same Idempotency-Key
+import hashlib
+import time
+from functools import wraps
+from config import Config
+from models.database import DatabaseManager
+from services.cache import TTLCache, MISSING
+from services.tasks import tasks
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+
+class IdempotencyConflictError(Exception):
+    """Raised for a key that is still being processed or was used for a different request"""
+    def __init__(self, message, status_code, retry_after=None):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        super().__init__(message)
+
+class IdempotencyStore:
+    """Idempotency records in Firestore, fronted by a per-process cache
+
+    The first request with a key creates its record (create-if-absent, so two
+    workers can't both claim it), runs, and stores its response. Repeats
+    within Config.IDEMPOTENCY_TTL get that response back: from memory on the
+    same worker, from one document read on another. Only successful responses
+    are kept, so a request that failed can be retried with the same key.
+    """
+    def __init__(self, db_manager=None, ttl=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.ttl = ttl if ttl is not None else Config.IDEMPOTENCY_TTL
+        self.responses = TTLCache(max_entries=2000)
+        self.replayed = 0
+
+    def record_id(self, scope, key):
+        return hashlib.sha256(f'{scope}\0{key}'.encode('utf-8')).hexdigest()
+
+    def begin(self, record_id, fingerprint):
+        """Claim a key; returns a stored response to replay, or None to go ahead"""
+        cached = self.responses.get(record_id)
+        if cached is not MISSING:
+            return self._replay(cached, fingerprint)
+
+        now = time.time()
+        existing = self.db_manager.claim_idempotency_key(record_id, {
+            'state': IN_PROGRESS,
+            'fingerprint': fingerprint,
+            'claimed_at': now,
+            'expires_at': now + self.ttl
+        })
+        if existing is None:
+            return None
+        if existing.get('expires_at', 0) < now or (
+                existing.get('state') == IN_PROGRESS
+                and now - existing.get('claimed_at', 0) > Config.IDEMPOTENCY_LOCK_SECONDS):
+            # Expired, or claimed by a request that never finished: start over
+            self.db_manager.delete_idempotency_key(record_id)
+            return self.begin(record_id, fingerprint)
+        if existing.get('state') == COMPLETED:
+            self.responses.set(record_id, existing, existing['expires_at'] - now)
+            return self._replay(existing, fingerprint)
+        raise IdempotencyConflictError('This request is already being processed, please wait', 409, retry_after=1)
+
+    def _replay(self, record, fingerprint):
+        if fingerprint not in record.get('fingerprints', [record.get('fingerprint')]):
+            raise IdempotencyConflictError('Idempotency key was already used for a different request', 422)
+        self.replayed += 1
+        return record['response']
+
+    def complete(self, record_id, fingerprint, response, later_fingerprint=None):
+        """Store a successful response for replay
+
+        later_fingerprint is the request as it would look after the response,
+        when the view changed session state that goes into the fingerprint.
+        Repeats match either one.
+        """
+        now = time.time()
+        record = {
+            'state': COMPLETED,
+            'fingerprint': fingerprint,
+            'fingerprints': list(dict.fromkeys([fingerprint, later_fingerprint or fingerprint])),
+            'response': response,
+            'claimed_at': now,
+            'expires_at': now + self.ttl
+        }
+        self.responses.set(record_id, record, self.ttl)
+        try:
+            self.db_manager.save_idempotency_key(record_id, record)
+        except Exception as e:
+            # Same-worker repeats still replay from memory; others will re-run
+            tasks.log("Idempotency record save failed: %s", str(e))
+
+    def release(self, record_id):
+        """Drop the claim of a request that didn't succeed so it can be retried"""
+        try:
+            self.db_manager.delete_idempotency_key(record_id)
+        except Exception as e:
+            tasks.log("Idempotency release failed: %s", str(e))
+
+idempotency_store = IdempotencyStore()
+
+def _fingerprint(body, version):
+    return hashlib.sha256(f'{version}\0'.encode('utf-8') + body).hexdigest()
+
+def idempotent(scope, session_version=None, session_keys=()):
+    """Make a JSON view safe to repeat when the client sends an Idempotency-Key header
+
+    Keys are scoped to the endpoint and the caller's session. Requests
+    without a key run as before. session_version, if given, returns the
+    session state the response depends on (e.g. the cart version); it goes
+    into the fingerprint next to the body. session_keys are saved with the
+    response and written back into the session on replay, since a client
+    whose response was lost also lost the cookie that carried them.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request, make_response, jsonify
+            from services.sessions import current_session as session
+
+            key = request.headers.get(HEADER, '').strip()
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                response = jsonify({'success': False, 'error': 'Idempotency key is too long'})
+                response.status_code = 400
+                return response
+
+            record_id = idempotency_store.record_id(f"{scope}:{session.get('session_key', '')}", key)
+            body = request.get_data()
+            fingerprint = _fingerprint(body, session_version() if session_version else '')
+            try:
+                stored = idempotency_store.begin(record_id, fingerprint)
+            except IdempotencyConflictError as e:
+                response = jsonify({'success': False, 'error': str(e), 'retry_after': e.retry_after})
+                response.status_code = e.status_code
+                if e.retry_after:
+                    response.headers['Retry-After'] = str(e.retry_after)
+                return response
+            if stored is not None:
+                for name, value in (stored.get('session') or {}).items():
+                    session[name] = value
+                if stored.get('session'):
+                    session.modified = True
+                response = make_response(stored['body'], stored['status'])
+                response.mimetype = 'application/json'
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                idempotency_store.release(record_id)
+                raise
+            body = response.get_json(silent=True) if response.is_json else None
+            if response.status_code == 200 and isinstance(body, dict) and body.get('success'):
+                idempotency_store.complete(record_id, fingerprint, {
+                    'status': response.status_code,
+                    'body': response.get_data(as_text=True),
+                    'session': {name: session[name] for name in session_keys if name in session}
+                }, _fingerprint(body, session_version()) if session_version else None)
+            else:
+                idempotency_store.release(record_id)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,230 @@
+# menu_search.py - In-memory search and facet index over the menu catalog
+import bisect
+import re
+import threading
+import unicodedata
+from services.catalog import catalog
+from services.tasks import tasks
+
+# Field weights: a hit in the name counts more than one in the description
+FIELD_WEIGHTS = {'name': 3, 'category': 2, 'description': 1}
+EXACT, PREFIX, FUZZY = 3, 2, 1
+
+STOPWORDS = {'dan', 'dengan', 'atau', 'yang', 'di', 'ke', 'dari', 'untuk', 'pakai', 'isi', 'per', 'the', 'and', 'with'}
+# Particles/possessive that don't change what the dish is: "ayamnya" -> "ayam"
+SUFFIXES = ('nya', 'lah', 'kah')
+MIN_FUZZY_LENGTH = 3
+
+def normalise(text):
+    """Lowercase and strip accents"""
+    text = unicodedata.normalize('NFKD', str(text or '').lower())
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+def tokenize(text):
+    """Split into search terms, Indonesian style
+
+    Reduplication ("sayur-sayur", "sayur2") collapses to the base word,
+    particles like -nya are dropped and common stopwords are skipped.
+    """
+    tokens = []
+    for word in re.findall(r'[a-z0-9]+', normalise(text)):
+        # "ayam2" is written shorthand for "ayam-ayam"
+        if len(word) > 3 and word.endswith('2') and not word[:-1].isdigit():
+            word = word[:-1]
+        for suffix in SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+                word = word[:-len(suffix)]
+                break
+        if word in STOPWORDS or word in tokens:
+            continue
+        tokens.append(word)
+    return tokens
+
+def _deletes(term):
+    """The term with each single character removed"""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+def _within_one_edit(a, b):
+    """True if a and b differ by one insert, delete, substitution or swap"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 1:
+            return True
+        return (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    if len(a) > len(b):
+        a, b = b, a
+    return any(b[:i] + b[i + 1:] == a for i in range(len(b)))
+
+class MenuSearchIndex:
+    """Inverted index over menu name, description and category
+
+    Kept in step with the catalog cache: when the catalog version changes,
+    only items that were added, changed or removed are re-indexed.
+    Queries never touch Firestore.
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._version = None
+        self.items = {}
+        # term -> {item_id: weight of the best field containing the term}
+        self.postings = {}
+        self.terms = []
+        # deleted-character variant -> terms, for one-edit fuzzy matches
+        self.fuzzy_keys = {}
+        self.by_category = {}
+        self.by_availability = {True: set(), False: set()}
+
+    def _sync(self):
+        # Read the version first: if the catalog reloads in between we just sync again next time
+        version = self.catalog.version
+        menu = self.catalog.get_menu_items()
+        if self._version == version:
+            return
+        with self._lock:
+            if self._version == version:
+                return
+            current = {item['id']: item for item in menu}
+            for item_id in list(self.items):
+                if item_id not in current:
+                    self._remove(item_id)
+            changed = 0
+            for item_id, item in current.items():
+                if self.items.get(item_id) != item:
+                    self._remove(item_id)
+                    self._add(item)
+                    changed += 1
+            self.terms = sorted(self.postings)
+            self._version = version
+            if changed:
+                tasks.log("Menu search index: %s items re-indexed, %s total", changed, len(self.items))
+
+    def _add(self, item):
+        item_id = item['id']
+        self.items[item_id] = item
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(item.get(field)):
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = {}
+                    for key in _deletes(term) | {term}:
+                        self.fuzzy_keys.setdefault(key, set()).add(term)
+                postings[item_id] = max(postings.get(item_id, 0), weight)
+        self.by_category.setdefault(self._category_key(item), set()).add(item_id)
+        self.by_availability[bool(item.get('available', True))].add(item_id)
+
+    def _remove(self, item_id):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return
+        for field in FIELD_WEIGHTS:
+            for term in tokenize(item.get(field)):
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(item_id, None)
+                if not postings:
+                    del self.postings[term]
+                    for key in _deletes(term) | {term}:
+                        keys = self.fuzzy_keys.get(key)
+                        if keys is not None:
+                            keys.discard(term)
+                            if not keys:
+                                del self.fuzzy_keys[key]
+        category = self._category_key(item)
+        self.by_category.get(category, set()).discard(item_id)
+        if not self.by_category.get(category):
+            self.by_category.pop(category, None)
+        for ids in self.by_availability.values():
+            ids.discard(item_id)
+
+    @staticmethod
+    def _category_key(item):
+        return str(item.get('category') or '').strip().lower()
+
+    def _term_matches(self, token):
+        """[(term, match weight)] for a query token: exact, prefix, then one-edit fuzzy"""
+        matches = {}
+        start = bisect.bisect_left(self.terms, token)
+        for term in self.terms[start:]:
+            if not term.startswith(token):
+                break
+            matches[term] = EXACT if term == token else PREFIX
+        if len(token) >= MIN_FUZZY_LENGTH:
+            for key in _deletes(token) | {token}:
+                for term in self.fuzzy_keys.get(key, ()):
+                    if term not in matches and _within_one_edit(token, term):
+                        matches[term] = FUZZY
+        return matches.items()
+
+    def _match(self, query):
+        """{item_id: score} for items matching every query token"""
+        scores = None
+        for token in tokenize(query):
+            token_scores = {}
+            for term, match_weight in self._term_matches(token):
+                for item_id, field_weight in self.postings[term].items():
+                    score = field_weight * match_weight
+                    if score > token_scores.get(item_id, 0):
+                        token_scores[item_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {item_id: scores[item_id] + score
+                          for item_id, score in token_scores.items() if item_id in scores}
+            if not scores:
+                return {}
+        if scores is None:
+            # No usable terms: every item matches equally
+            return {item_id: 0 for item_id in self.items}
+        return scores
+
+    def search(self, query='', category=None, available=None, min_price=None, max_price=None,
+               limit=50, offset=0):
+        """Ranked items plus category and availability facets for the matches"""
+        self._sync()
+        with self._lock:
+            scores = self._match(query)
+            candidates = set(scores)
+            if available is not None:
+                candidates &= self.by_availability[bool(available)]
+            if min_price is not None or max_price is not None:
+                candidates = {item_id for item_id in candidates
+                              if (min_price is None or self.items[item_id].get('price', 0) >= min_price)
+                              and (max_price is None or self.items[item_id].get('price', 0) <= max_price)}
+
+            # Category facet counts ignore the category filter so the tabs keep their numbers
+            facets = {
+                'category': {self.items[next(iter(ids))].get('category', ''): len(ids & candidates)
+                             for ids in self.by_category.values() if ids & candidates},
+                'available': {'true': len(candidates & self.by_availability[True]),
+                              'false': len(candidates & self.by_availability[False])}
+            }
+            if category:
+                candidates &= self.by_category.get(category.strip().lower(), set())
+
+            ranked = sorted(candidates,
+                            key=lambda item_id: (-scores[item_id], normalise(self.items[item_id].get('name'))))
+            return {
+                'items': [self.items[item_id] for item_id in ranked[offset:offset + limit]],
+                'total': len(ranked),
+                'facets': facets
+            }
+
+    def facets(self):
+        """Precomputed category and availability counts for the whole menu"""
+        self._sync()
+        with self._lock:
+            return {
+                'category': {self.items[next(iter(ids))].get('category', ''): len(ids)
+                             for ids in self.by_category.values()},
+                'available': {'true': len(self.by_availability[True]),
+                              'false': len(self.by_availability[False])}
+            }
+
+menu_search = MenuSearchIndex(catalog)
@@ -1,9 +1,16 @@
-import requests
 import base64
 import secrets
 import time
 from datetime import datetime
 from config import Config
+from services import startup
+from services.startup import lazy_import
+from services.cache import payment_status_cache, MISSING
+from services.tasks import tasks
+from services.resilience import (midtrans_breaker, call_timeout, CircuitOpenError,
+                                 DeadlineExceededError)
+
+requests = lazy_import('requests')
 
 class PaymentService:
     def __init__(self):
@@ -11,12 +18,22 @@ class PaymentService:
         self.client_key = Config.MIDTRANS_CLIENT_KEY
         self.snap_url = Config.MIDTRANS_SNAP_URL
         self.status_url = Config.MIDTRANS_STATUS_URL
+        self._http = None
+        self._http_generation = None
+    
+    @property
+    def http(self):
+        """Keep-alive HTTP session for Midtrans, one per worker process"""
+        if self._http is None or self._http_generation != startup.fork_generation:
+            self._http = requests.Session()
+            self._http_generation = startup.fork_generation
+        return self._http
     
     def create_payment(self, cart, customer_data, base_url):
         """Create Midtrans payment transaction"""
         try:
-            print(f"Creating payment with cart: {cart}")
-            print(f"Customer data: {customer_data}")
+            tasks.log("Creating payment with cart: %s", cart)
+            tasks.log("Customer data: %s", customer_data)
             
             # Validate cart is not empty
             if not cart or len(cart) == 0:
@@ -26,7 +43,7 @@ class PaymentService:
             total = 0
             for item in cart:
                 if 'total' not in item or not isinstance(item['total'], (int, int)):
-                    print(f"Invalid item total: {item}")
+                    tasks.log("Invalid item total: %s", item)
                     return {'success': False, 'error': f'Invalid item total for {item.get("name", "unknown item")}'}
                 total += int(item['total'])
             
@@ -35,7 +52,7 @@ class PaymentService:
             
             # Convert to integer (Midtrans requirement)
             total_int = int(round(total))
-            print(f"Calculated total: {total} -> {total_int}")
+            tasks.log("Calculated total: %s -> %s", total, total_int)
             
             # Generate unique order ID
             order_id = f"ORDER-{int(time.time())}-{secrets.token_hex(4)}"
@@ -46,7 +63,7 @@ class PaymentService:
                 try:
                     # Validate required fields
                     if 'id' not in item or 'name' not in item or 'price' not in item or 'quantity' not in item:
-                        print(f"Missing required fields in item {i}: {item}")
+                        tasks.log("Missing required fields in item %s: %s", i, item)
                         return {'success': False, 'error': f'Invalid item data: missing required fields'}
                     
                     item_price = int(item['price'])
@@ -62,10 +79,10 @@ class PaymentService:
                         "name": str(item['name'])[:50]  # Limit name length and ensure string
                     }
                     item_details.append(item_detail)
-                    print(f"Added item detail: {item_detail}")
+                    tasks.log("Added item detail: %s", item_detail)
                     
                 except (ValueError, KeyError) as e:
-                    print(f"Error processing item {i}: {e}")
+                    tasks.log("Error processing item %s: %s", i, e)
                     return {'success': False, 'error': f'Invalid item data: {str(e)}'}
             
             # Validate customer data
@@ -106,9 +123,9 @@ class PaymentService:
             }
             
             # Debug: Print payload
-            print(f"Final Midtrans Payload: {payment_payload}")
-            print(f"Total items: {len(item_details)}")
-            print(f"Gross amount: {total_int}")
+            tasks.log("Final Midtrans Payload: %s", payment_payload)
+            tasks.log("Total items: %s", len(item_details))
+            tasks.log("Gross amount: %s", total_int)
             
             # Validate payload before sending
             if total_int <= 0:
@@ -127,21 +144,23 @@ class PaymentService:
                 'Authorization': f'Basic {encoded_key}'
             }
             
-            print(f"Making request to: {self.snap_url}")
-            print(f"Headers: {headers}")
+            tasks.log("Making request to: %s", self.snap_url)
+            tasks.log("Headers: %s", headers)
             
-            # Make request to Midtrans
-            response = requests.post(
-                self.snap_url,
-                json=payment_payload,
-                headers=headers,
-                timeout=30
-            )
+            # Make request to Midtrans (fails fast while the breaker is open)
+            with midtrans_breaker.guard():
+                response = self.http.post(
+                    self.snap_url,
+                    json=payment_payload,
+                    headers=headers,
+                    timeout=call_timeout(30, 'midtrans')
+                )
+                midtrans_breaker.note_status(response.status_code)
             
             # Debug: Print response details
-            print(f"Midtrans Response Status: {response.status_code}")
-            print(f"Midtrans Response Headers: {response.headers}")
-            print(f"Midtrans Response Text: {response.text[:500]}...")  # First 500 chars
+            tasks.log("Midtrans Response Status: %s", response.status_code)
+            tasks.log("Midtrans Response Headers: %s", response.headers)
+            tasks.log("Midtrans Response Text: %s...", response.text[:500])  # First 500 chars
             
             if response.status_code == 201:
                 try:
@@ -152,7 +171,7 @@ class PaymentService:
                         'order_id': order_id
                     }
                 except ValueError as json_error:
-                    print(f"JSON Parse Error: {json_error}")
+                    tasks.log("JSON Parse Error: %s", json_error)
                     return {
                         'success': False,
                         'error': f'Invalid JSON response from payment service: {response.text[:200]}'
@@ -172,16 +191,31 @@ class PaymentService:
                     'error': f'Payment creation failed (HTTP {response.status_code}): {error_message}'
                 }
         
+        except (CircuitOpenError, DeadlineExceededError) as e:
+            return {'success': False, 'error': str(e), 'retry_after': e.retry_after}
         except requests.exceptions.Timeout:
             return {'success': False, 'error': 'Payment service timeout - please try again'}
         except requests.exceptions.ConnectionError:
             return {'success': False, 'error': 'Cannot connect to payment service - check internet connection'}
         except Exception as e:
-            print(f"Payment creation exception: {str(e)}")
+            tasks.log("Payment creation exception: %s", str(e))
             return {'success': False, 'error': f'Payment creation error: {str(e)}'}
     
     def verify_payment_status(self, order_id):
-        """Verify payment status with Midtrans API"""
+        """Verify payment status with Midtrans API (cached briefly per order)"""
+        transaction_status = payment_status_cache.get(order_id)
+        if transaction_status is MISSING:
+            transaction_status = self._fetch_transaction_status(order_id)
+            if transaction_status is not None:
+                # Settled payments won't change; anything else may, so recheck soon
+                final = transaction_status in ['settlement', 'capture']
+                ttl = Config.PAYMENT_STATUS_CACHE_TTL_PAID if final else Config.PAYMENT_STATUS_CACHE_TTL
+                payment_status_cache.set(order_id, transaction_status, ttl)
+        
+        return transaction_status in ['settlement', 'capture', 'pending']
+    
+    def _fetch_transaction_status(self, order_id):
+        """Midtrans transaction status ('' if unknown), or None on errors that shouldn't be cached"""
         try:
             encoded_key = base64.b64encode(f"{self.server_key}:".encode()).decode()
             headers = {
@@ -189,25 +223,26 @@ class PaymentService:
                 'Authorization': f'Basic {encoded_key}'
             }
             
-            response = requests.get(
-                f'{self.status_url}/{order_id}/status',
-                headers=headers,
-                timeout=10
-            )
+            with midtrans_breaker.guard():
+                response = self.http.get(
+                    f'{self.status_url}/{order_id}/status',
+                    headers=headers,
+                    timeout=call_timeout(10, 'midtrans')
+                )
+                midtrans_breaker.note_status(response.status_code)
             
-            print(f"Payment verification response: {response.status_code} - {response.text}")
+            tasks.log("Payment verification response: %s - %s", response.status_code, response.text)
             
             if response.status_code == 200:
                 try:
                     result = response.json()
-                    transaction_status = result.get('transaction_status')
-                    return transaction_status in ['settlement', 'capture', 'pending']
+                    return result.get('transaction_status') or ''
                 except ValueError:
-                    print(f"Payment verification JSON parse error: {response.text}")
-                    return False
+                    tasks.log("Payment verification JSON parse error: %s", response.text)
+                    return ''
             
-            return False
+            return ''
         
         except Exception as e:
-            print(f"Payment verification error: {str(e)}")
-            return False
\ No newline at end of file
+            tasks.log("Payment verification error: %s", str(e))
+            return None
\ No newline at end of file
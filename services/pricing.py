@@ -0,0 +1,97 @@
+# pricing.py - Authoritative checkout pricing against the live catalog
+from models.database import DatabaseManager
+from models.rollups import business_date
+from services.catalog import catalog
+from services.stock import stock, daily_limit
+
+class PricingService:
+    """Reprices a session cart from Firestore before a payment is created
+
+    The session only remembers what things cost when they were added, so
+    checkout looks every line and addon up again in one batched read. The
+    stock counters of the items the catalog lists as limited come back in
+    the same read.
+    """
+    def __init__(self, db_manager=None):
+        self.db_manager = db_manager or DatabaseManager()
+
+    def reprice(self, cart, addons):
+        """Reprice cart lines and addons
+
+        Returns {'success': True, 'cart', 'addons', 'total', 'price_changes'},
+        or {'success': False, 'error', 'unavailable'} if any line can't be sold.
+        """
+        day = business_date()
+        stock_ids = [item['id'] for item in cart
+                     if daily_limit(catalog.get_menu_item(item['id']) or {}) is not None]
+        menu_items, addon_docs, sold = self.db_manager.get_checkout_documents(
+            [item['id'] for item in cart],
+            [addon['id'] for addon in addons],
+            day,
+            stock_ids
+        )
+
+        unavailable = []
+        price_changes = []
+        repriced_cart = self._reprice_lines(cart, menu_items, 'menu', unavailable, price_changes)
+        repriced_addons = self._reprice_lines(addons, addon_docs, 'addon', unavailable, price_changes)
+
+        if unavailable:
+            names = ', '.join(line['name'] for line in unavailable)
+            return {
+                'success': False,
+                'error': f'No longer available: {names}. Please remove from your cart.',
+                'unavailable': unavailable
+            }
+        
+        # Daily portion limits, checked against the live counters
+        short = stock.shortages(repriced_cart, menu_items, day, sold)
+        if short:
+            names = ', '.join(f"{line['name']} (only {line['remaining']} left)" for line in short)
+            return {
+                'success': False,
+                'error': f'Not enough left today: {names}. Please reduce the quantity.',
+                'unavailable': [dict(line, type='menu') for line in short]
+            }
+
+        total = sum(line['total'] for line in repriced_cart + repriced_addons)
+        return {
+            'success': True,
+            'cart': repriced_cart,
+            'addons': repriced_addons,
+            'total': total,
+            'price_changes': price_changes
+        }
+
+    def _reprice_lines(self, lines, documents, line_type, unavailable, price_changes):
+        repriced = []
+        for line in lines:
+            document = documents.get(line['id'])
+            if document is None or not document.get('available', True):
+                unavailable.append({'id': line['id'], 'name': line.get('name', ''), 'type': line_type})
+                continue
+
+            quantity = int(line['quantity'])
+            price = int(document['price'])
+            if price != line.get('price'):
+                price_changes.append({
+                    'id': line['id'],
+                    'name': document.get('name', line.get('name', '')),
+                    'type': line_type,
+                    'old_price': line.get('price'),
+                    'new_price': price,
+                    'quantity': quantity
+                })
+
+            repriced_line = {
+                'id': line['id'],
+                'name': document.get('name', line.get('name', '')),
+                'price': price,
+                'quantity': quantity,
+                'total': price * quantity
+            }
+            if line_type == 'menu' and daily_limit(document) is not None:
+                # Counted against the day's stock when the order is saved
+                repriced_line['stock_limited'] = True
+            repriced.append(repriced_line)
+        return repriced
@@ -0,0 +1,61 @@
+# production.py - Live kitchen production sheet fed by one Firestore listener per process
+import json
+import threading
+import time
+from config import Config
+from models.database import DatabaseManager
+
+# How soon (ms) EventSource reconnects after a stream ends
+RECONNECT_MS = 1000
+
+class ProductionSheetFeed:
+    """Keeps the latest production sheet and wakes up streaming clients on change"""
+    def __init__(self):
+        self.db_manager = DatabaseManager()
+        self._condition = threading.Condition()
+        self._watch = None
+        self.sheet = None
+        self.version = 0
+
+    def start(self):
+        """Register the snapshot listener once; later calls are no-ops"""
+        with self._condition:
+            if self._watch is not None:
+                return
+            self._watch = self.db_manager.watch_production_sheet(self._on_change)
+
+    def _on_change(self, sheet):
+        with self._condition:
+            self.sheet = sheet
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait_for_change(self, last_version, timeout=15):
+        """Block until a newer sheet arrives or the timeout passes"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.version > last_version, timeout=timeout)
+            return self.version, self.sheet
+
+    def stream(self, max_seconds=None):
+        """Server-sent events: the current sheet, then every change, for max_seconds
+
+        Each stream ends before the worker timeout and gives its thread (and
+        admission slot) back; the retry hint makes EventSource reconnect.
+        """
+        self.start()
+        deadline = time.monotonic() + (max_seconds or Config.PRODUCTION_STREAM_SECONDS)
+        yield f"retry: {RECONNECT_MS}\n\n"
+        last_version = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            version, sheet = self.wait_for_change(last_version, timeout=min(15, remaining))
+            if version > last_version and sheet is not None:
+                last_version = version
+                yield f"data: {json.dumps(sheet)}\n\n"
+            else:
+                # Keep-alive comment so proxies don't close an idle stream
+                yield ": keep-alive\n\n"
+
+production_feed = ProductionSheetFeed()
@@ -0,0 +1,286 @@
+# profiler.py - On-demand request profiling into per-endpoint collapsed stacks or pstats files
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from config import Config
+from services.tasks import tasks
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: appends aren't locked
+    fcntl = None
+
+MODES = ['sample', 'cprofile']
+TRIGGER_HEADER = 'X-Profile'
+# How often a worker looks at the shared settings file
+SETTINGS_CHECK_SECONDS = 1.0
+MAX_STACK_DEPTH = 128
+
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'mode': 'sample',
+    'sample_rate': 0.01,
+    'interval_ms': 5,
+    'trigger_token': ''
+}
+
+def _safe_name(endpoint):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint or 'unmatched')
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+def collapse(frame):
+    """Root-first 'a;b;c' stack for a frame, the format flamegraph.pl and speedscope read"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class _Sampler:
+    """One background thread per process that samples the stacks of profiled request threads"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._wake = threading.Event()
+        self._thread = None
+        self.interval = DEFAULT_SETTINGS['interval_ms'] / 1000
+
+    def add(self, thread_id):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='request-sampler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, thread_id):
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                idle = not self._active
+            if idle:
+                # Sleep until a profiled request starts
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+class RequestProfiler:
+    """Profiles a fraction of requests, or those carrying the trigger header
+
+    Settings live in a JSON file in the profile directory so that turning
+    profiling on from the admin page reaches every worker on the host within
+    a second. While it is off, each request costs one attribute check.
+    Results are appended per endpoint: '<endpoint>.collapsed' for the
+    statistical sampler and '<endpoint>.<pid>.prof' (pstats) for cProfile.
+    Only one request per process is under cProfile at a time; others
+    selected meanwhile go unprofiled. From Python 3.12 a cProfile capture
+    also includes other threads' calls made while it runs.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.settings_path = os.path.join(directory, 'settings.json')
+        self.settings = dict(DEFAULT_SETTINGS)
+        self._settings_mtime = None
+        self._next_check = 0
+        self._local = threading.local()
+        self._sampler = _Sampler()
+        self._write_lock = threading.Lock()
+        # Python 3.12+ allows one active profiler per process (sys.monitoring)
+        self._cprofile_lock = threading.Lock()
+        self.enabled = False
+
+    # Settings
+
+    def _refresh_settings(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + SETTINGS_CHECK_SECONDS
+        try:
+            mtime = os.stat(self.settings_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._settings_mtime:
+            return
+        self._settings_mtime = mtime
+        settings = dict(DEFAULT_SETTINGS)
+        if mtime is not None:
+            try:
+                with open(self.settings_path) as f:
+                    settings.update(json.load(f))
+            except (OSError, ValueError) as e:
+                tasks.log("Profiler settings unreadable: %s", str(e))
+        self.settings = settings
+        self._sampler.interval = max(float(settings['interval_ms']), 1) / 1000
+        self.enabled = bool(settings['enabled'])
+
+    def current_settings(self):
+        """Settings as saved right now, skipping the once-a-second throttle"""
+        self._next_check = 0
+        self._refresh_settings()
+        return self.settings
+
+    def update_settings(self, changes):
+        """Validate and save new settings for every worker; returns the saved settings"""
+        self._refresh_settings()
+        settings = dict(self.settings)
+        if 'enabled' in changes:
+            settings['enabled'] = bool(changes['enabled'])
+        if 'mode' in changes:
+            if changes['mode'] not in MODES:
+                raise ValueError(f"mode must be one of {', '.join(MODES)}")
+            settings['mode'] = changes['mode']
+        if 'sample_rate' in changes:
+            rate = float(changes['sample_rate'])
+            if not 0 <= rate <= 1:
+                raise ValueError('sample_rate must be between 0 and 1')
+            settings['sample_rate'] = rate
+        if 'interval_ms' in changes:
+            interval = int(changes['interval_ms'])
+            if not 1 <= interval <= 1000:
+                raise ValueError('interval_ms must be between 1 and 1000')
+            settings['interval_ms'] = interval
+        if changes.get('new_trigger_token'):
+            settings['trigger_token'] = secrets.token_urlsafe(16)
+        if changes.get('clear_trigger_token'):
+            settings['trigger_token'] = ''
+
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f'{self.settings_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(settings, f)
+        os.replace(temp_path, self.settings_path)
+        return self.current_settings()
+
+    # Per request
+
+    def start_request(self, endpoint, headers):
+        """Begin profiling this request if it is selected; a no-op while disabled"""
+        self._refresh_settings()
+        if not self.enabled:
+            return
+        settings = self.settings
+        token = settings['trigger_token']
+        # Bytes, since compare_digest rejects str with non-ASCII characters
+        triggered = bool(token) and secrets.compare_digest(
+            headers.get(TRIGGER_HEADER, '').encode('utf-8', 'surrogateescape'), token.encode())
+        if not triggered and random.random() >= settings['sample_rate']:
+            return
+
+        mode = settings['mode']
+        if mode == 'cprofile':
+            if not self._cprofile_lock.acquire(blocking=False):
+                return
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler (a debugger, coverage) already holds the hook
+                self._cprofile_lock.release()
+                return
+            self._local.current = (endpoint, mode, profile)
+        else:
+            self._sampler.add(threading.get_ident())
+            self._local.current = (endpoint, mode, None)
+
+    def finish_request(self):
+        current = getattr(self._local, 'current', None)
+        if current is None:
+            return
+        self._local.current = None
+        endpoint, mode, profile = current
+        try:
+            if mode == 'cprofile':
+                try:
+                    profile.disable()
+                finally:
+                    self._cprofile_lock.release()
+                self._save_pstats(endpoint, profile)
+            else:
+                stacks = self._sampler.remove(threading.get_ident())
+                self._append_collapsed(endpoint, stacks)
+        except OSError as e:
+            tasks.log("Profile write failed for %s: %s", endpoint, str(e))
+
+    # Output files
+
+    @contextmanager
+    def _locked(self, f):
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _append_collapsed(self, endpoint, stacks):
+        if not stacks:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        lines = ''.join(f'{stack} {count}\n' for stack, count in stacks.items())
+        path = os.path.join(self.directory, f'{_safe_name(endpoint)}.collapsed')
+        with open(path, 'a') as f:
+            with self._locked(f):
+                f.write(lines)
+
+    def _save_pstats(self, endpoint, profile):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{_safe_name(endpoint)}.{os.getpid()}.prof')
+        with self._write_lock:
+            stats = pstats.Stats(profile)
+            if os.path.exists(path):
+                stats.add(path)
+            stats.dump_stats(path)
+
+    def list_profiles(self):
+        """Profile files, newest first"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for name in names:
+            if not name.endswith(('.collapsed', '.prof')):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            profiles.append({'name': name, 'size': stat.st_size, 'modified': stat.st_mtime})
+        profiles.sort(key=lambda p: p['modified'], reverse=True)
+        return profiles
+
+    def profile_path(self, name):
+        """Path of a listed profile file, or None for anything else"""
+        if name not in {p['name'] for p in self.list_profiles()}:
+            return None
+        return os.path.join(self.directory, name)
+
+    def clear(self):
+        for profile in self.list_profiles():
+            try:
+                os.unlink(os.path.join(self.directory, profile['name']))
+            except FileNotFoundError:
+                pass
+
+profiler = RequestProfiler(Config.PROFILE_DIR)
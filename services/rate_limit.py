@@ -0,0 +1,263 @@
+# rate_limit.py - Token-bucket rate limits per endpoint, by client IP and by session
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from config import Config
+from services import startup
+from services.tasks import tasks
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: buckets stay per process
+    fcntl = None
+
+# Buckets kept by the in-process store before the least recently used are dropped
+MAX_MEMORY_BUCKETS = 10000
+
+# Shared table: slot count, and how many neighbouring slots a key may land in
+SHARED_SLOTS = 8192
+SHARED_PROBE = 8
+MAGIC = b'RATELIM1'
+HEADER = struct.Struct('<8sQ')
+# key hash, tokens, updated_at (epoch seconds)
+SLOT = struct.Struct('<Qdd')
+
+class RateLimitedError(Exception):
+    """Raised before a limited endpoint does any work for an over-limit client"""
+    def __init__(self, endpoint, retry_after):
+        self.endpoint = endpoint
+        self.retry_after = max(int(retry_after + 0.999), 1)
+        super().__init__(f'Too many requests, please try again in {self.retry_after}s')
+
+class Limit:
+    """Up to `requests` calls in a burst, refilled evenly over `per_seconds`"""
+    def __init__(self, requests, per_seconds):
+        self.capacity = requests
+        self.rate = requests / per_seconds
+
+    @classmethod
+    def parse(cls, spec):
+        """'ip=20/60,session=6/60' -> {'ip': Limit(20, 60), 'session': Limit(6, 60)}"""
+        limits = {}
+        for part in (spec or '').split(','):
+            if not part.strip():
+                continue
+            scope, _, value = part.partition('=')
+            requests, _, per_seconds = value.partition('/')
+            limits[scope.strip()] = cls(int(requests), float(per_seconds))
+        return limits
+
+def _take(buckets, now):
+    """Spend one token from every bucket, or none if any is empty
+
+    buckets is a list of (tokens, updated_at, limit). Returns the new
+    (tokens, updated_at) pairs and the seconds until all would allow a call
+    (0 when allowed).
+    """
+    refilled = []
+    retry_after = 0
+    for tokens, updated_at, limit in buckets:
+        tokens = min(limit.capacity, tokens + max(now - updated_at, 0) * limit.rate)
+        refilled.append(tokens)
+        if tokens < 1:
+            retry_after = max(retry_after, (1 - tokens) / limit.rate)
+    if retry_after:
+        return [(tokens, now) for tokens in refilled], retry_after
+    return [(tokens - 1, now) for tokens in refilled], 0
+
+class MemoryBucketStore:
+    """Buckets in this process only; each worker counts separately"""
+    def __init__(self, max_buckets=MAX_MEMORY_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, requests):
+        """requests is [(key, limit)]; returns seconds to wait, 0 if allowed"""
+        now = time.time()
+        with self._lock:
+            buckets = []
+            for key, limit in requests:
+                tokens, updated_at = self._buckets.get(key, (limit.capacity, now))
+                buckets.append((tokens, updated_at, limit))
+            states, retry_after = _take(buckets, now)
+            for (key, _), state in zip(requests, states):
+                self._buckets[key] = state
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+class SharedBucketStore:
+    """Buckets in a memory-backed file shared by every worker on the host
+
+    A fixed table of slots addressed by key hash, updated under an exclusive
+    flock so a client can't multiply its allowance by the worker count.
+    When the slots near a key are all taken the stalest is reused, which at
+    worst hands an idle client a fresh bucket.
+    """
+    def __init__(self, directory, slots=SHARED_SLOTS):
+        self.path = os.path.join(directory, 'ratelimit.buckets')
+        self.lock_path = os.path.join(directory, 'ratelimit.lock')
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._file = None
+        self._map = None
+        self._generation = None
+
+    @classmethod
+    def from_config(cls, directory):
+        """A shared store in directory, or None where sharing isn't possible"""
+        if not directory or fcntl is None:
+            return None
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            print(f"Shared rate limits disabled ({directory}): {str(e)}")
+            return None
+        return cls(directory)
+
+    def _mapped(self):
+        # flock belongs to the open file, so each forked worker opens its own
+        if self._map is None or self._generation != startup.fork_generation:
+            size = HEADER.size + self.slots * SLOT.size
+            self._lock_file = open(self.lock_path, 'a')
+            with self._locked():
+                if not self._valid(size):
+                    # Build a fresh table beside it and rename it into place, so
+                    # a worker still mapping an old one never sees it shrink
+                    temp_path = f'{self.path}.{os.getpid()}.tmp'
+                    with open(temp_path, 'wb') as f:
+                        f.write(HEADER.pack(MAGIC, self.slots))
+                        f.truncate(size)
+                    os.replace(temp_path, self.path)
+                self._file = open(self.path, 'r+b')
+            self._map = mmap.mmap(self._file.fileno(), size)
+            self._generation = startup.fork_generation
+        return self._map
+
+    @contextmanager
+    def _locked(self):
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _valid(self, size):
+        try:
+            with open(self.path, 'rb') as f:
+                return os.fstat(f.fileno()).st_size == size and f.read(HEADER.size) == HEADER.pack(MAGIC, self.slots)
+        except FileNotFoundError:
+            return False
+
+    def _find_slot(self, mapped, key_hash, claimed):
+        start = key_hash % self.slots
+        stalest = None
+        for i in range(SHARED_PROBE):
+            index = (start + i) % self.slots
+            offset = HEADER.size + index * SLOT.size
+            if offset in claimed:
+                continue
+            slot_hash, tokens, updated_at = SLOT.unpack_from(mapped, offset)
+            if slot_hash == key_hash:
+                return offset, tokens, updated_at
+            if slot_hash == 0:
+                return offset, None, None
+            if stalest is None or updated_at < stalest[1]:
+                stalest = (offset, updated_at)
+        return stalest[0], None, None
+
+    def take(self, requests):
+        """requests is [(key, limit)]; returns seconds to wait, 0 if allowed"""
+        now = time.time()
+        with self._lock:
+            mapped = self._mapped()
+            with self._locked():
+                slots = []
+                buckets = []
+                for key, limit in requests:
+                    key_hash = _hash_key(key)
+                    offset, tokens, updated_at = self._find_slot(mapped, key_hash, {o for o, _ in slots})
+                    if tokens is None:
+                        tokens, updated_at = limit.capacity, now
+                    slots.append((offset, key_hash))
+                    buckets.append((tokens, updated_at, limit))
+                states, retry_after = _take(buckets, now)
+                for (offset, key_hash), (tokens, updated_at) in zip(slots, states):
+                    SLOT.pack_into(mapped, offset, key_hash, tokens, updated_at)
+        return retry_after
+
+def _hash_key(key):
+    value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1  # 0 marks an empty slot
+
+class RateLimiter:
+    """Per-endpoint limits, each with buckets for one or more client scopes"""
+    def __init__(self, limits, store):
+        self.limits = limits
+        self.store = store
+        self.rejected = {}
+
+    @classmethod
+    def from_config(cls):
+        limits = {
+            'track_order': Limit.parse(Config.RATE_LIMIT_TRACK_ORDER),
+            'create_payment': Limit.parse(Config.RATE_LIMIT_CREATE_PAYMENT),
+        }
+        store = SharedBucketStore.from_config(Config.RATE_LIMIT_DIR) or MemoryBucketStore()
+        return cls(limits, store)
+
+    def check(self, endpoint, identities):
+        """Spend a token for each known identity; raise RateLimitedError if any is out
+
+        identities maps a scope ('ip', 'session') to the client's value for
+        it; scopes without a value (e.g. no session yet) aren't limited.
+        """
+        requests = [(f'{endpoint}:{scope}:{identities[scope]}', limit)
+                    for scope, limit in self.limits.get(endpoint, {}).items()
+                    if identities.get(scope)]
+        if not requests:
+            return
+        try:
+            retry_after = self.store.take(requests)
+        except OSError as e:
+            # A broken shared file must not take the endpoint down with it
+            tasks.log("Rate limit store error, falling back to per-process buckets: %s", str(e))
+            self.store = MemoryBucketStore()
+            retry_after = self.store.take(requests)
+        if retry_after:
+            self.rejected[endpoint] = self.rejected.get(endpoint, 0) + 1
+            raise RateLimitedError(endpoint, retry_after)
+
+rate_limiter = RateLimiter.from_config()
+
+def client_ip(remote_addr, forwarded_for):
+    """The client address, trusting Config.TRUSTED_PROXY_COUNT X-Forwarded-For hops"""
+    hops = [hop.strip() for hop in (forwarded_for or '').split(',') if hop.strip()]
+    if Config.TRUSTED_PROXY_COUNT and len(hops) >= Config.TRUSTED_PROXY_COUNT:
+        # Each trusted proxy appended one entry; anything further left is client-supplied
+        return hops[-Config.TRUSTED_PROXY_COUNT]
+    return remote_addr
+
+def rate_limited(endpoint):
+    """Check endpoint's limits for the current Flask request before the view runs"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request
+            from services.sessions import current_session as session
+            rate_limiter.check(endpoint, {
+                'ip': client_ip(request.remote_addr, request.headers.get('X-Forwarded-For')),
+                'session': session.get('session_key')
+            })
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,238 @@
+# resilience.py - Circuit breakers and per-request deadline budgets for Firestore and Midtrans
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context
+from config import Config
+from services.tasks import tasks
+
+# Below this there's no point starting a downstream call
+MIN_CALL_TIMEOUT = 0.5
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open"""
+    def __init__(self, name, retry_after):
+        self.name = name
+        self.retry_after = max(int(retry_after + 0.999), 1)
+        super().__init__(f'{name} is temporarily unavailable, please try again in {self.retry_after}s')
+
+class DeadlineExceededError(Exception):
+    """Raised when the request has no time budget left for another call"""
+    def __init__(self, name):
+        self.name = name
+        self.retry_after = 1
+        super().__init__(f'Request took too long waiting for {name}, please try again')
+
+def is_dependency_failure(exc):
+    """True for errors that mean the dependency itself is unhealthy
+
+    Timeouts, connection errors and 5xx/429 responses count; client errors
+    such as NotFound don't, and neither do bugs in our own code.
+    """
+    module = type(exc).__module__
+    if not module.startswith(('google', 'grpc', 'requests', 'urllib3')):
+        return False
+    code = getattr(exc, 'code', None)
+    return not isinstance(code, int) or code >= 500 or code == 429
+
+def is_dependency_answer(exc):
+    """True for errors the dependency itself returned without being unhealthy, e.g. NotFound
+
+    Anything else raised by our own code (DeadlineExceededError before the
+    call, a bug after it) says nothing about the dependency either way.
+    """
+    module = type(exc).__module__
+    return module.startswith(('google', 'grpc', 'requests', 'urllib3')) and not is_dependency_failure(exc)
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open trial -> closed"""
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or Config.BREAKER_RESET_SECONDS
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0
+        self._trial_in_flight = False
+        self.total_failures = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead"""
+        with self._lock:
+            if self.state == self.OPEN:
+                waited = time.monotonic() - self.opened_at
+                if waited < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, self.reset_timeout - waited)
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                # Let exactly one trial call through
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 1)
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+            self._trial_in_flight = False
+
+    def record_untested(self):
+        """End a call that never reached the dependency; a half-open trial goes to the next call"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    tasks.log("Circuit breaker '%s' opened after %s failures", self.name, self.consecutive_failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def note_failure(self, exc):
+        """Count an error that the caller handles itself instead of raising"""
+        if is_dependency_failure(exc):
+            self._mark_failed()
+
+    def note_status(self, status_code):
+        """Count a 5xx/429 HTTP response as a failure even though nothing was raised"""
+        if status_code >= 500 or status_code == 429:
+            self._mark_failed()
+
+    def _mark_failed(self):
+        # Only once per guarded call, however many errors it swallowed
+        if not getattr(self._local, 'failed', False):
+            self._local.failed = True
+            self.record_failure()
+
+    @contextmanager
+    def guard(self):
+        """Wrap one logical call; nested guards on the same thread are folded in"""
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        self.before_call()
+        self._local.depth = 1
+        self._local.failed = False
+        try:
+            yield
+        except Exception as e:
+            if is_dependency_failure(e):
+                self.note_failure(e)
+            elif self._local.failed:
+                pass
+            elif is_dependency_answer(e):
+                self.record_success()
+            else:
+                self.record_untested()
+            raise
+        else:
+            if not self._local.failed:
+                self.record_success()
+        finally:
+            self._local.depth = 0
+
+    async def call_async(self, func, *args, **kwargs):
+        """Await func under the breaker, for the asyncio data layer
+
+        guard() tracks nesting per thread, which means nothing when many
+        tasks share the event loop thread, so async calls are counted one by one.
+        """
+        self.before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            if is_dependency_failure(e):
+                self.record_failure()
+            elif is_dependency_answer(e):
+                self.record_success()
+            else:
+                self.record_untested()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            state = self.state
+            retry_after = 0
+            if state == self.OPEN:
+                retry_after = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+            return {
+                'state': state,
+                'consecutive_failures': self.consecutive_failures,
+                'total_failures': self.total_failures,
+                'rejected': self.rejected,
+                'retry_after': round(retry_after, 1)
+            }
+
+firestore_breaker = CircuitBreaker('firestore')
+midtrans_breaker = CircuitBreaker('midtrans')
+
+def breaker_states():
+    """Breaker state for monitoring"""
+    return {breaker.name: breaker.snapshot() for breaker in [firestore_breaker, midtrans_breaker]}
+
+def guarded(breaker):
+    """Decorator running a function inside breaker.guard()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with breaker.guard():
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def guarded_async(breaker):
+    """Decorator awaiting a coroutine function through breaker.call_async()"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await breaker.call_async(func, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def start_request_deadline(seconds=None):
+    """Give the current request a total time budget for downstream calls"""
+    g.deadline = time.monotonic() + (seconds or Config.REQUEST_DEADLINE_SECONDS)
+
+def clear_request_deadline():
+    """Drop the budget for long-running responses such as streamed exports"""
+    g.deadline = None
+
+def remaining_budget():
+    """Seconds left in the request budget, or None outside a request"""
+    if not has_app_context():
+        return None
+    deadline = g.get('deadline')
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def call_timeout(default, name):
+    """Timeout for the next downstream call: the default, shrunk to the budget left"""
+    remaining = remaining_budget()
+    if remaining is None:
+        return default
+    if remaining < MIN_CALL_TIMEOUT:
+        raise DeadlineExceededError(name)
+    return min(default, remaining)
@@ -0,0 +1,106 @@
+# sessions.py - Signed-cookie sessions that endpoints can opt out of
+import contextvars
+from contextlib import contextmanager
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface
+from itsdangerous import BadSignature
+from werkzeug.exceptions import HTTPException
+from werkzeug.local import LocalProxy
+
+# The session of the async handler running in this context (asgi.py); unset under Flask
+_async_session = contextvars.ContextVar('async_session', default=None)
+
+def _current_session():
+    session = _async_session.get()
+    if session is not None:
+        return session
+    from flask import session as flask_session
+    return flask_session._get_current_object()
+
+# flask.session, or the async handler's session, so CartService works under both
+current_session = LocalProxy(_current_session)
+
+@contextmanager
+def session_context(session):
+    """Make session the current_session for the code inside the block"""
+    token = _async_session.set(session)
+    try:
+        yield session
+    finally:
+        _async_session.reset(token)
+
+def session_free(view):
+    """Mark a view as never using the session, so it isn't loaded or saved"""
+    view.session_free = True
+    return view
+
+class SelectiveSessionInterface(SecureCookieSessionInterface):
+    """The default cookie session, skipped for static files and session-free views
+
+    Those requests get a read-only null session: the cookie isn't decoded,
+    nothing is saved and no Set-Cookie or Vary: Cookie header is added, so
+    uptime pings stay cheap and shared caches can store the responses.
+    """
+    def is_session_free(self, app, request):
+        # The session is opened before Flask matches the URL, so match it here
+        adapter = app.create_url_adapter(request)
+        if adapter is None:
+            return False
+        try:
+            rule, _ = adapter.match(return_rule=True)
+        except HTTPException:
+            return False
+        if rule.endpoint == 'static' or rule.endpoint.endswith('.static'):
+            return True
+        return getattr(app.view_functions.get(rule.endpoint), 'session_free', False)
+
+    def open_session(self, app, request):
+        if self.is_session_free(app, request):
+            return self.make_null_session(app)
+        return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if self.is_null_session(session):
+            return
+        super().save_session(app, session, response)
+
+class CookieSessionBridge:
+    """Reads and writes Flask's signed session cookie outside Flask
+
+    The ASGI handlers use this so a cart started on a Flask page carries on
+    through the async endpoints and back, with one cookie format.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.interface = SecureCookieSessionInterface()
+
+    def open(self, cookies):
+        serializer = self.interface.get_signing_serializer(self.app)
+        value = cookies.get(self.interface.get_cookie_name(self.app))
+        if serializer is None or not value:
+            return SecureCookieSession()
+        max_age = int(self.app.permanent_session_lifetime.total_seconds())
+        try:
+            return SecureCookieSession(serializer.loads(value, max_age=max_age))
+        except BadSignature:
+            return SecureCookieSession()
+
+    def save(self, session, response):
+        """Set or clear the cookie on a Starlette-style response if the session changed"""
+        if not session.modified:
+            return
+        name = self.interface.get_cookie_name(self.app)
+        domain = self.interface.get_cookie_domain(self.app)
+        path = self.interface.get_cookie_path(self.app)
+        if not session:
+            response.delete_cookie(name, path=path, domain=domain)
+            return
+        response.set_cookie(
+            name,
+            self.interface.get_signing_serializer(self.app).dumps(dict(session)),
+            expires=self.interface.get_expiration_time(self.app, session),
+            path=path,
+            domain=domain,
+            secure=self.interface.get_cookie_secure(self.app),
+            httponly=self.interface.get_cookie_httponly(self.app),
+            samesite=self.interface.get_cookie_samesite(self.app)
+        )
@@ -0,0 +1,67 @@
+# singleflight.py - Coalesce concurrent identical calls into one
+import copy
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Concurrent callers with the same key share one in-flight call and its result
+
+    Only calls that overlap in time are merged; nothing is cached once the
+    leader returns. Followers get a deep copy so nobody mutates a shared dict.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.coalesced_by_kind = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                kind = key[0] if isinstance(key, tuple) else key
+                self.coalesced_by_kind[kind] = self.coalesced_by_kind.get(kind, 0) + 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        # Hand followers a result the leader can't mutate under them
+        if call.waiters:
+            return copy.deepcopy(call.result)
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+                'coalesced_by_kind': dict(self.coalesced_by_kind)
+            }
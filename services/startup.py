@@ -0,0 +1,149 @@
+# startup.py - Cold start warm-up and boot time breakdown
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+BOOT_STARTED = time.perf_counter()
+
+# Bumped in each forked worker; clients built under an older generation are rebuilt
+fork_generation = 0
+
+# Heavy third-party modules, timed one by one by `python -m services.startup`
+HEAVY_MODULES = [
+    'requests',
+    'grpc',
+    'google.cloud.firestore',
+    'firebase_admin',
+    'firebase_admin.firestore',
+]
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+def lazy_import(name):
+    """Defer a heavy import until the module is actually used"""
+    return LazyModule(name)
+
+class StartupReport:
+    """Collects named phase timings during boot"""
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except Exception as e:
+            status = f'error: {str(e)}'
+            print(f"Startup phase '{name}' failed: {str(e)}")
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.phases.append({'name': name, 'ms': round(elapsed_ms, 1), 'status': status})
+
+    def as_dict(self):
+        return {
+            'since_boot_ms': round((time.perf_counter() - BOOT_STARTED) * 1000, 1),
+            'phases': list(self.phases)
+        }
+
+    def print_report(self):
+        summary = self.as_dict()
+        print(f"Startup breakdown ({summary['since_boot_ms']} ms since boot):")
+        for phase in summary['phases']:
+            suffix = '' if phase['status'] == 'ok' else f"  [{phase['status']}]"
+            print(f"  {phase['name']:<36} {phase['ms']:>9.1f} ms{suffix}")
+
+report = StartupReport()
+
+def profile_imports(modules=None):
+    """Import heavy modules one at a time and record how long each took"""
+    for name in modules or HEAVY_MODULES:
+        label = f'import {name}' if name not in sys.modules else f'import {name} (cached)'
+        with report.phase(label):
+            importlib.import_module(name)
+
+def compile_templates(app):
+    """Compile every Jinja template into the environment cache"""
+    env = app.jinja_env
+    for name in env.list_templates(extensions=['html']):
+        env.get_template(name)
+
+def preload(app):
+    """Fork-safe warm-up: credentials and template compilation.
+
+    Runs at app import, which is in the gunicorn master when preload_app is on.
+    Nothing here opens a socket, so it is safe to share across fork(). Heavy
+    modules stay lazy; profile their imports with `python -m services.startup`.
+    """
+    if getattr(app, '_startup_preloaded', False):
+        return
+    app._startup_preloaded = True
+
+    with report.phase('credentials'):
+        from models.database import init_firebase
+        init_firebase()
+    with report.phase('jinja templates'):
+        compile_templates(app)
+
+def after_fork():
+    """Make this worker open its own Firestore client and HTTP pools
+
+    gRPC channels and pooled sockets must not cross fork(). preload() opens
+    none, but anything created in the master is dropped here so the worker
+    builds fresh ones on first use. Called from gunicorn's post_fork hook.
+    """
+    global fork_generation
+    fork_generation += 1
+    if 'firebase_admin' in sys.modules:
+        import firebase_admin
+        try:
+            # Closes any client the master made; the next use re-initialises
+            firebase_admin.delete_app(firebase_admin.get_app())
+        except ValueError:
+            pass
+
+def warm_worker(app):
+    """Per-process warm-up: open the Firestore channel and prime the catalog.
+
+    Called from the gunicorn post_worker_init hook (after fork, with or
+    without preload) or directly when running the dev server. Config.WARMUP
+    picks 'background' (the worker takes traffic at once), 'blocking' or 'off'.
+    """
+    from config import Config
+
+    preload(app)
+    if Config.WARMUP == 'blocking':
+        _warm_connections()
+    elif Config.WARMUP == 'background':
+        threading.Thread(target=_warm_connections, name='worker-warmup', daemon=True).start()
+    else:
+        report.print_report()
+
+def _warm_connections():
+    from models.database import DatabaseManager
+    from services.catalog import catalog
+
+    with report.phase('firestore channel'):
+        DatabaseManager().ping()
+    with report.phase('catalog'):
+        catalog.warm()  # from the host snapshot when another worker already loaded it
+
+    report.print_report()
+
+if __name__ == '__main__':
+    # Time each heavy import in a fresh interpreter
+    profile_imports(sys.argv[1:])
+    report.print_report()
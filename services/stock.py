@@ -0,0 +1,150 @@
+# stock.py - Daily portion limits per menu item, read through a short cache
+import threading
+import time
+from config import Config
+from models.database import DatabaseManager
+from models.rollups import business_date, stock_contribution
+from services import startup
+from services.tasks import tasks, BOOKKEEPING, TaskQueueFullError
+
+def daily_limit(item):
+    """Portions the kitchen cooks per day for a menu item, or None if unlimited"""
+    limit = item.get('daily_stock')
+    if limit is None or limit == '':
+        return None
+    return max(int(limit), 0)
+
+class StockService:
+    """Today's sold counts of the limited items, cached per process for Config.STOCK_CACHE_TTL
+
+    The counters live in sharded Firestore docs written with each order (see
+    DatabaseManager.save_order), and only for items with a daily_stock.
+    Menu reads use the cached totals and never wait on Firestore: an expired
+    cache is reread on the bookkeeping thread while the old counts are
+    served. Checkout rereads the counters of the items in the cart.
+    """
+    def __init__(self, db_manager=None, ttl=None):
+        self.db_manager = db_manager or DatabaseManager()
+        self.ttl = ttl if ttl is not None else Config.STOCK_CACHE_TTL
+        self._lock = threading.Lock()
+        self._day = None
+        self._sold = {}
+        self._tracked = frozenset()
+        self._loaded_at = 0
+        self._refreshing = None
+        self._sold_out_menu = None
+        self._sold_out_generation = None
+        self._sold_out = frozenset()
+        self.generation = 0
+
+    def is_stale(self):
+        """True when the next menu read schedules a counter refresh"""
+        if not self._tracked:
+            return False
+        return self._day != business_date() or time.monotonic() - self._loaded_at >= self.ttl
+
+    def _ensure_fresh(self, item_ids):
+        if not self.is_stale() and item_ids <= self._tracked:
+            return
+        with self._lock:
+            # A refresh started before a fork never finishes in the child
+            if self._refreshing == startup.fork_generation:
+                return
+            self._refreshing = startup.fork_generation
+            self._tracked = self._tracked | item_ids
+        try:
+            tasks.submit(BOOKKEEPING, self._refresh, business_date())
+        except TaskQueueFullError:
+            self._refreshing = None
+
+    def _refresh(self, day):
+        try:
+            sold = self.db_manager.get_stock_sold_for(day, self._tracked)
+        except Exception as e:
+            tasks.log("Stock refresh failed: %s", str(e))
+            sold = None
+        with self._lock:
+            self._refreshing = None
+            if sold is not None:
+                self._set(day, sold)
+            else:
+                # Try again after another TTL rather than on every read
+                self._loaded_at = time.monotonic()
+
+    def _set(self, day, sold):
+        changed = day != self._day or sold != self._sold
+        self._day = day
+        self._sold = sold
+        self._loaded_at = time.monotonic()
+        if changed:
+            self.generation += 1
+
+    def sold_out_ids(self, menu_items):
+        """Ids of limited items with nothing left today"""
+        limited = frozenset(item['id'] for item in menu_items if daily_limit(item) is not None)
+        if not limited:
+            return frozenset()
+        self._ensure_fresh(limited)
+        # Held, not id()'d: a freed catalog list's id can come back for the next one
+        if menu_items is not self._sold_out_menu or self.generation != self._sold_out_generation:
+            self._sold_out = frozenset(
+                item['id'] for item in menu_items
+                if item['id'] in limited and self._sold.get(item['id'], 0) >= daily_limit(item)
+            )
+            self._sold_out_menu = menu_items
+            self._sold_out_generation = self.generation
+        return self._sold_out
+
+    def remaining_for(self, menu_items):
+        """Portions left today by item id, from a fresh read; None for unlimited items"""
+        limited = [item for item in menu_items if daily_limit(item) is not None]
+        sold = self.db_manager.get_stock_sold_for(business_date(), [item['id'] for item in limited]) if limited else {}
+        remaining = {item['id']: None for item in menu_items}
+        for item in limited:
+            remaining[item['id']] = max(daily_limit(item) - sold.get(item['id'], 0), 0)
+        return remaining
+
+    def shortages(self, lines, documents, day=None, sold=None):
+        """Cart lines asking for more than is left, from a fresh read of their counters
+
+        lines are cart lines ({'id', 'name', 'quantity'}), documents the menu
+        docs by id. sold holds counts already read for day (see
+        DatabaseManager.get_checkout_documents); any limited item missing
+        from it is read here. Returns [{'id', 'name', 'requested', 'remaining'}].
+        """
+        limited = [line for line in lines
+                   if line['id'] in documents and daily_limit(documents[line['id']]) is not None]
+        if not limited:
+            return []
+        day = day or business_date()
+        sold = dict(sold or {})
+        unread = {line['id'] for line in limited} - set(sold)
+        if unread:
+            sold.update(self.db_manager.get_stock_sold_for(day, unread))
+
+        requested = {}
+        names = {}
+        for line in limited:
+            requested[line['id']] = requested.get(line['id'], 0) + int(line['quantity'])
+            names[line['id']] = line.get('name', '')
+        short = []
+        for item_id, quantity in requested.items():
+            remaining = max(daily_limit(documents[item_id]) - sold.get(item_id, 0), 0)
+            if quantity > remaining:
+                short.append({'id': item_id, 'name': names[item_id], 'requested': quantity, 'remaining': remaining})
+        return short
+
+    def record_sale(self, order):
+        """Count a just-saved order locally so this worker reflects it before the next refresh"""
+        day = order.get('business_date') or business_date()
+        with self._lock:
+            if day != self._day:
+                return
+            sold = dict(self._sold)
+            for item_id, quantity in stock_contribution(order).items():
+                sold[item_id] = sold.get(item_id, 0) + quantity
+            loaded_at = self._loaded_at
+            self._set(day, sold)
+            self._loaded_at = loaded_at  # keep the refresh schedule
+
+stock = StockService()
@@ -0,0 +1,243 @@
+# tasks.py - Bounded background executor for work that doesn't need to hold up a response
+import atexit
+import queue
+import random
+import threading
+import time
+from collections import deque
+from config import Config
+from services import startup
+
+LOG = 'log'
+ORDER_SAVE = 'order_save'
+BOOKKEEPING = 'bookkeeping'
+
+class TaskType:
+    """Threads, queue bound and retry policy for one kind of background work"""
+    def __init__(self, name, workers, max_queue, max_attempts=1, backoff=1.0, max_backoff=30.0):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+# Each type has its own queue and threads, so a backlog of retrying order
+# saves never delays bookkeeping and a burst of debug output never delays either
+TASK_TYPES = {
+    LOG: TaskType(LOG, 1, 1000),
+    # Retries outlast a circuit breaker reset (BREAKER_RESET_SECONDS)
+    ORDER_SAVE: TaskType(ORDER_SAVE, 2, 200, max_attempts=8, backoff=1.0, max_backoff=30.0),
+    BOOKKEEPING: TaskType(BOOKKEEPING, 1, 500, max_attempts=3, backoff=0.5),
+}
+
+# Recent tasks per type that the latency figures are taken from
+LATENCY_WINDOW = 500
+
+class TaskQueueFullError(Exception):
+    """Raised when a task type's queue is full, so the caller can fall back"""
+    def __init__(self, task_type):
+        self.task_type = task_type
+        super().__init__(f'Background queue {task_type} is full')
+
+class _Task:
+    __slots__ = ('func', 'args', 'kwargs', 'enqueued_at')
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+
+class _TypeStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.waits = deque(maxlen=LATENCY_WINDOW)
+        self.runs = deque(maxlen=LATENCY_WINDOW)
+
+def _milliseconds(samples):
+    samples = list(samples)
+    if not samples:
+        return {'avg': 0, 'max': 0}
+    return {'avg': round(sum(samples) / len(samples) * 1000, 1), 'max': round(max(samples) * 1000, 1)}
+
+def _print_log(message, args):
+    print(message % args if args else message)
+
+class TaskExecutor:
+    """Per-type bounded queues, each served by a few daemon threads
+
+    Threads start on first use in each process, so gunicorn workers forked
+    from a preloaded master get their own. A full queue raises
+    TaskQueueFullError (or runs the task inline with offload()) instead of
+    growing without bound. Failed tasks are retried on the same thread with
+    jittered exponential backoff up to their type's max_attempts. drain()
+    lets queued work finish before the worker exits.
+    """
+    def __init__(self, types=None, enabled=True):
+        self.types = types or TASK_TYPES
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._generation = None
+        self._queues = {}
+        self._threads = []
+        self._stop = threading.Event()
+        self._closing = False
+        self._stats = {name: _TypeStats() for name in self.types}
+        self._atexit_registered = False
+
+    def _ensure_started(self):
+        if self._generation == startup.fork_generation:
+            return
+        with self._lock:
+            if self._generation == startup.fork_generation:
+                return
+            # Threads don't survive fork(); this process starts its own
+            self._queues = {name: queue.Queue(task_type.max_queue) for name, task_type in self.types.items()}
+            self._stats = {name: _TypeStats() for name in self.types}
+            self._stop = threading.Event()
+            self._closing = False
+            self._threads = []
+            for name, task_type in self.types.items():
+                for index in range(task_type.workers):
+                    thread = threading.Thread(target=self._worker, args=(task_type, self._queues[name], self._stop),
+                                              name=f'task-{name}-{index}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._generation = startup.fork_generation
+            if not self._atexit_registered:
+                # Covers servers without gunicorn's worker_exit hook
+                atexit.register(self.drain)
+                self._atexit_registered = True
+
+    def submit(self, task_type, func, *args, **kwargs):
+        """Queue func(*args, **kwargs); returns True if queued, False if it ran inline
+
+        Runs inline while background tasks are disabled or the worker is
+        draining. Raises TaskQueueFullError when the type's queue is full.
+        """
+        if not self.enabled or self._closing:
+            func(*args, **kwargs)
+            return False
+        self._ensure_started()
+        stats = self._stats[task_type]
+        try:
+            self._queues[task_type].put_nowait(_Task(func, args, kwargs))
+        except queue.Full:
+            stats.rejected += 1
+            raise TaskQueueFullError(task_type)
+        stats.submitted += 1
+        return True
+
+    def offload(self, task_type, func, *args, **kwargs):
+        """Like submit(), but runs the task on the calling thread when its queue is full"""
+        try:
+            return self.submit(task_type, func, *args, **kwargs)
+        except TaskQueueFullError:
+            func(*args, **kwargs)
+            return False
+
+    def log(self, message, *args):
+        """Print a debug line from the log thread; %-formatting happens there too
+
+        Lines are dropped (and counted as rejected) if the log queue is full.
+        """
+        try:
+            self.submit(LOG, _print_log, message, args)
+        except TaskQueueFullError:
+            pass
+
+    def _worker(self, task_type, tasks_queue, stop):
+        stats = self._stats[task_type.name]
+        while True:
+            task = tasks_queue.get()
+            if task is None:
+                tasks_queue.task_done()
+                return
+            started = time.monotonic()
+            stats.waits.append(started - task.enqueued_at)
+            stats.in_flight += 1
+            try:
+                if self._run(task_type, task, stats, stop):
+                    stats.completed += 1
+                else:
+                    stats.failed += 1
+            finally:
+                stats.in_flight -= 1
+                stats.runs.append(time.monotonic() - started)
+                tasks_queue.task_done()
+
+    def _run(self, task_type, task, stats, stop):
+        name = getattr(task.func, '__name__', repr(task.func))
+        for attempt in range(1, task_type.max_attempts + 1):
+            try:
+                task.func(*task.args, **task.kwargs)
+                return True
+            except Exception as e:
+                if attempt == task_type.max_attempts:
+                    # The arguments are printed so the work can be redone by hand
+                    print(f"Background task {name} failed after {attempt} attempt(s): {str(e)}; "
+                          f"args={task.args!r:.2000}")
+                    return False
+                delay = min(task_type.backoff * 2 ** (attempt - 1), task_type.max_backoff)
+                delay *= random.uniform(0.5, 1.0)
+                print(f"Background task {name} failed (attempt {attempt}), retrying in {delay:.1f}s: {str(e)}")
+                stats.retried += 1
+                # A drain running out of time cuts the wait short
+                stop.wait(delay)
+        return False
+
+    def drain(self, timeout=None):
+        """Let queued tasks finish, then stop the threads; returns how many were left undone"""
+        timeout = timeout if timeout is not None else Config.TASK_DRAIN_SECONDS
+        with self._lock:
+            if self._generation != startup.fork_generation or self._closing:
+                return 0
+            self._closing = True
+        deadline = time.monotonic() + timeout
+
+        # One stop marker per thread, behind the work already queued
+        for name, task_type in self.types.items():
+            for _ in range(task_type.workers):
+                try:
+                    self._queues[name].put(None, timeout=max(deadline - time.monotonic(), 0.01))
+                except queue.Full:
+                    break
+        for thread in self._threads:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            thread.join(remaining)
+        self._stop.set()
+
+        left = sum(sum(1 for task in list(tasks_queue.queue) if task is not None)
+                   for tasks_queue in self._queues.values())
+        if left:
+            print(f"Background tasks: {left} left undone after {timeout:.0f}s drain")
+        return left
+
+    def stats(self):
+        """Queue depth, counters and recent wait/run latency per task type"""
+        if self._generation != startup.fork_generation:
+            return {name: {'queued': 0, 'in_flight': 0} for name in self.types}
+        result = {}
+        for name, stats in self._stats.items():
+            result[name] = {
+                'queued': self._queues[name].qsize(),
+                'in_flight': stats.in_flight,
+                'submitted': stats.submitted,
+                'completed': stats.completed,
+                'failed': stats.failed,
+                'retried': stats.retried,
+                'rejected': stats.rejected,
+                'wait_ms': _milliseconds(stats.waits),
+                'run_ms': _milliseconds(stats.runs)
+            }
+        return result
+
+tasks = TaskExecutor(enabled=Config.TASKS_ENABLED)
@@ -1,8 +1,10 @@
 let currentFilter = 'all';
+const selectedOrders = new Set();
 
 // Load orders on page load
 window.addEventListener('load', function() {
     loadOrders();
+    startProductionSheet();
     // Auto-refresh every 30 seconds
     setInterval(loadOrders, 30000);
 });
@@ -33,12 +35,21 @@ function displayOrders(orders) {
         return;
     }
 
+    // Drop selections for orders that are no longer listed
+    const listedIds = new Set(orders.map(order => order.order_id));
+    selectedOrders.forEach(orderId => {
+        if (!listedIds.has(orderId)) {
+            selectedOrders.delete(orderId);
+        }
+    });
+
     let html = '';
     orders.forEach(order => {
         html += createOrderCard(order);
     });
     
     container.innerHTML = html;
+    updateBulkBar();
 }
 
 function createOrderCard(order) {
@@ -67,7 +78,11 @@ function createOrderCard(order) {
     return `
         <div style="border: 1px solid #ddd; border-radius: 8px; padding: 20px; margin-bottom: 20px; background: white;">
             <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
-                <h3>Order #${order.order_id}</h3>
+                <label style="display: flex; align-items: center; gap: 10px; cursor: pointer;">
+                    <input type="checkbox" class="order-select" value="${order.order_id}" ${selectedOrders.has(order.order_id) ? 'checked' : ''}
+                           onchange="toggleOrderSelection('${order.order_id}', this.checked)" style="width: 20px; height: 20px;">
+                    <h3 style="margin: 0;">Order #${order.order_id}</h3>
+                </label>
                 <div style="background: ${statusInfo.color}; color: white; padding: 5px 15px; border-radius: 20px; font-weight: bold;">
                     ${statusInfo.icon} ${statusInfo.text}
                 </div>
@@ -169,6 +184,126 @@ function updateOrderStatus(orderId, newStatus) {
     });
 }
 
+function toggleOrderSelection(orderId, checked) {
+    if (checked) {
+        selectedOrders.add(orderId);
+    } else {
+        selectedOrders.delete(orderId);
+    }
+    updateBulkBar();
+}
+
+function selectAllOrders(checked) {
+    document.querySelectorAll('.order-select').forEach(checkbox => {
+        checkbox.checked = checked;
+        toggleOrderSelection(checkbox.value, checked);
+    });
+}
+
+function updateBulkBar() {
+    const countSpan = document.getElementById('bulk-count');
+    if (countSpan) {
+        countSpan.textContent = selectedOrders.size;
+    }
+    const selectAll = document.getElementById('bulk-select-all');
+    const checkboxes = document.querySelectorAll('.order-select');
+    if (selectAll) {
+        selectAll.checked = checkboxes.length > 0 && selectedOrders.size === checkboxes.length;
+    }
+}
+
+function bulkUpdateStatus(newStatus) {
+    const orderIds = Array.from(selectedOrders);
+    if (orderIds.length === 0) {
+        showError('Select at least one order first');
+        return;
+    }
+
+    const confirmMessage = newStatus === 'done' ?
+        `Mark ${orderIds.length} orders as DONE? They will be removed from customer tracking.` :
+        `Update ${orderIds.length} orders to ${newStatus.toUpperCase()}?`;
+
+    if (!confirm(confirmMessage)) {
+        return;
+    }
+
+    fetch('/admin/api/bulk-update-order-status', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            order_ids: orderIds,
+            status: newStatus
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const failures = data.results.filter(result => !result.success);
+            if (failures.length > 0) {
+                showError(`${data.updated} updated, ${failures.length} failed: ` +
+                    failures.map(result => `#${result.order_id} (${result.error})`).join(', '));
+            } else {
+                showSuccess(`${data.updated} orders updated to ${newStatus}`);
+            }
+
+            data.results.filter(result => result.success).forEach(result => selectedOrders.delete(result.order_id));
+            setTimeout(loadOrders, 1000);
+        } else {
+            showError(data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error updating orders:', error);
+        showError('Error updating orders: ' + error.message);
+    });
+}
+
+function startProductionSheet() {
+    fetch('/admin/api/production-sheet')
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            displayProductionSheet(data.sheet);
+        }
+    })
+    .catch(error => console.error('Error loading production sheet:', error));
+
+    // Live updates pushed by the server; EventSource reconnects on its own
+    if (window.EventSource) {
+        const source = new EventSource('/admin/api/production-sheet/stream');
+        source.onmessage = function(event) {
+            displayProductionSheet(JSON.parse(event.data));
+        };
+        source.onerror = function() {
+            document.getElementById('production-status').textContent = 'Reconnecting...';
+        };
+    }
+}
+
+function displayProductionSheet(sheet) {
+    const container = document.getElementById('production-items');
+    const status = document.getElementById('production-status');
+    if (!container || !sheet) {
+        return;
+    }
+
+    status.textContent = `${sheet.order_count} orders preparing · live`;
+
+    if (!sheet.items || sheet.items.length === 0) {
+        container.innerHTML = '<span style="color: #6c757d;">Nothing to prepare 🎉</span>';
+        return;
+    }
+
+    container.innerHTML = sheet.items.map(item => `
+        <div style="border: 1px solid ${item.type === 'menu' ? '#ffc107' : '#ddd'}; border-radius: 8px; padding: 10px 15px; min-width: 120px;">
+            <div style="font-size: 1.6em; font-weight: bold;">${item.quantity}</div>
+            <div>${item.name}</div>
+        </div>
+    `).join('');
+}
+
 function filterOrders(filter) {
     currentFilter = filter;
     
@@ -26,7 +26,8 @@ document.getElementById('add-item-form').addEventListener('submit', function(e)
         price: parseFloat(document.getElementById('item-price').value),
         image_url: document.getElementById('item-image').value,
         category: document.getElementById('item-category').value,
-        available: document.getElementById('item-available').checked
+        available: document.getElementById('item-available').checked,
+        daily_stock: document.getElementById('item-daily-stock').value
     };
     
     fetch('/admin/api/add-menu-item', {
@@ -60,7 +61,8 @@ document.getElementById('edit-item-form').addEventListener('submit', function(e)
         price: parseFloat(document.getElementById('edit-item-price').value),
         image_url: document.getElementById('edit-item-image').value,
         category: document.getElementById('edit-item-category').value,
-        available: document.getElementById('edit-item-available').checked
+        available: document.getElementById('edit-item-available').checked,
+        daily_stock: document.getElementById('edit-item-daily-stock').value
     };
     
     fetch(`/admin/api/update-menu-item/${itemId}`, {
@@ -84,7 +86,7 @@ document.getElementById('edit-item-form').addEventListener('submit', function(e)
     });
 });
 
-function editItem(itemId, name, description, price, imageUrl, category, available) {
+function editItem(itemId, name, description, price, imageUrl, category, available, dailyStock) {
     document.getElementById('edit-item-id').value = itemId;
     document.getElementById('edit-item-name').value = name;
     document.getElementById('edit-item-description').value = description;
@@ -92,6 +94,7 @@ function editItem(itemId, name, description, price, imageUrl, category, availabl
     document.getElementById('edit-item-image').value = imageUrl;
     document.getElementById('edit-item-category').value = category;
     document.getElementById('edit-item-available').checked = (available === 'true');
+    document.getElementById('edit-item-daily-stock').value = dailyStock;
     showEditForm();
 }
 
@@ -131,4 +134,57 @@ function toggleItemAvailability(itemId) {
     .catch(error => {
         alert('Error: ' + error);
     });
-}
\ No newline at end of file
+}
+
+function showImportForm() {
+    document.getElementById('import-form-modal').style.display = 'block';
+}
+
+function hideImportForm() {
+    document.getElementById('import-form-modal').style.display = 'none';
+    document.getElementById('import-form').reset();
+    document.getElementById('import-result').innerHTML = '';
+}
+
+function submitImport(dryRun) {
+    const fileInput = document.getElementById('import-file');
+    if (!fileInput.files.length) {
+        alert('Choose a CSV or JSON file first');
+        return;
+    }
+
+    const formData = new FormData();
+    formData.append('file', fileInput.files[0]);
+    formData.append('kind', document.getElementById('import-kind').value);
+    formData.append('dry_run', dryRun ? '1' : '0');
+
+    fetch('/admin/api/import-catalog', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        const resultDiv = document.getElementById('import-result');
+        if (!data.success) {
+            const rowErrors = Object.entries(data.errors || {}).map(([kind, errors]) =>
+                errors.map(err => `<li>${kind} row ${err.row}: ${err.error}</li>`).join('')
+            ).join('');
+            resultDiv.innerHTML = `<div style="color: #dc3545;"><strong>${data.error}</strong><ul>${rowErrors}</ul></div>`;
+            return;
+        }
+
+        const lines = Object.entries(data.summary).map(([kind, summary]) =>
+            `<li>${kind}: ${summary.created} new, ${summary.updated} changed, ${summary.unchanged} unchanged</li>`
+        ).join('');
+
+        if (dryRun) {
+            resultDiv.innerHTML = `<div style="color: #155724;"><strong>Preview</strong><ul>${lines}</ul></div>`;
+        } else {
+            alert('Import complete!');
+            location.reload();
+        }
+    })
+    .catch(error => {
+        alert('Error: ' + error);
+    });
+}
@@ -0,0 +1,108 @@
+window.addEventListener('load', function() {
+    loadProfiling();
+});
+
+function loadProfiling() {
+    fetch('/admin/api/profiling')
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            displayProfiling(data);
+        } else {
+            showError(data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error loading profiling:', error);
+        showError('Error loading profiling: ' + error.message);
+    });
+}
+
+function postSettings(changes) {
+    fetch('/admin/api/profiling', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(changes)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            displayProfiling(data);
+        } else {
+            showError(data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error saving profiling settings:', error);
+        showError('Error saving profiling settings: ' + error.message);
+    });
+}
+
+function saveSettings() {
+    postSettings({
+        enabled: document.getElementById('profile-enabled').checked,
+        mode: document.getElementById('profile-mode').value,
+        sample_rate: document.getElementById('profile-rate').value,
+        interval_ms: document.getElementById('profile-interval').value
+    });
+}
+
+function updateToken(generate) {
+    postSettings(generate ? { new_trigger_token: true } : { clear_trigger_token: true });
+}
+
+function clearProfiles() {
+    if (!confirm('Delete all captured profiles?')) {
+        return;
+    }
+    fetch('/admin/api/profiles/clear', { method: 'POST' })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            loadProfiling();
+        } else {
+            showError(data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error clearing profiles:', error);
+        showError('Error clearing profiles: ' + error.message);
+    });
+}
+
+function formatSize(bytes) {
+    if (bytes < 1024) {
+        return bytes + ' B';
+    }
+    return (bytes / 1024).toFixed(1) + ' KB';
+}
+
+function displayProfiling(data) {
+    const settings = data.settings;
+    document.getElementById('profile-enabled').checked = settings.enabled;
+    document.getElementById('profile-mode').value = settings.mode;
+    document.getElementById('profile-rate').value = settings.sample_rate;
+    document.getElementById('profile-interval').value = settings.interval_ms;
+    document.getElementById('profile-token').textContent = settings.trigger_token || '(none)';
+
+    const profiles = data.profiles || [];
+    document.getElementById('profile-list').innerHTML = profiles.length ? profiles.map(profile => `
+        <tr style="border-bottom: 1px solid #eee;">
+            <td>${profile.name}</td>
+            <td>${formatSize(profile.size)}</td>
+            <td>${new Date(profile.modified * 1000).toLocaleString()}</td>
+            <td><a href="/admin/api/profiles/${encodeURIComponent(profile.name)}">⬇️ Download</a></td>
+        </tr>
+    `).join('') : '<tr><td colspan="4" style="color: #6c757d; padding: 10px 0;">No profiles captured yet</td></tr>';
+}
+
+function showError(message) {
+    const errorDiv = document.getElementById('error-message');
+    errorDiv.innerHTML = `<div style="color: #dc3545; background: #f8d7da; padding: 15px; border-radius: 5px; margin: 10px 0; border: 1px solid #f5c6cb;">
+        <strong>Error:</strong> ${message}
+    </div>`;
+
+    setTimeout(() => {
+        errorDiv.innerHTML = '';
+    }, 5000);
+}
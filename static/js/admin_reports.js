@@ -0,0 +1,84 @@
+window.addEventListener('load', function() {
+    // Default to the last 7 days
+    const end = new Date();
+    const start = new Date();
+    start.setDate(end.getDate() - 6);
+    document.getElementById('report-start').value = toDateInput(start);
+    document.getElementById('report-end').value = toDateInput(end);
+    loadReport();
+});
+
+function toDateInput(date) {
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${date.getFullYear()}-${month}-${day}`;
+}
+
+function formatRupiah(amount) {
+    return 'Rp ' + Number(amount || 0).toLocaleString('id-ID');
+}
+
+function loadReport() {
+    const start = document.getElementById('report-start').value;
+    const end = document.getElementById('report-end').value;
+
+    fetch(`/admin/api/reports/sales?start=${start}&end=${end}`)
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            displayReport(data.report);
+        } else {
+            showError(data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error loading report:', error);
+        showError('Error loading report: ' + error.message);
+    });
+}
+
+function exportOrders() {
+    const start = document.getElementById('report-start').value;
+    const end = document.getElementById('report-end').value;
+    const format = document.getElementById('export-format').value;
+    const flatten = document.getElementById('export-flatten').checked ? '1' : '0';
+
+    // Plain navigation so the browser streams the file straight to disk
+    window.location = `/admin/api/export/orders?start=${start}&end=${end}&format=${format}&flatten=${flatten}`;
+}
+
+function displayReport(report) {
+    const cards = [
+        { label: 'Orders', value: report.order_count },
+        { label: 'Gross', value: formatRupiah(report.gross) },
+        { label: 'Completed', value: report.done_count },
+        { label: 'Avg. Order', value: formatRupiah(report.order_count ? Math.round(report.gross / report.order_count) : 0) }
+    ];
+    document.getElementById('report-summary').innerHTML = cards.map(card => `
+        <div style="background: white; border: 1px solid #ddd; border-radius: 8px; padding: 20px; text-align: center;">
+            <div style="color: #6c757d;">${card.label}</div>
+            <div style="font-size: 1.5em; font-weight: bold;">${card.value}</div>
+        </div>
+    `).join('');
+
+    const days = report.days || [];
+    document.getElementById('report-days').innerHTML = days.length ? days.map(day => `
+        <tr style="border-bottom: 1px solid #eee;"><td>${day.date}</td><td>${day.order_count}</td><td>${formatRupiah(day.gross)}</td></tr>
+    `).join('') : '<tr><td colspan="3" style="color: #6c757d; padding: 10px 0;">No sales in this range</td></tr>';
+
+    const items = report.items || [];
+    document.getElementById('report-items').innerHTML = items.length ? items.map(item => `
+        <tr style="border-bottom: 1px solid #eee;"><td>${item.name}</td><td>${item.type}</td><td>${item.quantity}</td><td>${formatRupiah(item.gross)}</td></tr>
+    `).join('') : '<tr><td colspan="4" style="color: #6c757d; padding: 10px 0;">No items sold</td></tr>';
+}
+
+function showError(message) {
+    const errorDiv = document.getElementById('error-message');
+    errorDiv.innerHTML = `<div style="color: #dc3545; background: #f8d7da; padding: 15px; border-radius: 5px; margin: 10px 0; border: 1px solid #f5c6cb;">
+        <strong>Error:</strong> ${message}
+    </div>`;
+
+    setTimeout(() => {
+        errorDiv.innerHTML = '';
+    }, 5000);
+}
@@ -1,6 +1,7 @@
 let cart = [];
 let addons = [];
 let availableAddons = [];
+let suggestedAddonIds = [];
 
 function updateCartDisplay() {
     const totalItems = cart.reduce((sum, item) => sum + item.quantity, 0) + 
@@ -34,6 +35,8 @@ function addToCart(itemId, name, price) {
         if (data.success) {
             cart = data.cart;
             addons = data.addons;
+            cartVersion = data.version;
+            suggestedAddonIds = (data.suggested_addons || []).map(addon => addon.id);
             updateCartDisplay();
             alert('Item added to cart!');
         } else {
@@ -46,29 +49,14 @@ function addToCart(itemId, name, price) {
 }
 
 function addAddonToCart(addonId) {
-    fetch('/api/add-addon-to-cart', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            addon_id: addonId,
-            quantity: 1
-        })
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            addons = data.addons;
-            updateCartDisplay();
-            displayCart();
-        } else {
-            alert('Error adding addon: ' + data.error);
-        }
-    })
-    .catch(error => {
-        alert('Error: ' + error);
-    });
+    // Goes through the same batch as the +/- buttons so versions stay in step
+    const addon = availableAddons.find(a => a.id === addonId);
+    const inCart = addons.find(a => a.id === addonId);
+    updateAddonItem(addonId, inCart ? inCart.quantity + 1 : 1);
+    if (!inCart && !addon) {
+        // Unknown locally; send now and show the server's cart
+        flushCartOperations();
+    }
 }
 
 function showCart() {
@@ -78,6 +66,7 @@ function showCart() {
         if (data.success) {
             cart = data.cart;
             addons = data.addons;
+            cartVersion = data.version;
             displayCart();
             document.getElementById('cart-modal').style.display = 'block';
         }
@@ -132,13 +121,17 @@ function displayCart() {
     // Display available addons (only if cart has items)
     let availableAddonsHtml = '';
     if (cart.length > 0) {
-        availableAddons.forEach(addon => {
+        // Addons suggested by the rules for the last item come first
+        const sortedAddons = availableAddons.slice().sort((a, b) =>
+            suggestedAddonIds.includes(b.id) - suggestedAddonIds.includes(a.id));
+        sortedAddons.forEach(addon => {
             const alreadyInCart = addons.find(a => a.id === addon.id);
             if (!alreadyInCart) {
+                const suggested = suggestedAddonIds.includes(addon.id);
                 availableAddonsHtml += `
                     <button onclick="addAddonToCart('${addon.id}')" 
-                            style="background: #28a745; color: white; border: none; padding: 8px 12px; margin: 2px; border-radius: 4px; font-size: 12px;">
-                        Add ${addon.name} (Rp ${addon.price})
+                            style="background: ${suggested ? '#fd7e14' : '#28a745'}; color: white; border: none; padding: 8px 12px; margin: 2px; border-radius: 4px; font-size: 12px;">
+                        ${suggested ? '⭐ ' : ''}Add ${addon.name} (Rp ${addon.price})
                     </button>
                 `;
             }
@@ -184,75 +177,113 @@ function displayCart() {
     `;
 }
 
+// Quantity taps are applied locally at once and sent to the server in
+// batches, so fast tapping makes one request instead of one per tap
+const CART_BATCH_DELAY_MS = 400;
+let cartVersion = 0;
+let pendingCartOps = new Map();
+let cartBatchTimer = null;
+let cartBatchInFlight = false;
+
 function updateCartItem(itemId, quantity) {
-    fetch('/api/update-cart', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            item_id: itemId,
-            quantity: quantity
-        })
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            cart = data.cart;
-            updateCartDisplay();
-            displayCart();
-        }
-    });
+    queueCartOperation('set_item', itemId, quantity);
 }
 
 function updateAddonItem(addonId, quantity) {
-    fetch('/api/update-addon-cart', {
+    queueCartOperation('set_addon', addonId, quantity);
+}
+
+function queueCartOperation(op, id, quantity) {
+    quantity = Math.max(quantity, 0);
+    const lines = op === 'set_item' ? cart : addons;
+    let line = lines.find(l => l.id === id);
+    if (!line && quantity > 0 && op === 'set_addon') {
+        const addon = availableAddons.find(a => a.id === id);
+        if (addon) {
+            line = { id: addon.id, name: addon.name, price: addon.price };
+            lines.push(line);
+        }
+    }
+    if (line) {
+        if (quantity === 0) {
+            lines.splice(lines.indexOf(line), 1);
+        } else {
+            line.quantity = quantity;
+            line.total = line.price * quantity;
+        }
+    }
+    updateCartDisplay();
+    displayCart();
+
+    // Only the last quantity per line matters
+    pendingCartOps.set(`${op}:${id}`, { op: op, id: id, quantity: quantity });
+    clearTimeout(cartBatchTimer);
+    cartBatchTimer = setTimeout(flushCartOperations, CART_BATCH_DELAY_MS);
+}
+
+function flushCartOperations() {
+    if (cartBatchInFlight || pendingCartOps.size === 0) {
+        return;
+    }
+    const operations = Array.from(pendingCartOps.values());
+    pendingCartOps.clear();
+    cartBatchInFlight = true;
+
+    fetch('/api/cart-batch', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-            addon_id: addonId,
-            quantity: quantity
+            version: cartVersion,
+            operations: operations
         })
     })
     .then(response => response.json())
     .then(data => {
-        if (data.success) {
+        if (data.version !== undefined) {
+            cartVersion = data.version;
+        }
+        if (!data.success) {
+            // Stale or rejected: drop local edits and show the server's cart
+            pendingCartOps.clear();
+            if (!data.stale) {
+                alert('Error updating cart: ' + data.error);
+            }
+        }
+        // Keep newer optimistic edits on screen until they are sent too
+        if (pendingCartOps.size === 0 && data.cart) {
+            cart = data.cart;
             addons = data.addons;
             updateCartDisplay();
             displayCart();
         }
+    })
+    .catch(error => {
+        console.error('Cart update error:', error);
+        loadCartData();
+    })
+    .finally(() => {
+        cartBatchInFlight = false;
+        flushCartOperations();
     });
 }
 
 function goToCheckout() {
+    // Send any quantity changes still waiting in the batch before leaving
+    if (pendingCartOps.size > 0 || cartBatchInFlight) {
+        clearTimeout(cartBatchTimer);
+        flushCartOperations();
+        setTimeout(goToCheckout, 100);
+        return;
+    }
     window.location.href = '/checkout';
 }
 
-// Initialize session and load cart data
+// Load cart data; the server starts a session on the first cart change
 function initializeApp() {
-    // First initialize session
-    fetch('/api/session-init', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        }
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            // Then load cart and addons
-            loadCartData();
-            loadAvailableAddons();
-        }
-    })
-    .catch(error => {
-        console.error('Session init error:', error);
-        // Try to load data anyway
-        loadCartData();
-        loadAvailableAddons();
-    });
+    loadCartData();
+    loadAvailableAddons();
 }
 
 function loadCartData() {
@@ -262,6 +293,7 @@ function loadCartData() {
         if (data.success) {
             cart = data.cart;
             addons = data.addons;
+            cartVersion = data.version;
             updateCartDisplay();
         }
     });
@@ -77,6 +77,24 @@ function displayCheckoutItems(cart, addons, total) {
 // Load checkout data when page loads
 loadCheckoutData();
 
+// One idempotency key per distinct payment request, so a double submit or a
+// network retry replays the first response instead of opening a second transaction
+let paymentAttempt = {key: null, body: null};
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+}
+
+function paymentIdempotencyKey(body) {
+    if (paymentAttempt.body !== body) {
+        paymentAttempt = {key: newIdempotencyKey(), body: body};
+    }
+    return paymentAttempt.key;
+}
+
 document.getElementById('checkout-form').addEventListener('submit', function(e) {
     e.preventDefault();
     
@@ -126,6 +144,7 @@ document.getElementById('checkout-form').addEventListener('submit', function(e)
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Idempotency-Key': 'payment-success-' + orderId
                 },
                 body: JSON.stringify({
                     order_id: orderId,
@@ -157,12 +176,14 @@ document.getElementById('checkout-form').addEventListener('submit', function(e)
         }, 2000); // 2 second delay between retries
     }
     
+    const paymentBody = JSON.stringify(formData);
     fetch('/api/create-payment', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
+            'Idempotency-Key': paymentIdempotencyKey(paymentBody)
         },
-        body: JSON.stringify(formData)
+        body: paymentBody
     })
     .then(response => response.json())
     .then(data => {
@@ -180,6 +201,7 @@ document.getElementById('checkout-form').addEventListener('submit', function(e)
                         method: 'POST',
                         headers: {
                             'Content-Type': 'application/json',
+                            'Idempotency-Key': 'payment-success-' + data.order_id
                         },
                         body: JSON.stringify({
                             order_id: data.order_id,
@@ -222,6 +244,8 @@ document.getElementById('checkout-form').addEventListener('submit', function(e)
                 
                 onError: function(result) {
                     console.log('Payment error:', result);
+                    // A failed transaction can't be reopened; the next try starts a new one
+                    paymentAttempt = {key: null, body: null};
                     alert('Payment failed. Please try again.');
                     resetButton();
                 },
@@ -231,6 +255,14 @@ document.getElementById('checkout-form').addEventListener('submit', function(e)
                     resetButton();
                 }
             });
+        } else if (data.price_changes) {
+            // Server repriced the cart; show what changed and the new total
+            const changes = data.price_changes.map(change =>
+                `${change.name}: Rp ${change.old_price} -> Rp ${change.new_price}`
+            ).join('\n');
+            alert(data.error + ':\n' + changes + '\n\nNew total: Rp ' + data.total + '. Please review and submit again.');
+            loadCheckoutData();
+            resetButton();
         } else {
             alert('Error creating payment: ' + data.error);
             resetButton();